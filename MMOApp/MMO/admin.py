@@ -1,17 +1,17 @@
-import csv
+from django import forms
 from django.contrib import admin, messages
-from django.http import HttpResponse
 from .models import *
+from django.http import FileResponse, Http404, HttpResponseForbidden
 from django.template.response import TemplateResponse
-from django.urls import path
-from django.utils.html import mark_safe
+from django.urls import path, reverse
+from django.utils.html import format_html, mark_safe
 from oauth2_provider.models import AccessToken, Application, RefreshToken, Grant, IDToken
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from datetime import datetime, timedelta
-from django.db.models import Avg, Count, Q, F, ExpressionWrapper, DurationField
-from django.db.models.functions import TruncDate
 from django.utils import timezone
 from django.utils.dateparse import parse_date
-from django.db.models import Sum
+from django.db import transaction
+from . import exports, jobs, metrics, order_states, reputation, wallet
 
 
 class MyAdminSite(admin.AdminSite):
@@ -19,9 +19,20 @@ class MyAdminSite(admin.AdminSite):
 
     def get_urls(self):
         return [
-            path('mmo-stats/', self.stats_view, name='mmo-stats')
+            path('mmo-stats/', self.stats_view, name='mmo-stats'),
+            path('mmo-exports/<int:export_id>/download/', self.admin_view(self.export_download_view),
+                 name='mmo-export-download'),
         ] + super().get_urls()
 
+    def export_download_view(self, request, export_id):
+        # File do worker ghi (MMO.exports), stream từ đĩa theo từng khối, không đọc hết vào bộ nhớ
+        if not request.user.has_perm('MMO.view_exportjob'):
+            return HttpResponseForbidden()
+        export = ExportJob.objects.filter(pk=export_id, status='done').first()
+        if export is None or not exports.export_path(export).exists():
+            raise Http404
+        return FileResponse(open(exports.export_path(export), 'rb'), as_attachment=True, filename=export.file_name)
+
     def _parse_range(self, request):
         # Đọc khoảng ngày từ querystring (?from=YYYY-MM-DD&to=YYYY-MM-DD). Mặc định 30 ngày gần nhất
         now = timezone.now()
@@ -40,51 +51,26 @@ class MyAdminSite(admin.AdminSite):
         return start_dt, end_dt
 
     def stats_view(self, request):
-        from .models import Store, Order, Review, Complaint  # tránh import vòng
-
-        store_code = (request.GET.get('store_code') or 'ST00001').strip()
+        # Mặc định store có điểm uy tín cao nhất (bảng xếp hạng ở trang Store)
+        store_code = (request.GET.get('store_code')
+                      or Store.objects.order_by('-reputation').values_list('pk', flat=True).first() or '').strip()
         start_dt, end_dt = self._parse_range(request)
+        start_date = start_dt.date()
+        end_date = end_dt.date()
 
-        store = None
-        orders_qs = Order.objects.none()
-        reviews_qs = Review.objects.none()
-        complaints_qs = Complaint.objects.none()
-
-        if store_code:
-            try:
-                store = Store.objects.get(pk=store_code)
-
-                # Đơn hàng thuộc store (qua acc_detail hoặc service_detail)
-                orders_qs = (
-                    Order.objects.filter(
-                        Q(acc_detail__product__store=store) | Q(service_detail__product__store=store),
-                        created_date__range=(start_dt, end_dt)
-                    )
-                    .distinct()
-                )
-
-                # Đánh giá thuộc store trong khoảng thời gian (lọc theo thời gian tạo review)
-                reviews_qs = Review.objects.filter(
-                    product__store=store,
-                    created_date__range=(start_dt, end_dt)
-                )
-
-                # Khiếu nại thuộc các đơn của store trong khoảng thời gian
-                complaints_qs = Complaint.objects.filter(
-                    order__in=orders_qs,
-                    created_date__range=(start_dt, end_dt)
-                )
-
-            except Store.DoesNotExist:
-                store = None
+        # Đọc số liệu theo ngày đã tính sẵn (StoreDailyMetrics): khoảng 1 năm chỉ là 365 dòng
+        store = Store.objects.filter(pk=store_code).first() if store_code else None
+        rows = metrics.daily_rows(store, start_date, end_date) if store else []
+        rows_map = {row.day: row for row in rows}
+        totals = metrics.totals(rows)
 
         # TÍNH TOÁN CHỈ SỐ
-        total_orders = orders_qs.count()
-        completed_orders = orders_qs.filter(status__in=['delivered', 'completed']).count()
-        refunded_orders = orders_qs.filter(status='refunded').count()
-        complained_orders = complaints_qs.values('order').distinct().count()
+        total_orders = totals['orders']
+        completed_orders = totals['fulfilled_orders']
+        refunded_orders = totals['refunded_orders']
+        complained_orders = totals['complained_orders']
 
-        avg_rating = reviews_qs.aggregate(v=Avg('rating'))['v'] or 0
+        avg_rating = totals['rating_sum'] / totals['rating_count'] if totals['rating_count'] else 0
 
         # Tỉ lệ
         def safe_rate(n, d):
@@ -94,115 +80,35 @@ class MyAdminSite(admin.AdminSite):
         refund_rate = safe_rate(refunded_orders, total_orders)
         fulfill_rate = safe_rate(completed_orders, total_orders)
 
-        # Thời gian giao hàng trung bình (nếu có released_at). Dùng đơn vị giờ.
-        delivered_qs = orders_qs.filter(released_at__isnull=False)
-        if delivered_qs.exists():
-            avg_delta = delivered_qs.annotate(
-                diff=ExpressionWrapper(F('released_at') - F('created_date'), output_field=DurationField())
-            ).aggregate(v=Avg('diff'))['v']
-            avg_delivery_hours = round(avg_delta.total_seconds() / 3600.0, 2) if avg_delta else None
+        # Thời gian giao hàng trung bình (từ lúc tạo đơn đến released_at). Dùng đơn vị giờ.
+        if totals['delivery_count']:
+            avg_delivery_hours = round(totals['delivery_seconds'] / totals['delivery_count'] / 3600.0, 2)
         else:
             avg_delivery_hours = None
 
-        # Điểm uy tín (0-100):
-        # 70% theo điểm trung bình đánh giá, 15% theo (1 - complaint_rate), 15% theo (1 - refund_rate)
-        score = (avg_rating / 5.0) * 70.0 + (1.0 - complaint_rate) * 15.0 + (1.0 - refund_rate) * 15.0
-        score = max(0.0, min(100.0, round(score, 2)))
-
-        from datetime import timedelta  # đảm bảo import ở đầu file
-
-        # Group theo ngày (nhóm kết quả)
-        orders_grouped = (
-            orders_qs.annotate(day=TruncDate('created_date'))
-            .values('day')
-            .annotate(cnt=Count('order_code'))
-            .order_by('day')
-        )
-        ratings_grouped = (
-            reviews_qs.annotate(day=TruncDate('created_date'))
-            .values('day')
-            .annotate(avg=Avg('rating'))
-            .order_by('day')
-        )
-
-        # Map kết quả theo key 'DD/MM/YYYY' để lookup dễ dàng
-        orders_map = {o['day'].strftime('%d/%m/%Y'): o['cnt'] for o in orders_grouped}
-        ratings_map = {r['day'].strftime('%d/%m/%Y'): float(r['avg'] or 0) for r in ratings_grouped}
-
-        # Lặp qua full range start_dt.date() -> end_dt.date()
-        start_date = start_dt.date()
-        end_date = end_dt.date()
+        # Điểm uy tín (0-100), cùng công thức với bảng xếp hạng (MMO.reputation)
+        score = float(reputation.score(avg_rating, complaint_rate, refund_rate))
 
+        # Lặp qua full range start_date -> end_date, ngày không có dòng số liệu = 0
         labels = []
         order_counts = []
         rating_values = []
+        revenue_values = []
 
         cur = start_date
         while cur <= end_date:
-            lookup_key = cur.strftime('%d/%m/%Y')  # dùng cho map
+            row = rows_map.get(cur)
             labels.append(cur.strftime('%d/%m'))  # hiển thị dd/mm (bỏ năm)
-            order_counts.append(orders_map.get(lookup_key, 0))
-            rating_values.append(round(ratings_map.get(lookup_key, 0.0), 2))
+            order_counts.append(row.orders if row else 0)
+            rating_values.append(round(row.rating_sum / row.rating_count, 2) if row and row.rating_count else 0.0)
+            revenue_values.append(round(float(row.acc_revenue + row.service_revenue), 0) if row else 0)
             cur = cur + timedelta(days=1)
 
         # Nếu template của bạn dùng rating_labels riêng, gán như sau:
         rating_labels = labels.copy()
 
-        from .models import AccOrderDetail, ServiceOrderDetail  # add local imports here
-
-        # Tổng doanh thu trong khoảng (từ acc_detail + service_detail)
-        acc_total_q = AccOrderDetail.objects.filter(
-            product__store=store,
-            order__created_date__range=(start_dt, end_dt)
-        ).aggregate(total=Sum('total_amount')) if store else {'total': 0}
-
-        svc_total_q = ServiceOrderDetail.objects.filter(
-            product__store=store,
-            order__created_date__range=(start_dt, end_dt)
-        ).aggregate(total=Sum('total_amount')) if store else {'total': 0}
-
-        acc_total = acc_total_q.get('total') or 0
-        svc_total = svc_total_q.get('total') or 0
-        revenue_total = acc_total + svc_total
-
-        # --- revenue per day aligned với labels (labels là danh sách ngày đã tạo ở trên) ---
-        # Group từng detail theo ngày để map
-        acc_rev_grouped = (
-            AccOrderDetail.objects.filter(
-                product__store=store,
-                order__created_date__range=(start_dt, end_dt)
-            )
-            .annotate(day=TruncDate('order__created_date'))
-            .values('day')
-            .annotate(sum_rev=Sum('total_amount'))
-            .order_by('day')
-        ) if store else []
-
-        svc_rev_grouped = (
-            ServiceOrderDetail.objects.filter(
-                product__store=store,
-                order__created_date__range=(start_dt, end_dt)
-            )
-            .annotate(day=TruncDate('order__created_date'))
-            .values('day')
-            .annotate(sum_rev=Sum('total_amount'))
-            .order_by('day')
-        ) if store else []
-
-        # maps keyed by 'DD/MM/YYYY' just like orders_map
-        acc_rev_map = {a['day'].strftime('%d/%m/%Y'): float(a['sum_rev'] or 0) for a in acc_rev_grouped}
-        svc_rev_map = {s['day'].strftime('%d/%m/%Y'): float(s['sum_rev'] or 0) for s in svc_rev_grouped}
-
-        # build revenue_values aligned with existing labels (labels list contains 'DD/MM' strings)
-        revenue_values = []
-        # we need to iterate the same date range as labels; your labels were created by looping cur from start_date..end_date
-        # reuse the same approach: create lookup_key for each date in that loop
-        cur = start_date
-        while cur <= end_date:
-            lookup_key = cur.strftime('%d/%m/%Y')
-            # sum acc + svc for that day
-            revenue_values.append(round((acc_rev_map.get(lookup_key, 0.0) + svc_rev_map.get(lookup_key, 0.0)), 0))
-            cur = cur + timedelta(days=1)
+        # Tổng doanh thu trong khoảng (acc + service)
+        revenue_total = totals['acc_revenue'] + totals['service_revenue']
 
         context = {
             'store': store,
@@ -234,47 +140,28 @@ class MyAdminSite(admin.AdminSite):
 
 @admin.action(description="Xuất CSV Acc Order")
 def export_to_csv_acc(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="acc_order_details.csv"'
-
-    writer = csv.writer(response)
-    # Header
-    writer.writerow(['Mã', 'Sản phẩm', 'Số lượng', 'Giá', 'Tổng tiền', 'Giao cho'])
-
-    for obj in queryset:
-        writer.writerow([
-            obj.acc_order_detail_code,
-            obj.product.name if obj.product else '',
-            obj.quantity,
-            obj.unit_price,
-            obj.total_amount,
-            obj.content_delivered
-        ])
-    return response
+    return exports.stream_csv(queryset, 'acc_order_details.csv', [
+        ('Mã', 'acc_order_detail_code'),
+        ('Sản phẩm', 'product__name'),
+        ('Số lượng', 'quantity'),
+        ('Giá', 'unit_price'),
+        ('Tổng tiền', 'total_amount'),
+        ('Giao cho', 'content_delivered'),
+    ])
 
 
 @admin.action(description="Xuất CSV Service Order")
 def export_to_csv_service(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="service_order_details.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(
-        ['Mã đơn dịch vụ', 'Sản phẩm', 'Số lượng', 'Giá', 'Tổng tiền', 'Trạng thái', 'Link giao hàng', 'Ghi chú'])
-
-    for obj in queryset:
-        writer.writerow([
-            obj.service_order_detail_code,
-            obj.product.name if obj.product else '',
-            obj.quantity,
-            obj.unit_price,
-            obj.total_amount,
-            obj.status,
-            obj.target_url,
-            obj.note or ''
-        ])
-
-    return response
+    return exports.stream_csv(queryset, 'service_order_details.csv', [
+        ('Mã đơn dịch vụ', 'service_order_detail_code'),
+        ('Sản phẩm', 'product__name'),
+        ('Số lượng', 'quantity'),
+        ('Giá', 'unit_price'),
+        ('Tổng tiền', 'total_amount'),
+        ('Trạng thái', 'status'),
+        ('Link giao hàng', 'target_url'),
+        ('Ghi chú', 'note'),
+    ])
 
 
 # User
@@ -284,7 +171,7 @@ class UserAdmin(admin.ModelAdmin):
     list_filter = ['role', 'is_staff', 'is_active', 'is_verified', 'is_superuser']
     search_fields = ['username', 'first_name', 'last_name', 'email']
     ordering = ['-date_joined']
-    readonly_fields = ['avatar_display']
+    readonly_fields = ['balance', 'avatar_display']  # số dư chỉ đổi qua MMO.wallet
 
     def avatar_display(self, obj):
         if obj.avatar:
@@ -293,7 +180,13 @@ class UserAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not change or 'password' in form.changed_data:
             obj.set_password(obj.password)
-        super().save_model(request, obj, form, change)
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Chỉ ghi các cột vừa sửa trên form, không ghi đè balance đang được MMO.wallet cập nhật
+        columns = {field.name for field in obj._meta.concrete_fields}
+        fields = [name for name in form.changed_data if name in columns]
+        if fields:
+            obj.save(update_fields=fields)
 
 
 # Verification
@@ -318,10 +211,26 @@ class VerificationAdmin(admin.ModelAdmin):
 
 
 # Store
+@admin.action(description="Tính lại điểm uy tín (tất cả store)")
+def recompute_reputation(modeladmin, request, queryset):
+    count = reputation.update_all()
+    messages.success(request, f"Đã cập nhật điểm uy tín cho {count} store!")
+
 class StoreAdmin(admin.ModelAdmin):
-    list_display = ['store_code', 'name', 'seller', 'description', 'active', 'created_date', 'updated_date']
+    # Bảng xếp hạng store: mặc định theo điểm uy tín, bấm tiêu đề cột để sắp xếp theo chỉ số khác
+    list_display = ['store_code', 'name', 'seller', 'reputation', 'avg_rating', 'order_count', 'fulfill_rate',
+                    'complaint_rate', 'refund_rate', 'avg_delivery_hours', 'stats_link', 'active', 'created_date']
     search_fields = ['name', 'seller__username']
     list_filter = ['created_date', 'active']
+    list_select_related = ['seller']
+    ordering = ['-reputation']
+    readonly_fields = ['reputation', 'avg_rating', 'order_count', 'fulfill_rate', 'complaint_rate', 'refund_rate',
+                       'avg_delivery_hours', 'reputation_updated_at']
+    actions = [recompute_reputation]
+
+    @admin.display(description="Thống kê")
+    def stats_link(self, obj):
+        return format_html('<a href="{}?store_code={}">Xem</a>', reverse('admin:mmo-stats'), obj.store_code)
 
 
 # Product
@@ -330,6 +239,7 @@ class ProductAdmin(admin.ModelAdmin):
                     'active', 'created_date', 'updated_date', 'image_display']
     search_fields = ['name', 'store__name']
     list_filter = ['type', 'is_approved', 'store', 'active']
+    list_select_related = ['store']
 
     readonly_fields = ['image_display']
 
@@ -409,6 +319,29 @@ class ServiceOrderDetailAdmin(admin.ModelAdmin):
 
 
 # Complaint
+def _resolve_complaints(request, queryset, action, decision):
+    count = 0
+    for complaint in queryset.filter(resolved=False):
+        try:
+            with transaction.atomic():
+                order_states.apply(order_states.load(complaint.order_id), action)
+                Complaint.objects.filter(pk=complaint.pk).update(resolved=True, decision=decision, admin=request.user)
+        except (PermissionDenied, ValidationError) as ex:
+            messages.error(request, f"{complaint.complaint_code}: {ex.detail}")
+            continue
+        count += 1
+    return count
+
+@admin.action(description="Hoàn tiền cho người mua")
+def refund_complaint(modeladmin, request, queryset):
+    count = _resolve_complaints(request, queryset, 'refund', 'refund')
+    messages.success(request, f"{count} khiếu nại đã được hoàn tiền cho người mua!")
+
+@admin.action(description="Trả tiền cho người bán")
+def release_complaint(modeladmin, request, queryset):
+    count = _resolve_complaints(request, queryset, 'release', 'release')
+    messages.success(request, f"{count} khiếu nại đã được trả tiền cho người bán!")
+
 class ComplaintAdmin(admin.ModelAdmin):
     list_display = ['complaint_code', 'order', 'buyer', 'message', 'resolved', 'decision', 'admin',
                     'active', 'created_date', 'updated_date', 'image_display1', 'image_display2', 'image_display3',
@@ -416,6 +349,7 @@ class ComplaintAdmin(admin.ModelAdmin):
     search_fields = ['order__order_code', 'buyer__username']
     list_filter = ['resolved', 'decision', 'order__order_code', 'active']
     readonly_fields = ['image_display1', 'image_display2', 'image_display3']
+    actions = [refund_complaint, release_complaint]
 
     def image_display1(self, obj):
         if obj.evidence_image1:
@@ -469,19 +403,97 @@ class FavoriteProductAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'product__name']
     list_filter = ['user__user_code', 'active']
 
+# PendingEarning
+class PendingEarningAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'order', 'held', 'amount', 'created_date']
+    list_filter = ['held']
+    search_fields = ['user__username', 'order__order_code']
+    list_select_related = ['user']
+
+# Job (hàng đợi tác vụ nền)
+@admin.action(description="Chạy lại job bị lỗi (dead)")
+def retry_jobs(modeladmin, request, queryset):
+    count = jobs.retry(queryset)
+    messages.success(request, f"Đã đưa {count} job vào hàng đợi lại!")
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_date']
+    list_filter = ['status', 'name']
+    readonly_fields = ['last_error']
+    actions = [retry_jobs]
+
+class ProductSimilarityAdmin(admin.ModelAdmin):
+    list_display = ['product', 'rank', 'similar', 'score']
+    search_fields = ['product__product_code', 'product__name']
+    list_select_related = ['product', 'similar']
+
+class StoreDailyMetricsAdmin(admin.ModelAdmin):
+    list_display = ['store', 'day', 'orders', 'fulfilled_orders', 'refunded_orders', 'complained_orders',
+                    'acc_revenue', 'service_revenue', 'rating_count', 'updated_date']
+    list_filter = ['day']
+    search_fields = ['store__store_code', 'store__name']
+    date_hierarchy = 'day'
+
+# ExportJob (xuất dữ liệu lớn chạy nền)
+class ExportJobForm(forms.ModelForm):
+    class Meta:
+        model = ExportJob
+        fields = ['kind', 'format', 'date_from', 'date_to']
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('date_from') and cleaned.get('date_to') and cleaned['date_from'] > cleaned['date_to']:
+            raise forms.ValidationError("Ngày bắt đầu phải trước ngày kết thúc")
+        if cleaned.get('format') and cleaned['format'] not in exports.formats():
+            raise forms.ValidationError("Máy chủ chưa cài pyarrow, chỉ xuất được CSV")
+        return cleaned
+
+class ExportJobAdmin(admin.ModelAdmin):
+    form = ExportJobForm
+    list_display = ['id', 'kind', 'format', 'date_from', 'date_to', 'status', 'progress', 'download_link',
+                    'created_by', 'created_date', 'finished_at']
+    list_filter = ['status', 'kind', 'format']
+    list_select_related = ['created_by']
+    readonly_fields = ['status', 'total_rows', 'rows', 'file_name', 'error', 'created_by', 'finished_at']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Tạo xong thì không sửa tham số nữa, muốn xuất khoảng khác thì tạo job mới
+        if obj:
+            return ['kind', 'format', 'date_from', 'date_to', *self.readonly_fields]
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            # Cùng transaction với ExportJob: worker chỉ thấy job khi ExportJob đã commit
+            jobs.enqueue('run_export', {'export_id': obj.pk}, max_attempts=3)
+
+    @admin.display(description='Tiến độ')
+    def progress(self, obj):
+        if not obj.total_rows:
+            return f"{obj.rows}"
+        return f"{obj.rows}/{obj.total_rows} ({obj.rows * 100 // obj.total_rows}%)"
+
+    @admin.display(description='File')
+    def download_link(self, obj):
+        if obj.status != 'done':
+            return '-'
+        return format_html('<a href="{}">Tải về</a>', reverse('admin:mmo-export-download', args=[obj.pk]))
+
 @admin.action(description="Xác nhận và cộng tiền cho user")
 def confirm_deposit(modeladmin, request, queryset):
     count = 0
     for deposit in queryset:
         if deposit.status == 'pending':  # chỉ chấp nhận những yêu cầu chờ
-            # Cập nhật status
-            deposit.status = 'confirmed'
-            deposit.save()
+            with transaction.atomic():
+                # Cập nhật status có điều kiện để 2 admin bấm cùng lúc không cộng tiền 2 lần
+                if not DepositRequest.objects.filter(pk=deposit.pk, status='pending').update(status='confirmed'):
+                    continue
 
-            # Cộng tiền cho user
-            user = deposit.user
-            user.balance += deposit.amount
-            user.save()
+                # Cộng tiền cho user (lịch sử 'deposit' đã ghi khi tạo yêu cầu)
+                wallet.credit(deposit.user, deposit.amount)
 
             count += 1
 
@@ -520,21 +532,14 @@ def reject_withdraw(modeladmin, request, queryset):
     count = 0
     for withdraw in queryset:
         if withdraw.status == 'pending':  # chỉ xử lý những request chờ
-            user = withdraw.user
-            user.balance += withdraw.amount
-            user.save()
-
-            # Cập nhật status
-            withdraw.status = 'rejected'
-            withdraw.save()
+            with transaction.atomic():
+                # Cập nhật status có điều kiện để không hoàn tiền 2 lần
+                if not WithdrawRequest.objects.filter(pk=withdraw.pk, status='pending').update(status='rejected'):
+                    continue
 
-            # Tạo TransactionHistory cho việc hoàn trả
-            TransactionHistory.objects.create(
-                user=user,
-                type='refund',  # dùng refund để ghi nhận hoàn tiền
-                amount=withdraw.amount,
-                note=f"Hoàn trả rút tiền bị từ chối - {withdraw.withdraw_code}"
-            )
+                # Hoàn tiền + TransactionHistory (dùng refund để ghi nhận hoàn tiền)
+                wallet.credit(withdraw.user, withdraw.amount, 'refund',
+                              f"Hoàn trả rút tiền bị từ chối - {withdraw.withdraw_code}")
 
             count += 1
 
@@ -569,6 +574,11 @@ admin_site.register(TransactionHistory, TransactionHistoryAdmin)
 admin_site.register(FavoriteProduct, FavoriteProductAdmin)
 admin_site.register(DepositRequest, DepositRequestAdmin)
 admin_site.register(WithdrawRequest, WithdrawRequestAdmin)
+admin_site.register(PendingEarning, PendingEarningAdmin)
+admin_site.register(Job, JobAdmin)
+admin_site.register(StoreDailyMetrics, StoreDailyMetricsAdmin)
+admin_site.register(ExportJob, ExportJobAdmin)
+admin_site.register(ProductSimilarity, ProductSimilarityAdmin)
 
 # OAuth2
 admin_site.register(AccessToken)
@@ -6,4 +6,5 @@ class MmoConfig(AppConfig):
     name = 'MMO'
 
     def ready(self):
-        import MMO.signals
\ No newline at end of file
+        import MMO.signals
+        import MMO.tasks
\ No newline at end of file
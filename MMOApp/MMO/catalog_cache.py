@@ -0,0 +1,153 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+# Cache response và ETag của các API danh mục (/products/, store-products, /stores/, /blogs/).
+# Key/ETag gồm URL đầy đủ (host + query string) và version của các scope (catalog, store:<code>, blogs):
+# sửa dữ liệu chỉ cần tăng version (O(1)), các key cũ không còn được đọc và tự hết hạn theo TTL.
+# Version tăng bằng cache.incr nên backend phải tăng nguyên tử: local-memory (khoá trong process), Redis, Memcached.
+# Local-memory (mặc định khi không có REDIS_URL) là cache riêng từng process: chỉ đúng khi chạy 1 process, bump() ở
+# 1 worker không tới worker khác và các worker đó trả danh sách/ETag cũ đến hết TTL. Nhiều worker/node phải dùng Redis.
+# DatabaseCache/FileBasedCache không dùng được: incr là get + set, 2 bump() cùng lúc có thể chỉ tăng 1 lần.
+ENABLED = getattr(settings, 'CATALOG_CACHE_ENABLED', True)
+TTL = getattr(settings, 'CATALOG_CACHE_TTL', 300)  # giây giữ một response
+
+CATALOG = 'catalog'
+BLOGS = 'blogs'
+
+
+def store_scope(store_code):
+    return f"store:{store_code}"
+
+
+def _version_key(scope):
+    return f"catalog_ver:{scope}"
+
+
+def _versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Khởi tạo bằng thời gian hiện tại (ms) để version mới không trùng version cũ nếu cache bị xoá/khởi động lại
+            cache.add(key, int(time.time() * 1000), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def current_version(scope):
+    return _versions([scope])[0]
+
+
+def bump(*scopes):
+    """Tăng version các scope -> mọi response đã cache của scope đó hết hiệu lực."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:  # chưa có version (chưa ai đọc) -> không có gì để xoá
+            pass
+
+
+def bump_on_commit(*scopes):
+    # Tăng version sau khi commit để request khác không cache lại dữ liệu cũ trước khi transaction xong
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def bump_store(store_code):
+    # Sản phẩm/kho của một store đổi -> danh sách của store đó và danh sách chung đều đổi
+    bump_on_commit(CATALOG, store_scope(store_code))
+
+
+def own_store_scope(request, kwargs):
+    # Scope store của seller đang đăng nhập (my-products, my-store)
+    store = getattr(request.user, 'store', None)
+    return store_scope(store.store_code if store else None)
+
+
+def _scopes(scope_templates, request, kwargs):
+    # Scope là chuỗi format theo kwargs của URL, hoặc hàm (request, kwargs) -> scope
+    return [template(request, kwargs) if callable(template) else template.format(**kwargs)
+            for template in scope_templates]
+
+
+def _response_key(request, scopes):
+    raw = '|'.join([request.build_absolute_uri(), *(f"{scope}={version}" for scope, version in zip(scopes, _versions(scopes)))])
+    return f"catalog_resp:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def cached(*scope_templates):
+    """
+    Decorator cho action GET của ViewSet: cache response.data theo URL + version các scope.
+    scope_templates được format với kwargs của URL, ví dụ cached(CATALOG, 'store:{pk}').
+    Response không phụ thuộc user nên dùng chung cho mọi client.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            if not ENABLED or request.method != 'GET':
+                return func(view, request, *args, **kwargs)
+
+            scopes = _scopes(scope_templates, request, kwargs)
+            key = _response_key(request, scopes)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = func(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, TTL)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _etag(request, scopes):
+    # Cùng URL, user, định dạng response và version các scope -> cùng nội dung
+    raw = '|'.join([request.build_absolute_uri(), str(request.user.pk), str(getattr(request, 'accepted_media_type', '')),
+                    *(f"{scope}={version}" for scope, version in zip(scopes, _versions(scopes)))])
+    return f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def _matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+def conditional(*scope_templates):
+    """
+    Decorator cho action GET: gắn weak ETag tính từ version các scope (không chạm DB khi scope cố định).
+    If-None-Match khớp -> trả 304 ngay, không query danh sách và không serialize.
+    Cũng như cache response, ETag chỉ đúng giữa các worker khi version nằm trong cache dùng chung (Redis).
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET':
+                return func(view, request, *args, **kwargs)
+
+            etag = _etag(request, _scopes(scope_templates, request, kwargs))
+            if _matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            response = func(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,90 @@
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import models, stocks, vouchers, wallet
+
+
+def calc_discount(voucher, total):
+    # Giảm theo %, giới hạn bởi max_discount
+    discount = int(total * voucher.discount_percent / 100)
+    if voucher.max_discount and discount > voucher.max_discount:
+        discount = voucher.max_discount
+    return discount
+
+
+def place_order(buyer, product, quantity, code=None, target_url=None, note=None):
+    """
+    Checkout trong 1 request/1 transaction: tạo Order, tính tiền, lấy stock (tài khoản), thanh toán và tạo detail.
+    Lỗi ở bất kỳ bước nào thì rollback toàn bộ, không còn order mồ côi.
+    Lượt voucher được trừ trước, ngoài transaction (1 UPDATE có điều kiện) để dòng voucher không bị khoá
+    suốt checkout khi flash sale; checkout lỗi thì hoàn lại lượt. Trả về (order, detail).
+    """
+    is_service = product.type == 'service'
+    if not is_service and product.available_quantity < quantity:
+        raise ValidationError("Không đủ tài khoản trong kho!")
+
+    unit_price = product.price
+    total = unit_price * quantity
+
+    voucher = vouchers.reserve_voucher(code, store=product.store) if code else None
+    try:
+        order, detail = _create_order(buyer, product, quantity, voucher, unit_price, total, target_url, note)
+    except Exception:
+        if voucher:
+            vouchers.release_voucher(voucher)
+        raise
+    return order, detail
+
+
+def _create_order(buyer, product, quantity, voucher, unit_price, total, target_url, note):
+    is_service = product.type == 'service'
+    with transaction.atomic():
+        discount = calc_discount(voucher, total) if voucher else 0
+        total -= discount
+
+        order = models.Order.objects.create(
+            buyer=buyer,
+            store_id=product.store_id,
+            voucher=voucher,
+            is_paid=not is_service,
+            status='processing' if is_service else 'delivered'
+        )
+
+        if is_service:
+            wallet.pay_seller(
+                buyer, product.store.seller, total,
+                debit_note=f"Thanh toán dịch vụ {product.name} trong đơn {order.order_code}",
+                credit_note=f"Nhận tiền từ đơn dịch vụ {product.name} - {order.order_code}",
+                error="Số dư không đủ để thanh toán dịch vụ này!",
+                order=order
+            )
+            detail = models.ServiceOrderDetail.objects.create(
+                order=order,
+                product=product,
+                target_url=target_url,
+                note=note,
+                unit_price=unit_price,
+                quantity=quantity,
+                total_amount=total,
+                discount_amount=discount
+            )
+        else:
+            wallet.pay_seller(
+                buyer, product.store.seller, total,
+                debit_note=f"Thanh toán đơn hàng {order.order_code}",
+                credit_note=f"Nhận tiền từ đơn bán tài khoản {product.name} - {order.order_code}",
+                error="Số dư không đủ để thanh toán đơn hàng này!",
+                order=order
+            )
+            contents = stocks.claim_stocks(product, quantity)
+            detail = models.AccOrderDetail.objects.create(
+                order=order,
+                product=product,
+                unit_price=unit_price,
+                quantity=quantity,
+                total_amount=total,
+                discount_amount=discount,
+                content_delivered="\n".join(contents)
+            )
+
+    return order, detail
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Exists, F, Min, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import metrics, models, wallet
+
+RELEASE_CHUNK_SIZE = 500
+DEFAULT_WARRANTY_DAYS = 3  # sản phẩm đã bị xoá (product = NULL)
+
+
+def _due_candidates(before, after, chunk_size):
+    # 1 chunk đơn delivered chưa giải ngân, giao trước mốc before, quét theo index (status, delivered_at, order_code) bằng keyset
+    qs = models.Order.objects.filter(status='delivered', released_at__isnull=True, delivered_at__lte=before)
+    if after:
+        qs = qs.filter(Q(delivered_at__gt=after[0]) | Q(delivered_at=after[0], order_code__gt=after[1]))
+    qs = (qs.annotate(warranty_days=Coalesce('acc_detail__product__warranty_days',
+                                             'service_detail__product__warranty_days',
+                                             Value(DEFAULT_WARRANTY_DAYS)))
+          .exclude(Exists(models.Complaint.objects.filter(order=OuterRef('pk'))))
+          .order_by('delivered_at', 'order_code'))
+    return list(qs.values_list('order_code', 'delivered_at', 'warranty_days')[:chunk_size])
+
+
+def _shortest_warranty():
+    # Đơn giao sau now - bảo hành ngắn nhất chắc chắn chưa đến hạn: không cần quét
+    days = models.Product.objects.aggregate(days=Min('warranty_days'))['days']
+    return min(DEFAULT_WARRANTY_DAYS, days) if days is not None else DEFAULT_WARRANTY_DAYS
+
+
+def _release(order_codes, now):
+    # Mỗi chunk 1 transaction ngắn: 1 UPDATE cho các đơn, 1 UPDATE balance cho mỗi seller
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        codes = list(models.Order.objects.select_for_update(skip_locked=skip_locked)
+                     .filter(order_code__in=order_codes, status='delivered', released_at__isnull=True)
+                     .values_list('order_code', flat=True))
+        if not codes:
+            return 0
+        models.Order.objects.filter(order_code__in=codes).update(
+            status='completed', released_at=now, updated_date=now, version=F('version') + 1
+        )
+        wallet.release_held_earnings(codes)
+        metrics.record_released(codes)
+    return len(codes)
+
+
+def release_due_orders(chunk_size=RELEASE_CHUNK_SIZE):
+    """
+    Hoàn thành các đơn đã giao, hết thời gian bảo hành (Product.warranty_days tính từ lúc giao) mà không bị khiếu nại:
+    chuyển sang completed, ghi released_at và cộng tiền đang giữ cho seller.
+    Xử lý theo từng chunk, không giữ transaction dài nên chạy được trên bảng nhiều triệu đơn. Trả về số đơn đã giải ngân.
+    """
+    now = timezone.now()
+    before = now - timedelta(days=max(_shortest_warranty(), 0))
+    released = 0
+    after = None
+    while True:
+        rows = _due_candidates(before, after, chunk_size)
+        if not rows:
+            return released
+        last_code, last_delivered_at, _ = rows[-1]
+        after = (last_delivered_at, last_code)
+        due = [code for code, delivered_at, days in rows if delivered_at + timedelta(days=days) <= now]
+        if due:
+            released += _release(due, now)
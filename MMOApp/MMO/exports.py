@@ -0,0 +1,224 @@
+import csv
+import gzip
+import os
+import uuid
+from datetime import datetime, timedelta
+from functools import reduce
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models as db_models
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from . import jobs, models
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow không bắt buộc, thiếu thì chỉ xuất được CSV
+    pa = pq = None
+
+CHUNK_SIZE = 2000
+EXPORT_ROOT = Path(getattr(settings, 'EXPORT_ROOT', settings.BASE_DIR / 'exports'))  # thư mục chứa file của ExportJob
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 10000)  # số dòng mỗi query / mỗi row group Parquet
+
+
+class _Echo:
+    # csv.writer ghi vào đây và nhận lại chính dòng đã format, để yield từng dòng
+    def write(self, value):
+        return value
+
+
+def _after(order, last):
+    # Điều kiện keyset (f1, f2, ...) > (v1, v2, ...) không cần so sánh tuple trong SQL
+    conditions = []
+    for i, name in enumerate(order):
+        equal = {order[j]: last[j] for j in range(i)}
+        conditions.append(Q(**equal, **{f"{name}__gt": last[i]}))
+    return reduce(lambda a, b: a | b, conditions)
+
+
+def iter_chunks(queryset, fields, order=('pk',), chunk_size=CHUNK_SIZE):
+    """
+    Duyệt queryset theo từng chunk bằng keyset trên các cột order (mỗi chunk 1 query có LIMIT, dùng index),
+    mỗi chunk là list tuple giá trị fields (đường dẫn kiểu product__name, JOIN trong cùng query, không N+1).
+    Bộ nhớ không phụ thuộc số dòng, kể cả với driver MySQL đọc hết kết quả của một query vào bộ nhớ.
+    """
+    queryset = queryset.order_by(*order)
+    offset = len(order)
+    last = None
+    while True:
+        chunk = queryset.filter(_after(order, last)) if last else queryset
+        rows = list(chunk.values_list(*order, *fields)[:chunk_size])
+        if not rows:
+            return
+        yield [row[offset:] for row in rows]
+        last = rows[-1][:offset]
+
+
+def iter_rows(queryset, fields, order=('pk',), chunk_size=CHUNK_SIZE):
+    for chunk in iter_chunks(queryset, fields, order, chunk_size):
+        yield from chunk
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_csv(queryset, filename, columns, chunk_size=CHUNK_SIZE):
+    """
+    Response CSV stream theo từng dòng: byte đầu tiên gửi ngay, bộ nhớ cố định dù xuất hàng trăm nghìn dòng.
+    columns: danh sách (tiêu đề, đường dẫn field).
+    """
+    header = [title for title, _ in columns]
+    rows = iter_rows(queryset, [field for _, field in columns], chunk_size=chunk_size)
+    response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Dữ liệu xuất được của ExportJob: kind -> (model, [(tiêu đề, đường dẫn field)])
+EXPORTS = {
+    'transactions': (models.TransactionHistory, [
+        ('Mã giao dịch', 'transaction_code'),
+        ('Mã user', 'user__user_code'),
+        ('User', 'user__username'),
+        ('Loại', 'type'),
+        ('Số tiền', 'amount'),
+        ('Ghi chú', 'note'),
+        ('Thời gian', 'created_date'),
+    ]),
+    'deposits': (models.DepositRequest, [
+        ('Mã nạp', 'deposit_code'),
+        ('Mã user', 'user__user_code'),
+        ('User', 'user__username'),
+        ('Số tiền', 'amount'),
+        ('Mã chuyển khoản', 'transaction_code'),
+        ('Trạng thái', 'status'),
+        ('Thời gian tạo', 'created_date'),
+        ('Cập nhật', 'updated_date'),
+    ]),
+    'withdraws': (models.WithdrawRequest, [
+        ('Mã rút', 'withdraw_code'),
+        ('Mã user', 'user__user_code'),
+        ('User', 'user__username'),
+        ('Số tiền', 'amount'),
+        ('Trạng thái', 'status'),
+        ('Thời gian tạo', 'created_date'),
+        ('Cập nhật', 'updated_date'),
+    ]),
+    'orders': (models.Order, [
+        ('Mã đơn', 'order_code'),
+        ('Người mua', 'buyer__username'),
+        ('Store', 'store__store_code'),
+        ('Voucher', 'voucher__code'),
+        ('Trạng thái', 'status'),
+        ('Đã thanh toán', 'is_paid'),
+        ('Tổng tiền acc', 'acc_detail__total_amount'),
+        ('Tổng tiền dịch vụ', 'service_detail__total_amount'),
+        ('Giải ngân lúc', 'released_at'),
+        ('Thời gian tạo', 'created_date'),
+    ]),
+}
+EXTENSIONS = {'csv': 'csv.gz', 'parquet': 'parquet'}
+
+
+def formats():
+    # Định dạng dùng được trên máy này (Parquet cần pyarrow)
+    return [value for value, _ in models.ExportJob.FORMAT_CHOICES if value != 'parquet' or pa is not None]
+
+
+def _write_csv(path, model, columns, chunks):
+    with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([title for title, _ in columns])
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield len(chunk)
+
+
+def _arrow_type(model, path):
+    # Kiểu cột Parquet theo field của model (đi theo quan hệ product__store__name)
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.get_field(name)
+    if isinstance(field, db_models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, db_models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, db_models.DateField):
+        return pa.date32()
+    if isinstance(field, db_models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, db_models.IntegerField):
+        return pa.int64()
+    return pa.string()
+
+
+def _write_parquet(path, model, columns, chunks):
+    if pa is None:
+        raise ImproperlyConfigured("Cần cài pyarrow để xuất Parquet")
+    # Tên cột Parquet là đường dẫn field (không dấu), kiểu cố định theo model để mọi row group cùng schema
+    schema = pa.schema([(field, _arrow_type(model, field)) for _, field in columns])
+    writer = pq.ParquetWriter(path, schema)
+    try:
+        for chunk in chunks:
+            arrays = [pa.array(values, type=type_) for values, type_ in zip(zip(*chunk), schema.types)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield len(chunk)
+    finally:
+        writer.close()
+
+
+WRITERS = {'csv': _write_csv, 'parquet': _write_parquet}
+
+
+def export_path(export):
+    return EXPORT_ROOT / export.file_name
+
+
+def run_export(export):
+    """
+    Ghi file cho ExportJob: quét index created_date trong [date_from, date_to] theo keyset (created_date, pk),
+    từng chunk EXPORT_CHUNK_SIZE dòng, ghi thẳng ra file nén và cập nhật tiến độ (rows) sau mỗi chunk.
+    Ghi vào file .part rồi đổi tên, nên file đã xong không bao giờ ở trạng thái ghi dở.
+    """
+    model, columns = EXPORTS[export.kind]
+    start = timezone.make_aware(datetime.combine(export.date_from, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(export.date_to + timedelta(days=1), datetime.min.time()))
+    queryset = model.objects.filter(created_date__gte=start, created_date__lt=end)
+    name = f"{export.kind}_{export.date_from:%Y%m%d}_{export.date_to:%Y%m%d}_{export.pk}.{EXTENSIONS[export.format]}"
+    record = models.ExportJob.objects.filter(pk=export.pk)
+    record.update(status='running', rows=0, total_rows=queryset.count(), error='', file_name='', finished_at=None)
+
+    EXPORT_ROOT.mkdir(parents=True, exist_ok=True)
+    path = EXPORT_ROOT / name
+    # Tên tạm riêng cho mỗi lần chạy: worker (thread/process) nào lỡ chạy trùng job cũng không ghi chung 1 file
+    part = path.with_name(f"{name}.{uuid.uuid4().hex}.part")
+    chunks = iter_chunks(queryset, [field for _, field in columns], order=('created_date', 'pk'),
+                         chunk_size=EXPORT_CHUNK_SIZE)
+    rows = 0
+    try:
+        for count in WRITERS[export.format](part, model, columns, chunks):
+            rows += count
+            record.update(rows=rows)
+            jobs.heartbeat()  # còn đang ghi -> không bị requeue_stale() trả về hàng đợi sau LOCK_TIMEOUT
+        os.replace(part, path)
+    except Exception as exc:
+        part.unlink(missing_ok=True)
+        record.update(status='failed', error=str(exc)[:5000])
+        raise
+    record.update(status='done', rows=rows, file_name=name, finished_at=timezone.now())
+    return rows
+
+
+def remove_file(export):
+    if export.file_name:
+        export_path(export).unlink(missing_ok=True)
@@ -0,0 +1,103 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import models
+
+HEADER = 'Idempotency-Key'
+KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))  # thời gian lưu response để replay
+LOCK_TIMEOUT = getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', timedelta(minutes=2))  # request đang xử lý quá lâu -> coi như đã chết
+WAIT_SECONDS = getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)  # request trùng chờ request đầu tối đa bao lâu
+POLL_INTERVAL = 0.1
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict (multipart/form)
+        data = {k: v for k, v in data.lists()}
+    raw = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _acquire(user, key, fingerprint):
+    """
+    Giữ key cho request hiện tại (INSERT, unique theo user + key). Nếu key đã có thì chờ request đầu xử lý xong.
+    Trả về (record, created).
+    """
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        try:
+            with transaction.atomic():
+                return models.IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint), True
+        except IntegrityError:
+            pass
+
+        record = models.IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            continue  # request đầu lỗi và đã nhả key -> giành lại
+
+        now = timezone.now()
+        if record.created_date < now - KEY_TTL or (record.status_code is None and record.created_date < now - LOCK_TIMEOUT):
+            # Key đã hết hạn hoặc request đầu bị treo/chết giữa chừng
+            models.IdempotencyKey.objects.filter(pk=record.pk, status_code=record.status_code).delete()
+            continue
+
+        if record.status_code is not None or time.monotonic() >= deadline:
+            return record, False
+        time.sleep(POLL_INTERVAL)
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response({"detail": f"{HEADER} đã được dùng cho một request khác."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if record.status_code is None:
+        return Response({"detail": "Request với key này đang được xử lý, vui lòng thử lại sau."},
+                        status=status.HTTP_409_CONFLICT)
+    return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_method):
+    """
+    Decorator cho các API POST có trừ/cộng tiền. Client gửi header Idempotency-Key: request đầu tiên chạy bình thường
+    và lưu response; request lặp lại (retry do mạng chập chờn) được trả lại response cũ mà không chạy lại logic ghi.
+    Request trùng đến cùng lúc sẽ chờ kết quả của request đầu. Không gửi header thì hoạt động như cũ.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 64:
+            return Response({"detail": f"{HEADER} tối đa 64 ký tự."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = _fingerprint(request)
+        record, created = _acquire(request.user, key, fingerprint)
+        if not created:
+            return _replay(record, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            # Lỗi (validation, hết hàng, ...) đã rollback -> nhả key để client retry được
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['status_code', 'response_body'])
+        return response
+
+    return wrapper
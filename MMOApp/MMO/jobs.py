@@ -0,0 +1,114 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+BACKOFF_BASE = getattr(settings, 'JOB_BACKOFF_BASE', 30)  # giây, lần thử thứ n chờ BACKOFF_BASE * 2^(n-1)
+BACKOFF_MAX = getattr(settings, 'JOB_BACKOFF_MAX', 3600)
+LOCK_TIMEOUT = getattr(settings, 'JOB_LOCK_TIMEOUT', timedelta(minutes=10))  # worker giữ job quá lâu -> coi như đã chết
+
+_handlers = {}
+_local = threading.local()  # job đang chạy trên thread hiện tại (run_workers chạy nhiều worker là thread)
+
+
+def task(name):
+    # Đăng ký handler cho job: @jobs.task('send_order_email'), handler nhận payload dạng keyword arguments
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, delay=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Thêm job vào hàng đợi (1 câu INSERT). Gọi trong transaction của caller thì job chỉ được worker thấy
+    khi transaction commit, rollback thì job cũng mất theo.
+    """
+    run_at = timezone.now() + delay if delay else timezone.now()
+    return models.Job.objects.create(name=name, payload=payload or {}, run_at=run_at, max_attempts=max_attempts)
+
+
+def claim(batch_size=10):
+    """
+    Lấy tối đa batch_size job đến hạn và đánh dấu running. Dùng SKIP LOCKED nếu DB hỗ trợ
+    để nhiều worker chạy song song không lấy trùng job. Trả về danh sách Job.
+    """
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        qs = (models.Job.objects.select_for_update(skip_locked=skip_locked)
+              .filter(status='pending', run_at__lte=now).order_by('run_at'))
+        ids = list(qs.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        models.Job.objects.filter(id__in=ids, status='pending').update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        )
+    return list(models.Job.objects.filter(id__in=ids, status='running', locked_at=now).order_by('run_at'))
+
+
+def run(job):
+    # Chạy 1 job đã claim: thành công thì xoá, lỗi thì hẹn chạy lại (backoff) hoặc chuyển sang dead
+    _local.job = job
+    try:
+        handler = _handlers.get(job.name)
+        if handler is None:
+            raise LookupError(f"Không có handler cho job {job.name}")
+        handler(**job.payload)
+    except Exception:
+        _fail(job, traceback.format_exc())
+        return False
+    finally:
+        _local.job = None
+    models.Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def _fail(job, error, **guard):
+    # guard: điều kiện thêm cho câu UPDATE (requeue_stale chỉ ghi nếu job vẫn đúng như lúc đọc). Trả về số dòng đã cập nhật
+    if job.attempts >= job.max_attempts:
+        logger.error("Job %s (%s) failed %s times, moved to dead letter", job.pk, job.name, job.attempts)
+        status, run_at = 'dead', job.run_at
+    else:
+        delay = min(BACKOFF_BASE * 2 ** (job.attempts - 1), BACKOFF_MAX)
+        logger.warning("Job %s (%s) failed, retry in %ss", job.pk, job.name, delay)
+        status, run_at = 'pending', timezone.now() + timedelta(seconds=delay)
+    return models.Job.objects.filter(pk=job.pk, **guard).update(
+        status=status, run_at=run_at, locked_at=None, last_error=error[-5000:]
+    )
+
+
+def heartbeat():
+    # Job chạy lâu (vd. xuất file) gọi định kỳ để gia hạn locked_at, requeue_stale() không trả job còn sống về hàng đợi
+    job = getattr(_local, 'job', None)
+    if job is not None:
+        models.Job.objects.filter(pk=job.pk, status='running').update(locked_at=timezone.now())
+
+
+def requeue_stale():
+    """
+    Job đang running của worker đã chết (quá LOCK_TIMEOUT) được xử lý như 1 lần chạy lỗi qua _fail(): hết lượt thử thì
+    chuyển sang dead, còn lượt thì chờ backoff. Job làm worker crash (hết bộ nhớ, bị kill) không bị lặp lại mãi.
+    Chỉ ghi nếu job chưa được heartbeat/worker khác xử lý kể từ lúc đọc. Trả về số job đã xử lý.
+    """
+    cutoff = timezone.now() - LOCK_TIMEOUT
+    count = 0
+    for job in models.Job.objects.filter(status='running', locked_at__lt=cutoff):
+        error = f"Worker không phản hồi sau {LOCK_TIMEOUT} (locked_at={job.locked_at.isoformat()})"
+        count += _fail(job, error, status='running', locked_at=job.locked_at)
+    return count
+
+
+def retry(queryset):
+    # Cho job dead chạy lại từ đầu (dùng trong admin)
+    return queryset.filter(status='dead').update(status='pending', attempts=0, run_at=timezone.now(), last_error='')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from MMO.models import AccOrderDetail, Order, ServiceOrderDetail
+
+
+def store_subquery():
+    # Store lấy từ product của acc_detail, không có thì từ service_detail
+    return Coalesce(
+        Subquery(AccOrderDetail.objects.filter(order=OuterRef('pk')).values('product__store')[:1]),
+        Subquery(ServiceOrderDetail.objects.filter(order=OuterRef('pk')).values('product__store')[:1]),
+    )
+
+
+class Command(BaseCommand):
+    help = "Ghi Order.store cho các đơn cũ (tạo trước khi có cột store) từ product của detail"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Số đơn mỗi transaction")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last = ''
+        processed = 0
+
+        # Duyệt theo order_code (keyset), mỗi batch một UPDATE ... = (SELECT ...) trong transaction ngắn
+        while True:
+            codes = list(Order.objects.filter(store__isnull=True, order_code__gt=last)
+                         .order_by('order_code').values_list('order_code', flat=True)[:batch_size])
+            if not codes:
+                break
+            last = codes[-1]
+            with transaction.atomic():
+                processed += Order.objects.filter(order_code__in=codes, store__isnull=True).update(store=store_subquery())
+
+        remaining = Order.objects.filter(store__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xử lý {processed} đơn hàng, còn {remaining} đơn không xác định được store (chưa có detail)"
+        ))
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from MMO.models import CodeSequence, TransactionHistory
+from MMO.utils import CodeAllocator
+
+
+class Command(BaseCommand):
+    help = "Benchmark cấp mã song song: mỗi writer mô phỏng một worker process với allocator riêng"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=50)
+        parser.add_argument('--codes', type=int, default=1000, help="Số mã mỗi writer cấp")
+        parser.add_argument('--block-size', type=int, default=100)
+        parser.add_argument('--prefix', default='BM')
+
+    def handle(self, *args, **options):
+        writers = options['writers']
+        per_writer = options['codes']
+        prefix = options['prefix']
+
+        CodeSequence.objects.filter(prefix=prefix).delete()
+
+        results = [[] for _ in range(writers)]
+        errors = []
+        barrier = threading.Barrier(writers)
+
+        def run(idx):
+            allocator = CodeAllocator(block_size=options['block_size'])
+            try:
+                barrier.wait()
+                for _ in range(per_writer):
+                    results[idx].append(allocator.next_value(TransactionHistory, 'transaction_code', prefix))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(writers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        values = [v for chunk in results for v in chunk]
+        collisions = len(values) - len(set(values))
+
+        CodeSequence.objects.filter(prefix=prefix).delete()
+
+        self.stdout.write(f"Writers: {writers}, mã đã cấp: {len(values)}, lỗi: {len(errors)}")
+        self.stdout.write(f"Thời gian: {elapsed:.3f}s ({len(values) / elapsed:.0f} mã/s)")
+        if errors:
+            self.stdout.write(self.style.ERROR(f"Lỗi đầu tiên: {errors[0]!r}"))
+        if collisions:
+            self.stdout.write(self.style.ERROR(f"Trùng mã: {collisions}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Không có mã trùng"))
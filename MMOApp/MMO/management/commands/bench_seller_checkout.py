@@ -0,0 +1,77 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from MMO import models, wallet
+
+
+class Command(BaseCommand):
+    help = ("Benchmark nhiều buyer mua song song của cùng một seller: "
+            "cộng thẳng vào User.balance (direct) so với ghi PendingEarning (pending)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=50, help="Số đơn mỗi buyer")
+        parser.add_argument('--hold-ms', type=float, default=5.0,
+                            help="Thời gian giả lập phần còn lại của checkout trong cùng transaction")
+        parser.add_argument('--mode', choices=['direct', 'pending', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        modes = ['direct', 'pending'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            self._bench(mode, options)
+
+    def _bench(self, mode, options):
+        tag = uuid.uuid4().hex[:6]
+        seller = models.User.objects.create(username=f"bench_seller_{tag}", phone=f"9{tag}000", role='seller')
+        buyers = [models.User.objects.create(username=f"bench_buyer_{tag}_{i}", phone=f"8{tag}{i:03d}",
+                                             balance=Decimal(10 ** 9)) for i in range(options['buyers'])]
+        amount = Decimal(1000)
+        hold = options['hold_ms'] / 1000.0
+        barrier = threading.Barrier(len(buyers))
+        retries = [0]
+        lock = threading.Lock()
+
+        def run(buyer):
+            try:
+                barrier.wait()
+                done = 0
+                while done < options['orders']:
+                    try:
+                        with transaction.atomic():
+                            if mode == 'direct':
+                                wallet.transfer(buyer, seller, amount, 'bench', 'bench')
+                            else:
+                                wallet.pay_seller(buyer, seller, amount, 'bench', 'bench')
+                            time.sleep(hold)
+                        done += 1
+                    except OperationalError:  # deadlock/lock timeout -> thử lại như client
+                        with lock:
+                            retries[0] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(b,)) for b in buyers]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        wallet.rollup_pending_earnings()
+        seller.refresh_from_db()
+        orders = len(buyers) * options['orders']
+        expected = amount * orders
+
+        self.stdout.write(f"[{mode}] {orders} đơn trong {elapsed:.3f}s ({orders / elapsed:.1f} đơn/s), "
+                          f"retry: {retries[0]}, số dư seller: {seller.balance}")
+        if seller.balance != expected:
+            self.stdout.write(self.style.ERROR(f"[{mode}] Lệch số dư: mong đợi {expected}"))
+
+        for user in buyers + [seller]:
+            user.delete()
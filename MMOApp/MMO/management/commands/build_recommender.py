@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from MMO import recommender
+
+
+class Command(BaseCommand):
+    help = "Build model TF-IDF cho gợi ý sản phẩm và lưu ra RECOMMENDER_DIR (worker tự load bản mới)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help="Chỉ cập nhật sản phẩm đã đổi từ lần build trước, giữ nguyên từ điển/IDF")
+
+    def handle(self, *args, **options):
+        model = recommender.update() if options['incremental'] else recommender.build()
+        if model is None:
+            self.stdout.write(self.style.WARNING("Chưa có sản phẩm nào được duyệt, không build model"))
+            return
+        rows, terms = model.matrix.shape
+        self.stdout.write(self.style.SUCCESS(f"Model {model.version}: {rows} sản phẩm, {terms} từ"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from MMO import similarity
+
+
+class Command(BaseCommand):
+    help = "Tính top-K sản phẩm tương tự cho mọi sản phẩm (ProductSimilarity), chạy định kỳ sau build_recommender"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=similarity.TOP_K, help="Số sản phẩm tương tự giữ lại mỗi sản phẩm")
+        parser.add_argument('--chunk-size', type=int, default=similarity.CHUNK_SIZE,
+                            help="Số sản phẩm mỗi khối nhân ma trận")
+
+    def handle(self, *args, **options):
+        written = similarity.build(k=options['k'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {written} cặp sản phẩm tương tự"))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from MMO import reputation
+
+
+class Command(BaseCommand):
+    help = "Tính điểm uy tín và chỉ số xử lý đơn cho mọi store từ StoreDailyMetrics, ghi vào Store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=0, help="Chỉ tính số liệu N ngày gần nhất (0 = toàn bộ)")
+        parser.add_argument('--batch-size', type=int, default=reputation.UPDATE_BATCH_SIZE, help="Số store mỗi câu UPDATE")
+
+    def handle(self, *args, **options):
+        start_day = timezone.localdate() - timedelta(days=options['days'] - 1) if options['days'] else None
+        updated = reputation.update_all(start_day=start_day, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Đã cập nhật điểm uy tín cho {updated} store"))
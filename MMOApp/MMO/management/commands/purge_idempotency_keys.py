@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from MMO.idempotency import KEY_TTL
+from MMO.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Xoá các Idempotency-Key đã hết hạn"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - KEY_TTL
+        deleted = 0
+        while True:
+            ids = list(IdempotencyKey.objects.filter(created_date__lt=cutoff)
+                       .values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Đã xoá {deleted} Idempotency-Key hết hạn"))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from MMO.models import AccountStock, Product
+
+
+def unsold_count_subquery():
+    return Coalesce(
+        Subquery(
+            AccountStock.objects.filter(product=OuterRef('pk'), is_sold=False)
+            .order_by()
+            .values('product')
+            .annotate(n=Count('pk'))
+            .values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = "Tính lại Product.available_quantity từ bảng AccountStock"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', help="Chỉ tính lại cho một product_code")
+        parser.add_argument('--batch-size', type=int, default=500, help="Số product mỗi transaction")
+
+    def handle(self, *args, **options):
+        products = Product.objects.order_by('product_code')
+        if options['product']:
+            products = products.filter(product_code=options['product'])
+
+        codes = list(products.values_list('product_code', flat=True))
+        batch_size = options['batch_size']
+        updated = 0
+
+        # Mỗi batch một UPDATE ... = (SELECT COUNT(*) ...) để không giữ lock toàn bảng quá lâu
+        for i in range(0, len(codes), batch_size):
+            with transaction.atomic():
+                updated += Product.objects.filter(product_code__in=codes[i:i + batch_size]).update(
+                    available_quantity=unsold_count_subquery()
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Đã tính lại available_quantity cho {updated} sản phẩm"))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from MMO import metrics
+
+
+class Command(BaseCommand):
+    help = ("Tính lại StoreDailyMetrics từ đơn hàng/đánh giá gốc (chạy hằng đêm, hoặc --from/--to để backfill). "
+            "Lần deploy đầu: chạy backfill_order_store rồi --all để có toàn bộ lịch sử")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help="Số ngày gần nhất cần đối soát (trạng thái đơn còn đổi đến khi hết bảo hành)")
+        parser.add_argument('--from', dest='date_from', help="Ngày bắt đầu YYYY-MM-DD")
+        parser.add_argument('--to', dest='date_to', help="Ngày kết thúc YYYY-MM-DD (mặc định hôm nay)")
+        parser.add_argument('--all', action='store_true', help="Từ ngày có đơn/đánh giá đầu tiên (backfill lần đầu)")
+
+    def handle(self, *args, **options):
+        end_day = parse_date(options['date_to']) if options['date_to'] else timezone.localdate()
+        if options['all']:
+            start_day = metrics.first_day()
+            if start_day is None:
+                self.stdout.write("Chưa có đơn hàng/đánh giá nào, không có gì để tính")
+                return
+        elif options['date_from']:
+            start_day = parse_date(options['date_from'])
+        else:
+            start_day = end_day - timedelta(days=options['days'] - 1)
+        if not start_day or not end_day or start_day > end_day:
+            raise CommandError("Khoảng ngày không hợp lệ")
+
+        written = metrics.reconcile(start_day, end_day)
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {written} dòng số liệu từ {start_day} đến {end_day}"))
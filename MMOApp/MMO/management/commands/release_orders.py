@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MMO import escrow
+
+
+class Command(BaseCommand):
+    help = "Hoàn thành các đơn đã hết bảo hành mà không bị khiếu nại và giải ngân tiền đang giữ cho seller"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=escrow.RELEASE_CHUNK_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục")
+        parser.add_argument('--interval', type=float, default=300.0, help="Số giây nghỉ giữa 2 lần quét khi --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            released = escrow.release_due_orders(chunk_size=options['chunk_size'])
+            if released or not options['loop']:
+                self.stdout.write(f"Đã giải ngân {released} đơn hàng")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
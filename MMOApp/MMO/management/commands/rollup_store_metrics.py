@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MMO import metrics
+
+
+class Command(BaseCommand):
+    help = "Gom StoreMetricsDelta (thay đổi số liệu chờ cộng) vào StoreDailyMetrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục")
+        parser.add_argument('--interval', type=float, default=5.0, help="Số giây nghỉ giữa 2 lần gom khi --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            folded = metrics.rollup(batch_size=options['batch_size'])
+            if folded or not options['loop']:
+                self.stdout.write(f"Đã gom {folded} thay đổi số liệu store")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,72 @@
+import logging
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from MMO import jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Chạy worker xử lý hàng đợi job nền (email đơn hàng, ...), lỗi thì thử lại theo backoff rồi chuyển sang dead"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Số thread worker")
+        parser.add_argument('--batch-size', type=int, default=10, help="Số job mỗi worker lấy một lần")
+        parser.add_argument('--interval', type=float, default=1.0, help="Số giây nghỉ khi hàng đợi trống")
+        parser.add_argument('--once', action='store_true', help="Chạy hết job đến hạn rồi thoát")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        done = [0]
+        failed = [0]
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        batch = jobs.claim(options['batch_size'])
+                        if not batch and not options['once']:
+                            jobs.requeue_stale()
+                    except DatabaseError:
+                        # mất kết nối/deadlock: đóng connection và thử lại ở vòng sau
+                        logger.exception("Claim jobs failed")
+                        connections.close_all()
+                        stop.wait(options['interval'])
+                        continue
+                    if not batch:
+                        if options['once']:
+                            return
+                        stop.wait(options['interval'])
+                        continue
+                    for job in batch:
+                        try:
+                            ok = jobs.run(job)
+                        except DatabaseError:
+                            # không ghi được kết quả: job giữ trạng thái running, requeue_stale() sẽ trả lại hàng đợi
+                            logger.exception("Job %s bookkeeping failed", job.pk)
+                            connections.close_all()
+                            ok = False
+                        with lock:
+                            (done if ok else failed)[0] += 1
+            finally:
+                connections.close_all()
+
+        jobs.requeue_stale()
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(options['workers'])]
+        for t in threads:
+            t.start()
+        self.stdout.write(f"Đã chạy {options['workers']} worker")
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()  # chờ các job đang chạy xong rồi thoát
+            for t in threads:
+                t.join()
+
+        self.stdout.write(f"Xong {done[0]} job, lỗi {failed[0]} job")
@@ -0,0 +1,79 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from rest_framework.exceptions import ValidationError
+
+from MMO import models, stocks
+
+
+class Command(BaseCommand):
+    help = "Stress test claim_stocks: nhiều buyer song song mua cùng một product, kiểm tra không tài khoản nào bị bán 2 lần"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=20)
+        parser.add_argument('--stocks', type=int, default=2000)
+        parser.add_argument('--qty', type=int, default=7, help="Số tài khoản mỗi lần mua")
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        seller = models.User.objects.create(username=f"stress_{tag}", phone=tag[:8] + '00', role='seller')
+        try:
+            store = models.Store.objects.create(seller=seller, name=f"Stress {tag}", description='stress test')
+            product = models.Product.objects.create(store=store, name='Stress product', image='stress', description='',
+                                                    price=0, format='TK|MK', type='account')
+            stocks.import_stocks(product, (f"user{i}|pass{i}" for i in range(options['stocks'])))
+            self._run(product, options)
+        finally:
+            seller.delete()
+
+    def _run(self, product, options):
+        delivered = []
+        retries = [0]
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['buyers'])
+
+        def buyer():
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        with transaction.atomic():
+                            contents = stocks.claim_stocks(product, options['qty'])
+                    except ValidationError:
+                        if product.stocks.filter(is_sold=False).count() < options['qty']:
+                            return  # hết hàng
+                        with lock:
+                            retries[0] += 1
+                        continue
+                    except OperationalError:  # sqlite: database is locked
+                        with lock:
+                            retries[0] += 1
+                        continue
+                    with lock:
+                        delivered.extend(contents)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buyer) for _ in range(options['buyers'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        duplicates = len(delivered) - len(set(delivered))
+        sold = product.stocks.filter(is_sold=True).count()
+        product.refresh_from_db()
+        remaining = product.stocks.filter(is_sold=False).count()
+
+        self.stdout.write(f"Buyers: {options['buyers']}, đã giao: {len(delivered)}, đã bán trong DB: {sold}, "
+                          f"còn lại: {remaining} (counter: {product.available_quantity}), retry: {retries[0]}, "
+                          f"thời gian: {elapsed:.3f}s")
+        if duplicates or sold != len(delivered) or remaining != product.available_quantity:
+            self.stdout.write(self.style.ERROR(f"LỖI: {duplicates} tài khoản bị giao trùng hoặc counter lệch"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Không tài khoản nào bị bán 2 lần"))
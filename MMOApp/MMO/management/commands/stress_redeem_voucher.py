@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from MMO import models, vouchers
+
+
+class Command(BaseCommand):
+    help = "Load test trừ lượt voucher: nhiều request song song dùng cùng một voucher, kiểm tra không bị dùng quá số lượt"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=500, help="Tổng số lượt dùng voucher")
+        parser.add_argument('--quantity', type=int, default=100, help="Số lượt của voucher")
+        parser.add_argument('--workers', type=int, default=50, help="Số thread (connection DB) chạy song song")
+        parser.add_argument('--no-limiter', action='store_true', help="Tắt bộ đếm token để so sánh")
+
+    def handle(self, *args, **options):
+        vouchers.LIMITER_ENABLED = not options['no_limiter']
+        tag = uuid.uuid4().hex[:8]
+        seller = models.User.objects.create(username=f"stress_{tag}", phone=tag[:8] + '00', role='seller')
+        try:
+            store = models.Store.objects.create(seller=seller, name=f"Stress {tag}", description='stress test')
+            voucher = models.Voucher.objects.create(store=store, code=f"FLASH{tag}".upper()[:20], discount_percent=10,
+                                                    expired_at=timezone.now() + timedelta(hours=1),
+                                                    quantity=options['quantity'])
+            vouchers.reset_limiter(voucher.voucher_code)
+            self._run(store, voucher, options)
+        finally:
+            seller.delete()
+
+    def _run(self, store, voucher, options):
+        redeemed = [0]
+        rejected = [0]
+        retries = [0]
+        lock = threading.Lock()
+        workers = min(options['workers'], options['attempts'])
+        barrier = threading.Barrier(workers)
+        local = threading.local()
+
+        def redeem(_):
+            if not getattr(local, 'ready', False):
+                local.ready = True
+                barrier.wait()  # các thread bắt đầu cùng lúc
+            while True:
+                try:
+                    vouchers.reserve_voucher(voucher.code, store=store)
+                except ValidationError:
+                    counter = rejected
+                except OperationalError:  # sqlite: database is locked
+                    with lock:
+                        retries[0] += 1
+                    continue
+                else:
+                    counter = redeemed
+                with lock:
+                    counter[0] += 1
+                return
+
+        def close_connections(_):
+            barrier.wait()
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(redeem, range(options['attempts'])))
+            list(pool.map(close_connections, range(workers)))
+        elapsed = time.perf_counter() - started
+
+        voucher.refresh_from_db()
+        self.stdout.write(f"Lượt thử: {options['attempts']}, thành công: {redeemed[0]}, bị từ chối: {rejected[0]}, "
+                          f"còn lại trong DB: {voucher.quantity}, retry: {retries[0]}, "
+                          f"limiter: {'bật' if vouchers.LIMITER_ENABLED else 'tắt'}, thời gian: {elapsed:.3f}s")
+        if redeemed[0] != options['quantity'] - voucher.quantity or voucher.quantity < 0:
+            self.stdout.write(self.style.ERROR("LỖI: số lượt đã dùng không khớp với DB"))
+        elif redeemed[0] > options['quantity']:
+            self.stdout.write(self.style.ERROR("LỖI: voucher bị dùng quá số lượt"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Voucher không bị dùng quá số lượt"))
@@ -0,0 +1,272 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DurationField, Exists, ExpressionWrapper, F, Max, Min, OuterRef, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import catalog_cache, models
+
+# Số liệu theo ngày của store (StoreDailyMetrics), cộng dồn theo sự kiện đơn hàng/đánh giá.
+# Đơn tính vào ngày tạo đơn (giống thống kê cũ lọc theo Order.created_date), đánh giá tính vào ngày tạo đánh giá;
+# đơn bị ẩn (active=False) không được tính, như thống kê cũ.
+# Mỗi sự kiện chỉ INSERT 1 dòng StoreMetricsDelta trong transaction của nó: checkout song song của cùng store không
+# phải xếp hàng UPDATE dòng (store, hôm nay). rollup() (manage.py rollup_store_metrics --loop) gom các delta vào
+# StoreDailyMetrics, dashboard trễ tối đa 1 chu kỳ gom. reconcile() (manage.py reconcile_store_metrics) tính lại
+# từ dữ liệu gốc.
+# Bảng chỉ có số liệu từ lúc deploy: phải chạy 1 lần `reconcile_store_metrics --all` (sau backfill_order_store)
+# để có lịch sử, nếu không dashboard và điểm uy tín (MMO.reputation) của đơn cũ đều bằng 0.
+
+FULFILLED = {'delivered', 'completed'}
+STATS_TTL = getattr(settings, 'ORDER_STATS_CACHE_TTL', 300)  # giây giữ kết quả OrderStatsAPIView
+BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+COUNTERS = ('orders', 'acc_orders', 'service_orders', 'fulfilled_orders', 'refunded_orders', 'complained_orders',
+            'acc_revenue', 'service_revenue', 'rating_sum', 'rating_count', 'delivery_seconds', 'delivery_count')
+
+
+def _add(store_id, day, **deltas):
+    deltas = {name: value for name, value in deltas.items() if value}
+    if store_id and deltas:
+        models.StoreMetricsDelta.objects.create(store_id=store_id, day=day, **deltas)
+
+
+def _apply(store_id, day, deltas):
+    # Cộng 1 lần tổng delta của (store, ngày) vào StoreDailyMetrics, chỉ worker rollup ghi dòng này
+    values = {name: F(name) + value for name, value in deltas.items()}
+    qs = models.StoreDailyMetrics.objects.filter(store_id=store_id, day=day)
+    if not qs.update(updated_date=timezone.now(), **values):
+        try:
+            with transaction.atomic():
+                models.StoreDailyMetrics.objects.create(store_id=store_id, day=day, **deltas)
+        except IntegrityError:  # reconcile vừa tạo dòng này
+            qs.update(updated_date=timezone.now(), **values)
+
+
+def rollup(batch_size=1000):
+    """
+    Gom StoreMetricsDelta vào StoreDailyMetrics theo từng batch (mỗi batch 1 transaction ngắn, 1 UPDATE cho mỗi
+    (store, ngày)). Dùng SKIP LOCKED nếu DB hỗ trợ để nhiều tiến trình gom chạy song song được. Trả về số delta đã gom.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    folded = 0
+    while True:
+        with transaction.atomic():
+            ids = list(models.StoreMetricsDelta.objects.select_for_update(skip_locked=skip_locked)
+                       .order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return folded
+            totals = (models.StoreMetricsDelta.objects.filter(id__in=ids).values('store', 'day')
+                      .annotate(**{name: Sum(name) for name in COUNTERS}).order_by('store', 'day'))
+            stores = set()
+            for row in totals:
+                store_id, day = row.pop('store'), row.pop('day')
+                _apply(store_id, day, {name: value for name, value in row.items() if value})
+                stores.add(store_id)
+            models.StoreMetricsDelta.objects.filter(id__in=ids).delete()
+        catalog_cache.bump(*(stats_scope(store_id) for store_id in stores))  # số liệu store đổi -> bỏ thống kê đã cache
+        folded += len(ids)
+
+
+def _status_deltas(old, new):
+    return {
+        'fulfilled_orders': int(new in FULFILLED) - int(old in FULFILLED),
+        'refunded_orders': int(new == 'refunded') - int(old == 'refunded'),
+        'complained_orders': int(new == 'complained' and old != 'complained'),  # mỗi đơn chỉ khiếu nại được 1 lần
+    }
+
+
+def _order_deltas(order, detail, status):
+    # Toàn bộ phần của 1 đơn trong số liệu ngày tạo đơn khi đơn đang ở trạng thái status
+    is_service = isinstance(detail, models.ServiceOrderDetail)
+    return {
+        'orders': 1,
+        'acc_orders': int(not is_service),
+        'service_orders': int(is_service),
+        'acc_revenue': 0 if is_service else detail.total_amount,
+        'service_revenue': detail.total_amount if is_service else 0,
+        **_status_deltas(None, status),
+    }
+
+
+def record_order(detail):
+    # Detail vừa tạo: đơn được tính cho store từ lúc này (trước đó chưa biết store)
+    order = detail.order
+    if order.active:
+        _add(order.store_id, timezone.localdate(order.created_date), **_order_deltas(order, detail, order.status))
+
+
+def record_status(order, old, new):
+    if old == new or not order.active:
+        return
+    deltas = _status_deltas(old, new)
+    if new == 'completed' and order.released_at:
+        deltas['delivery_seconds'] = int((order.released_at - order.created_date).total_seconds())
+        deltas['delivery_count'] = 1
+    _add(order.store_id, timezone.localdate(order.created_date), **deltas)
+
+
+def record_active(order, old_status):
+    # Admin ẩn/hiện đơn (Order.active): trừ/cộng lại toàn bộ phần của đơn, ẩn thì tính theo trạng thái trước khi lưu
+    detail = getattr(order, 'acc_detail', None) or getattr(order, 'service_detail', None)
+    if detail is None:
+        return
+    status = order.status if order.active else old_status
+    deltas = _order_deltas(order, detail, status)
+    if status != 'complained' and models.Complaint.objects.filter(order=order).exists():
+        deltas['complained_orders'] = 1
+    if status == 'completed' and order.released_at:
+        deltas['delivery_seconds'] = int((order.released_at - order.created_date).total_seconds())
+        deltas['delivery_count'] = 1
+    sign = 1 if order.active else -1
+    _add(order.store_id, timezone.localdate(order.created_date), **{name: sign * value for name, value in deltas.items()})
+
+
+def record_released(order_codes):
+    # Escrow giải ngân hàng loạt (delivered -> completed): chỉ cộng thời gian giao, gộp theo (store, ngày)
+    totals = defaultdict(lambda: [0, 0])
+    rows = models.Order.objects.filter(order_code__in=order_codes, active=True, released_at__isnull=False).values_list(
+        'store_id', 'created_date', 'released_at')
+    for store_id, created_date, released_at in rows:
+        total = totals[(store_id, timezone.localdate(created_date))]
+        total[0] += int((released_at - created_date).total_seconds())
+        total[1] += 1
+    for (store_id, day), (seconds, count) in totals.items():
+        _add(store_id, day, delivery_seconds=seconds, delivery_count=count)
+
+
+def record_review(review, sign=1):
+    store_id = models.Product.objects.filter(pk=review.product_id).values_list('store_id', flat=True).first()
+    _add(store_id, timezone.localdate(review.created_date), rating_sum=sign * review.rating, rating_count=sign)
+
+
+def _day_range(day):
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+
+def _compute_day(day):
+    # Tính lại số liệu 1 ngày của mọi store từ dữ liệu gốc bằng 2 query group theo store
+    start, end = _day_range(day)
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    orders = (models.Order.objects.filter(store__isnull=False, active=True, created_date__gte=start, created_date__lt=end)
+              .annotate(has_complaint=Exists(models.Complaint.objects.filter(order=OuterRef('pk'))))
+              .values('store')
+              .annotate(orders=Count('pk'),
+                        acc_orders=Count('acc_detail'),
+                        service_orders=Count('service_detail'),
+                        fulfilled_orders=Count('pk', filter=Q(status__in=FULFILLED)),
+                        refunded_orders=Count('pk', filter=Q(status='refunded')),
+                        complained_orders=Count('pk', filter=Q(has_complaint=True) | Q(status='complained')),
+                        acc_revenue=Sum('acc_detail__total_amount'),
+                        service_revenue=Sum('service_detail__total_amount'),
+                        delivery=Sum(ExpressionWrapper(F('released_at') - F('created_date'), output_field=DurationField()),
+                                     filter=Q(status='completed', released_at__isnull=False)),
+                        delivery_count=Count('pk', filter=Q(status='completed', released_at__isnull=False))))
+    for row in orders:
+        delivery = row.pop('delivery')
+        store_id = row.pop('store')
+        row['delivery_seconds'] = int(delivery.total_seconds()) if delivery else 0
+        rows[store_id].update({name: value or 0 for name, value in row.items()})
+
+    reviews = (models.Review.objects.filter(created_date__gte=start, created_date__lt=end)
+               .values('product__store')
+               .annotate(rating_sum=Sum('rating'), rating_count=Count('pk')))
+    for row in reviews:
+        rows[row['product__store']].update(rating_sum=row['rating_sum'] or 0, rating_count=row['rating_count'])
+
+    return rows
+
+
+def first_day():
+    # Ngày sớm nhất có dữ liệu gốc (đơn hoặc đánh giá), None nếu chưa có
+    firsts = [queryset.aggregate(first=Min('created_date'))['first'] for queryset in (models.Order.objects, models.Review.objects)]
+    firsts = [first for first in firsts if first]
+    return timezone.localdate(min(firsts)) if firsts else None
+
+
+def reconcile(start_day, end_day):
+    """
+    Đối soát StoreDailyMetrics trong [start_day, end_day] với dữ liệu gốc, mỗi ngày 1 transaction ngắn.
+    Trả về số dòng đã ghi.
+    """
+    written = 0
+    day = start_day
+    while day <= end_day:
+        # Delta đã có trước khi đọc dữ liệu gốc thì đã nằm trong kết quả tính lại -> xoá, không gom thêm lần nữa
+        seen = models.StoreMetricsDelta.objects.filter(day=day).aggregate(last=Max('id'))['last']
+        rows = _compute_day(day)
+        with transaction.atomic():
+            if seen:
+                models.StoreMetricsDelta.objects.filter(day=day, id__lte=seen).delete()
+            existing = models.StoreDailyMetrics.objects.filter(day=day)
+            stores = set(existing.values_list('store_id', flat=True)) | {store_id for store_id in rows if store_id}
+            existing.delete()
+            models.StoreDailyMetrics.objects.bulk_create([
+                models.StoreDailyMetrics(store_id=store_id, day=day, **values)
+                for store_id, values in rows.items() if store_id
+            ])
+        catalog_cache.bump(*(stats_scope(store_id) for store_id in stores))
+        written += len(rows)
+        day += timedelta(days=1)
+    return written
+
+
+def daily_rows(store, start_day, end_day):
+    return list(models.StoreDailyMetrics.objects.filter(store=store, day__range=(start_day, end_day)).order_by('day'))
+
+
+def totals(rows):
+    return {name: sum(getattr(row, name) for row in rows) for name in COUNTERS}
+
+
+def stats_scope(store_id):
+    return f"stats:{store_id}"
+
+
+def _stats_values(rows):
+    stats = {name: value or 0 for name, value in rows.items()}
+    stats['total_revenue'] = stats['acc_revenue'] + stats['service_revenue']
+    return stats
+
+
+def store_stats(store_id, start_day=None, end_day=None, bucket=None):
+    """
+    Tổng số đơn/doanh thu của store trong [start_day, end_day] (None = không giới hạn), kèm 'series' theo
+    bucket (day/week/month) nếu có. 1 query trên StoreDailyMetrics (SUM, GROUP BY bucket trong DB),
+    cache theo (store, khoảng ngày, bucket) đến khi số liệu store đổi.
+    """
+    key = f"store_stats:{store_id}:{start_day}:{end_day}:{bucket}:{catalog_cache.current_version(stats_scope(store_id))}"
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    rows = models.StoreDailyMetrics.objects.filter(store_id=store_id)
+    if start_day:
+        rows = rows.filter(day__gte=start_day)
+    if end_day:
+        rows = rows.filter(day__lte=end_day)
+    sums = {
+        'total_orders': Sum('orders'),
+        'acc_orders': Sum('acc_orders'),
+        'service_orders': Sum('service_orders'),
+        'acc_revenue': Sum('acc_revenue'),
+        'service_revenue': Sum('service_revenue'),
+    }
+
+    if bucket:
+        series = [
+            {'period': row.pop('period'), **_stats_values(row)}
+            for row in rows.annotate(period=BUCKETS[bucket]('day')).values('period').annotate(**sums).order_by('period')
+        ]
+        # Tổng = cộng các bucket, không cần query thứ 2
+        stats = _stats_values({name: sum(point[name] for point in series) for name in sums})
+        stats['series'] = series
+    else:
+        stats = _stats_values(rows.aggregate(**sums))
+
+    cache.set(key, stats, STATS_TTL)
+    return stats
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_available_quantity(apps, schema_editor):
+    Product = apps.get_model('MMO', 'Product')
+    AccountStock = apps.get_model('MMO', 'AccountStock')
+    unsold = (AccountStock.objects.filter(product=OuterRef('pk'), is_sold=False)
+              .order_by().values('product').annotate(n=Count('pk')).values('n'))
+    Product.objects.update(available_quantity=Coalesce(Subquery(unsold, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0046_codesequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='available_quantity',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_available_quantity, migrations.RunPython.noop),
+    ]
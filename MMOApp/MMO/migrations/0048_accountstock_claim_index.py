@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0047_product_available_quantity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accountstock',
+            index=models.Index(fields=['product', 'is_sold', 'created_date'], name='MMO_account_product_0b7941_idx'),
+        ),
+    ]
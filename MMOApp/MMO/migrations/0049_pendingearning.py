@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0048_accountstock_claim_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingEarning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=0, max_digits=12)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_earnings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0051_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingearning',
+            name='held',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='pendingearning',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings', to='MMO.order'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'updated_date', 'order_code'], name='MMO_order_status_d8bfb9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingearning',
+            index=models.Index(fields=['held', 'id'], name='MMO_pending_held_9982d1_idx'),
+        ),
+    ]
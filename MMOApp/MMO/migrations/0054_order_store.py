@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0053_order_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='MMO.store'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['store', 'status', 'created_date'], name='MMO_order_store_i_c788bb_idx'),
+        ),
+    ]
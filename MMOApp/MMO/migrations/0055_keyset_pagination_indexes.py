@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0054_order_store'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['store', 'created_date'], name='MMO_order_store_i_92e59c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer', 'created_date'], name='MMO_order_buyer_i_bb6e6b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['active', 'is_approved', 'created_date'], name='MMO_product_active_dc777e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', 'created_date'], name='MMO_product_store_i_7c372e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionhistory',
+            index=models.Index(fields=['user', 'created_date'], name='MMO_transac_user_id_f66245_idx'),
+        ),
+    ]
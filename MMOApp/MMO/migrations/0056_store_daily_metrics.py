@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0055_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreDailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('acc_orders', models.IntegerField(default=0)),
+                ('service_orders', models.IntegerField(default=0)),
+                ('fulfilled_orders', models.IntegerField(default=0)),
+                ('refunded_orders', models.IntegerField(default=0)),
+                ('complained_orders', models.IntegerField(default=0)),
+                ('acc_revenue', models.DecimalField(decimal_places=0, default=0, max_digits=16)),
+                ('service_revenue', models.DecimalField(decimal_places=0, default=0, max_digits=16)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('delivery_seconds', models.BigIntegerField(default=0)),
+                ('delivery_count', models.IntegerField(default=0)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='MMO.store')),
+            ],
+            options={
+                'unique_together': {('store', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0056_store_daily_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='avg_delivery_hours',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='avg_rating',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='complaint_rate',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='fulfill_rate',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='order_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='refund_rate',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='reputation',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='reputation_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
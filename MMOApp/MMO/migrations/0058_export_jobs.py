@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0057_store_reputation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('transactions', 'Lịch sử giao dịch'), ('deposits', 'Yêu cầu nạp tiền'), ('withdraws', 'Yêu cầu rút tiền'), ('orders', 'Đơn hàng')], max_length=20)),
+                ('format', models.CharField(choices=[('csv', 'CSV (gzip)'), ('parquet', 'Parquet')], default='csv', max_length=10)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Chờ chạy'), ('running', 'Đang chạy'), ('done', 'Hoàn thành'), ('failed', 'Lỗi')], default='pending', max_length=10)),
+                ('total_rows', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('rows', models.PositiveBigIntegerField(default=0)),
+                ('file_name', models.CharField(blank=True, default='', max_length=255)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='depositrequest',
+            index=models.Index(fields=['created_date'], name='MMO_deposit_created_28a085_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_date'], name='MMO_order_created_e37dba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionhistory',
+            index=models.Index(fields=['created_date'], name='MMO_transac_created_5ac64a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawrequest',
+            index=models.Index(fields=['created_date'], name='MMO_withdra_created_f86b2b_idx'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
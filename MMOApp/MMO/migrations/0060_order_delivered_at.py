@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_delivered_at(apps, schema_editor):
+    # Đơn cũ chưa ghi lúc giao: lấy updated_date (mốc escrow dùng trước đây) cho các đơn còn chờ giải ngân/xử lý khiếu nại
+    Order = apps.get_model('MMO', 'Order')
+    Order.objects.filter(status__in=['delivered', 'complained'], delivered_at__isnull=True).update(
+        delivered_at=F('updated_date')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0059_product_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_delivered_at, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='MMO_order_status_d8bfb9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'delivered_at', 'order_code'], name='MMO_order_status_fff001_idx'),
+        ),
+    ]
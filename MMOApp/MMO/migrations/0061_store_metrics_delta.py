@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MMO', '0060_order_delivered_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreMetricsDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('acc_orders', models.IntegerField(default=0)),
+                ('service_orders', models.IntegerField(default=0)),
+                ('fulfilled_orders', models.IntegerField(default=0)),
+                ('refunded_orders', models.IntegerField(default=0)),
+                ('complained_orders', models.IntegerField(default=0)),
+                ('acc_revenue', models.DecimalField(decimal_places=0, default=0, max_digits=16)),
+                ('service_revenue', models.DecimalField(decimal_places=0, default=0, max_digits=16)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('delivery_seconds', models.BigIntegerField(default=0)),
+                ('delivery_count', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='MMO.store')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -2,8 +2,11 @@ from decimal import Decimal
 
 from cloudinary.models import CloudinaryField
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from ckeditor.fields import RichTextField
 from .utils import generate_code
@@ -16,6 +19,15 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
+
+# Sequence cấp mã theo prefix (xem MMO.utils.CodeAllocator)
+class CodeSequence(models.Model):
+    prefix = models.CharField(primary_key=True, max_length=5)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix} - {self.last_value}"
+
 # User model
 class User(AbstractUser):
     user_code = models.CharField(primary_key=True, max_length=10, editable=False)
@@ -68,6 +80,15 @@ class Store(BaseModel):
     seller = models.OneToOneField(User, on_delete=models.CASCADE, limit_choices_to={'role': 'seller'}, related_name='store')
     name = models.CharField(max_length=100, null=False, blank=False)
     description = models.TextField()
+    # Điểm uy tín và chỉ số xử lý đơn, tính hàng loạt cho mọi store bằng manage.py compute_reputation (MMO.reputation)
+    reputation = models.FloatField(default=0, db_index=True, editable=False)
+    avg_rating = models.FloatField(default=0, editable=False)
+    order_count = models.IntegerField(default=0, editable=False)
+    fulfill_rate = models.FloatField(default=0, editable=False)
+    complaint_rate = models.FloatField(default=0, editable=False)
+    refund_rate = models.FloatField(default=0, editable=False)
+    avg_delivery_hours = models.FloatField(null=True, blank=True, editable=False)
+    reputation_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.store_code} - {self.name}"
@@ -88,18 +109,39 @@ class Product(BaseModel):
     price = models.DecimalField(max_digits=12, decimal_places=0, validators=[MinValueValidator(Decimal('0')), MaxValueValidator(Decimal('1000000000'))])
     format = models.TextField(help_text="Định dạng gửi về, ví dụ: TK|MK|Email|OTP")
     type = models.CharField(max_length=20, choices=[('account', 'Tài khoản'), ('service', 'Dịch vụ'), ('software', 'Phần mềm'), ('course', 'Khoá học')])
-    available_quantity = property(lambda self: self.stocks.filter(is_sold=False).count())
+    available_quantity = models.IntegerField(default=0, db_index=True, editable=False)  # số stock chưa bán, do AccountStock cập nhật
     warranty_days = models.IntegerField(default=3) # số ngày bảo hành
     is_approved = models.BooleanField(default=False)
 
+    class Meta:
+        # phân trang cursor theo created_date (MMO.paginators.KeysetPaginator)
+        indexes = [
+            models.Index(fields=['active', 'is_approved', 'created_date']),
+            models.Index(fields=['store', 'created_date']),
+        ]
+
     def __str__(self):
         return f"{self.product_code} - {self.name}"
 
     def save(self, *args, **kwargs):
         if not self.product_code:
             self.product_code = generate_code(Product, 'product_code', 'PR')
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Không ghi đè available_quantity bằng giá trị cũ trong bộ nhớ (kho cập nhật bằng F())
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name != 'available_quantity']
         super().save(*args, **kwargs)
 
+class AccountStockQuerySet(models.QuerySet):
+    def delete(self):
+        # Xoá hàng loạt (admin, ...) vẫn phải trừ available_quantity của từng product
+        with transaction.atomic():
+            unsold = self.filter(is_sold=False).values('product').annotate(n=models.Count('pk')).values_list('product', 'n')
+            for product_id, n in unsold:
+                Product.objects.filter(pk=product_id).update(available_quantity=F('available_quantity') - n)
+            return super().delete()
+
+
 # Kho tài khoản
 class AccountStock(BaseModel):
     stock_code = models.CharField(primary_key=True, max_length=10, editable=False)
@@ -108,13 +150,48 @@ class AccountStock(BaseModel):
     is_sold = models.BooleanField(default=False)
     sold_at = models.DateTimeField(null=True, blank=True)
 
+    objects = AccountStockQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.stock_code}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'is_sold', 'created_date']),  # claim FIFO khi checkout
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_sold = instance.__dict__.get('is_sold')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.stock_code:
             self.stock_code = generate_code(AccountStock, 'stock_code', 'AS')
-        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding:
+            was_available = False
+        elif getattr(self, '_loaded_is_sold', None) is None or (update_fields is not None and 'is_sold' not in update_fields):
+            was_available = None  # không biết/không đổi trạng thái cũ -> không cập nhật counter
+        else:
+            was_available = not self._loaded_is_sold
+
+        # Tính trước khi lưu: signal account_stock_changed (chạy trong super().save()) chỉ xoá cache khi số lượng đổi
+        self._available_delta = 0 if was_available is None else int(not self.is_sold) - int(was_available)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self._available_delta:
+                Product.objects.filter(pk=self.product_id).update(available_quantity=F('available_quantity') + self._available_delta)
+        self._loaded_is_sold = self.is_sold
+
+    def delete(self, *args, **kwargs):
+        self._available_delta = 0 if self.is_sold else -1
+        with transaction.atomic():
+            if not self.is_sold:
+                Product.objects.filter(pk=self.product_id).update(available_quantity=F('available_quantity') - 1)
+            return super().delete(*args, **kwargs)
 
 class Voucher(BaseModel):
     voucher_code = models.CharField(primary_key=True, max_length=10, editable=False)
@@ -131,6 +208,12 @@ class Voucher(BaseModel):
     class Meta:
         unique_together = ('store', 'code')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_code = instance.__dict__.get('code')  # để xoá cache theo code cũ khi seller đổi code
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.voucher_code:
             self.voucher_code = generate_code(Voucher, 'voucher_code', 'VC')
@@ -141,6 +224,8 @@ class Voucher(BaseModel):
 class Order(BaseModel):
     order_code = models.CharField(primary_key=True, max_length=10, editable=False)
     buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    # Store của sản phẩm trong đơn, ghi khi tạo detail để lọc đơn theo store không phải JOIN qua detail/product
+    store = models.ForeignKey(Store, null=True, blank=True, on_delete=models.SET_NULL, related_name='orders')
     voucher = models.ForeignKey(Voucher, null=True, blank=True, on_delete=models.SET_NULL, related_name='orders')
     is_paid = models.BooleanField(default=False)
     status = models.CharField(max_length=20, choices=[
@@ -151,15 +236,46 @@ class Order(BaseModel):
         ('completed', 'Hoàn thành'),
         ('cancel', 'Huỷ')
     ], default='processing')
+    delivered_at = models.DateTimeField(null=True, blank=True, editable=False)  # lúc chuyển sang delivered, tính hạn bảo hành
     released_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=0, editable=False)  # tăng mỗi lần đổi trạng thái, xem MMO.order_states
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'delivered_at', 'order_code']),  # quét đơn đến hạn giải ngân
+            models.Index(fields=['store', 'status', 'created_date']),  # đơn của store theo trạng thái/thời gian
+            models.Index(fields=['store', 'created_date']),  # phân trang cursor store-orders
+            models.Index(fields=['buyer', 'created_date']),  # phân trang cursor my-orders
+            models.Index(fields=['created_date']),  # xuất dữ liệu theo khoảng ngày (MMO.exports)
+        ]
 
     def __str__(self):
         return f"{self.order_code}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_active = instance.__dict__.get('active')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.order_code:
             self.order_code = generate_code(Order, 'order_code', 'OD')
+        if self.status == 'delivered' and self.delivered_at is None:
+            self.delivered_at = timezone.now()  # đơn tài khoản giao ngay khi tạo, hoặc admin đổi trạng thái
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'delivered_at'}
         super().save(*args, **kwargs)
+        self._loaded_status = self.status  # signal post_save so sánh với trạng thái cũ (xem MMO.metrics)
+        self._loaded_active = self.active
+
+
+def _set_order_store(detail):
+    # Ghi Order.store khi tạo detail (checkout đã gán sẵn khi tạo order thì bỏ qua)
+    if detail.product_id and detail.order.store_id is None:
+        detail.order.store_id = detail.product.store_id
+        Order.objects.filter(pk=detail.order_id).update(store_id=detail.order.store_id)
 
 
 # Chi tiết đơn hàng
@@ -181,6 +297,8 @@ class AccOrderDetail(BaseModel):
             self.acc_order_detail_code = generate_code(AccOrderDetail, 'acc_order_detail_code', 'AD')
         if self.order and hasattr(self.order, 'service_detail'):
             raise ValidationError("Order này đã có service detail. Không thể thêm acc detail.")
+        if self._state.adding:
+            _set_order_store(self)
         super().save(*args, **kwargs)
 
 
@@ -210,6 +328,8 @@ class ServiceOrderDetail(BaseModel):
             self.service_order_detail_code = generate_code(ServiceOrderDetail, 'service_order_detail_code', 'SO')
         if self.order and hasattr(self.order, 'acc_detail'):
             raise ValidationError("Order này đã có acc detail. Không thể thêm service detail.")
+        if self._state.adding:
+            _set_order_store(self)
         super().save(*args, **kwargs)
 
 # Khiếu nại
@@ -331,6 +451,12 @@ class TransactionHistory(BaseModel):
     amount = models.DecimalField(max_digits=12, decimal_places=0, null=False, blank=False)
     note = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_date']),  # phân trang cursor my-transactions
+            models.Index(fields=['created_date']),  # xuất dữ liệu theo khoảng ngày (MMO.exports)
+        ]
+
     def __str__(self):
         return f"{self.transaction_code}"
 
@@ -340,6 +466,154 @@ class TransactionHistory(BaseModel):
         super().save(*args, **kwargs)
 
 
+# Tiền bán hàng chờ cộng vào User.balance (append-only, gom định kỳ bằng wallet.rollup_pending_earnings)
+class PendingEarning(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pending_earnings')
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name='earnings')
+    held = models.BooleanField(default=False)  # tiền đơn hàng giữ lại (escrow) đến khi hết bảo hành, xem MMO.escrow
+    amount = models.DecimalField(max_digits=12, decimal_places=0)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['held', 'id'])]
+
+    def __str__(self):
+        return f"{self.user_id} +{self.amount}"
+
+
+# Response đã lưu theo header Idempotency-Key (xem MMO.idempotency)
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64)  # sha256 của method + path + body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # None = đang xử lý
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_date = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+# Hàng đợi tác vụ nền lưu trong DB (xem MMO.jobs, chạy bằng manage.py run_workers)
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Chờ chạy'),
+        ('running', 'Đang chạy'),
+        ('dead', 'Lỗi quá số lần thử'),
+    )
+    name = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.id} - {self.name} ({self.status})"
+
+
+class StoreMetricsCounters(models.Model):
+    orders = models.IntegerField(default=0)
+    acc_orders = models.IntegerField(default=0)
+    service_orders = models.IntegerField(default=0)
+    fulfilled_orders = models.IntegerField(default=0)  # đơn đang delivered/completed
+    refunded_orders = models.IntegerField(default=0)
+    complained_orders = models.IntegerField(default=0)
+    acc_revenue = models.DecimalField(max_digits=16, decimal_places=0, default=0)
+    service_revenue = models.DecimalField(max_digits=16, decimal_places=0, default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    delivery_seconds = models.BigIntegerField(default=0)  # tổng (released_at - created_date) của các đơn đã giải ngân
+    delivery_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+# Số liệu theo ngày của store (ngày tạo đơn / ngày đánh giá), gom từ StoreMetricsDelta (MMO.metrics)
+# và đối soát lại hằng đêm bằng manage.py reconcile_store_metrics
+class StoreDailyMetrics(StoreMetricsCounters):
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='daily_metrics')
+    day = models.DateField()
+    updated_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('store', 'day')
+
+    def __str__(self):
+        return f"{self.store_id} - {self.day}"
+
+
+# Thay đổi số liệu của 1 sự kiện đơn hàng/đánh giá, chỉ INSERT trong transaction của sự kiện
+# (không UPDATE dòng (store, hôm nay) lúc checkout), manage.py rollup_store_metrics gom vào StoreDailyMetrics
+class StoreMetricsDelta(StoreMetricsCounters):
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.store_id} - {self.day}"
+
+
+# Top-K sản phẩm tương tự của mỗi sản phẩm (cosine trên model TF-IDF của MMO.recommender),
+# tính hàng loạt bởi manage.py build_similar_products (MMO.similarity)
+class ProductSimilarity(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()  # 1 = giống nhất
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('product', 'rank')  # /products/{code}/similar/ đọc theo index (product, rank)
+
+    def __str__(self):
+        return f"{self.product_id} #{self.rank} {self.similar_id}"
+
+
+# File xuất dữ liệu lớn (giao dịch, nạp/rút, đơn hàng) theo khoảng ngày, ghi bởi worker (job 'run_export')
+class ExportJob(models.Model):
+    KIND_CHOICES = (
+        ('transactions', 'Lịch sử giao dịch'),
+        ('deposits', 'Yêu cầu nạp tiền'),
+        ('withdraws', 'Yêu cầu rút tiền'),
+        ('orders', 'Đơn hàng'),
+    )
+    FORMAT_CHOICES = (
+        ('csv', 'CSV (gzip)'),
+        ('parquet', 'Parquet'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Chờ chạy'),
+        ('running', 'Đang chạy'),
+        ('done', 'Hoàn thành'),
+        ('failed', 'Lỗi'),
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    date_from = models.DateField()
+    date_to = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveBigIntegerField(null=True, blank=True)
+    rows = models.PositiveBigIntegerField(default=0)  # số dòng đã ghi, cập nhật sau mỗi chunk
+    file_name = models.CharField(max_length=255, blank=True, default='')  # tương đối với EXPORT_ROOT
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='export_jobs')
+    created_date = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.id} - {self.kind} {self.date_from} → {self.date_to} ({self.status})"
+
+
 class FavoriteProduct(BaseModel):
     favorite_code = models.CharField(primary_key=True, max_length=20, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
@@ -371,6 +645,9 @@ class DepositRequest(BaseModel):
         default='pending'
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['created_date'])]  # xuất dữ liệu theo khoảng ngày (MMO.exports)
+
     def __str__(self):
         return f"{self.deposit_code} - {self.user.username} - {self.amount} ({self.status})"
 
@@ -393,6 +670,9 @@ class WithdrawRequest(BaseModel):
         default='pending'
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['created_date'])]  # xuất dữ liệu theo khoảng ngày (MMO.exports)
+
     def __str__(self):
         return f"{self.withdraw_code} - {self.user.username} - {self.amount} ({self.status})"
 
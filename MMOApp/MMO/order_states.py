@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from . import metrics, models, wallet
+
+# Các chuyển trạng thái hợp lệ của Order.
+# from: trạng thái đơn được phép; to: trạng thái mới; service_from/service_to: trạng thái ServiceOrderDetail đi kèm;
+# refund: hoàn tiền đang giữ cho buyer; release: giải ngân tiền đang giữ cho seller;
+# error/service_error: thông báo khi không đúng trạng thái.
+TRANSITIONS = {
+    'accept': {
+        'from': {'processing'}, 'to': 'processing',
+        'service_from': {'pending'}, 'service_to': 'in_progress',
+        'error': "Đơn phải ở trạng thái processing mới có thể chấp nhận.",
+        'service_error': "Dịch vụ phải pending mới được chấp nhận.",
+    },
+    'complete': {
+        'from': {'processing'}, 'to': 'delivered',
+        'service_from': {'in_progress'}, 'service_to': 'completed',
+        'error': "Đơn phải ở trạng thái processing mới có thể hoàn thành.",
+        'service_error': "Dịch vụ phải in_progress mới được hoàn thành.",
+    },
+    'cancel': {
+        'from': {'processing'}, 'to': 'cancel',
+        'service_from': {'pending'}, 'service_to': 'failed',
+        'refund': True,
+        'error': "Chỉ có thể huỷ đơn khi đang xử lý.",
+        'service_error': "Chỉ có thể huỷ dịch vụ khi đang chờ chấp nhận.",
+    },
+    'complain': {
+        'from': {'processing', 'delivered'}, 'to': 'complained',
+        'error': "Chỉ có thể khiếu nại đơn đang xử lý hoặc đã giao và còn bảo hành.",
+    },
+    'refund': {
+        'from': {'complained'}, 'to': 'refunded',
+        'refund': True,
+        'error': "Chỉ có thể hoàn tiền đơn đang bị khiếu nại.",
+    },
+    'release': {
+        'from': {'delivered', 'complained'}, 'to': 'completed',
+        'release': True,
+        'error': "Chỉ có thể giải ngân đơn đã giao hoặc đang bị khiếu nại.",
+    },
+}
+
+# Các action buyer/seller được gọi qua API PATCH /orders/{code}/
+USER_ACTIONS = {'accept', 'complete', 'cancel'}
+
+
+def load(order_code):
+    # 1 query lấy order cùng buyer, detail, product và store để kiểm tra quyền và chuyển trạng thái
+    queryset = models.Order.objects.filter(active=True).select_related(
+        'buyer', 'voucher', 'acc_detail__product__store', 'service_detail__product__store'
+    )
+    return get_object_or_404(queryset, pk=order_code)
+
+
+def _detail(order):
+    return getattr(order, 'acc_detail', None) or getattr(order, 'service_detail', None)
+
+
+def _service_detail(order):
+    return getattr(order, 'service_detail', None)
+
+
+def is_party(order, user):
+    # Là buyer hoặc seller của sản phẩm trong order (so sánh id, không query thêm)
+    if order.buyer_id == user.pk:
+        return True
+    detail = _detail(order)
+    return bool(detail and detail.product and detail.product.store.seller_id == user.pk)
+
+
+def check(order, action):
+    # Kiểm tra action có hợp lệ với trạng thái hiện tại, sai thì raise PermissionDenied
+    transition = TRANSITIONS.get(action)
+    if transition is None:
+        raise PermissionDenied("Hành động không hợp lệ.")
+    if order.status not in transition['from']:
+        raise PermissionDenied(transition['error'])
+    service_detail = _service_detail(order)
+    if service_detail and 'service_from' in transition and service_detail.status not in transition['service_from']:
+        raise PermissionDenied(transition['service_error'])
+    return transition
+
+
+def check_user_action(order, user, action):
+    if not is_party(order, user):
+        raise PermissionDenied("Bạn không có quyền cập nhật đơn này.")
+    if action not in USER_ACTIONS:
+        raise PermissionDenied("Hành động không hợp lệ.")
+    return check(order, action)
+
+
+def apply(order, action):
+    """
+    Chuyển order theo action (order lấy từ load()). UPDATE có điều kiện theo status và version đã đọc (optimistic lock):
+    nếu đơn vừa bị request khác thay đổi thì raise ValidationError, không ghi đè.
+    Cập nhật ServiceOrderDetail và hoàn tiền (nếu có) trong cùng transaction. Trả về order đã cập nhật.
+    """
+    transition = check(order, action)
+    now = timezone.now()
+
+    fields = {'status': transition['to'], 'updated_date': now}
+    if transition['to'] == 'delivered':
+        fields['delivered_at'] = now  # mốc tính bảo hành, không dùng updated_date vì lần lưu nào cũng đổi
+    if transition.get('release'):
+        fields['released_at'] = now
+
+    with transaction.atomic():
+        updated = models.Order.objects.filter(pk=order.pk, status=order.status, version=order.version).update(
+            version=F('version') + 1, **fields
+        )
+        if not updated:
+            raise ValidationError("Đơn hàng vừa được cập nhật, vui lòng tải lại!")
+
+        service_detail = _service_detail(order)
+        if service_detail and 'service_to' in transition:
+            detail_fields = {'status': transition['service_to'], 'updated_date': now}
+            if transition['service_to'] == 'completed':
+                detail_fields['delivered_at'] = now
+            models.ServiceOrderDetail.objects.filter(pk=service_detail.pk).update(**detail_fields)
+            for name, value in detail_fields.items():
+                setattr(service_detail, name, value)
+
+        if transition.get('refund'):
+            wallet.refund_order(order, note=f"Hoàn tiền đơn hàng {order.order_code}")
+        if transition.get('release'):
+            wallet.release_held_earnings([order.pk])
+
+    old_status = order.status
+    for name, value in fields.items():
+        setattr(order, name, value)
+    order.version += 1
+    order._loaded_status = order.status
+    metrics.record_status(order, old_status, order.status)
+    return order
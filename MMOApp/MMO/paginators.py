@@ -1,6 +1,129 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPaginator(pagination.BasePagination):
+    """
+    Phân trang keyset cho các danh sách lớn: không COUNT(*), không OFFSET, trang 500 tốn như trang 1.
+    Thứ tự cố định (-created_date, -pk); cursor lưu cặp (created_date, pk) của dòng biên và trang sau đọc bằng
+    WHERE created_date < x OR (created_date = x AND pk < y), trang trước dùng điều kiện ngược lại.
+    Các dòng trùng created_date được phân định bằng pk nên dòng mới chèn vào giữa không làm lặp/mất dòng.
+    Client chọn số dòng bằng ?page_size= (tối đa max_page_size) và đi tiếp bằng link next/previous.
+
+    Response có 2 dạng, client phải xử lý đúng dạng theo query string:
+    - không có ?page=: {"next": url | null, "previous": url | null, "results": [...]}, không có "count";
+    - có ?page= (client cũ): {"count": n, "next": url | null, "previous": url | null, "results": [...]} như trước.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = None
+        if 'page' in request.query_params:
+            self.legacy = pagination.PageNumberPagination()
+            self.legacy.page_size = self.page_size
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        if cursor is None:
+            queryset = queryset.order_by('-created_date', '-pk')
+        elif reverse:
+            queryset = queryset.filter(Q(created_date__gt=cursor['created_date']) |
+                                       Q(created_date=cursor['created_date'], pk__gt=cursor['pk']))
+            queryset = queryset.order_by('created_date', 'pk')
+        else:
+            queryset = queryset.filter(Q(created_date__lt=cursor['created_date']) |
+                                       Q(created_date=cursor['created_date'], pk__lt=cursor['pk']))
+            queryset = queryset.order_by('-created_date', '-pk')
+
+        rows = list(queryset[:size + 1])  # lấy dư 1 dòng để biết còn trang tiếp theo chiều đang đọc
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, cursor is not None
+        self.page = rows
+        return rows
 
-class ProductPaginator(pagination.PageNumberPagination):
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            created_date = parse_datetime(data['d'])
+            if created_date is None:
+                raise ValueError(data['d'])
+            return {'created_date': created_date, 'pk': data['pk'], 'reverse': bool(data.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Cursor không hợp lệ.')
+
+    def encode_cursor(self, row, reverse):
+        data = {'d': row.created_date.isoformat(), 'pk': row.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:  # trang trước rỗng (dòng đã bị xoá): quay về đầu danh sách
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ProductPaginator(KeysetPaginator):
     page_size = 5
 
 class BlogPaginator(pagination.PageNumberPagination):
@@ -12,7 +135,7 @@ class BlogCommentPaginator(pagination.PageNumberPagination):
 class StockPaginator(pagination.PageNumberPagination):
     page_size = 5
 
-class OderPaginator(pagination.PageNumberPagination):
+class OderPaginator(KeysetPaginator):
     page_size = 5
 
 class ReviewPaginator(pagination.PageNumberPagination):
@@ -21,5 +144,5 @@ class ReviewPaginator(pagination.PageNumberPagination):
 class ComplaintPaginator(pagination.PageNumberPagination):
     page_size = 5
 
-class TransactionHistoryPaginator(pagination.PageNumberPagination):
-    page_size = 5
\ No newline at end of file
+class TransactionHistoryPaginator(KeysetPaginator):
+    page_size = 5
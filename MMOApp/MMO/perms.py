@@ -1,7 +1,5 @@
 from rest_framework import permissions
-from rest_framework.exceptions import PermissionDenied
-from django.shortcuts import get_object_or_404
-from MMO import models
+from MMO import models, order_states
 from django.db.models import Q
 
 
@@ -63,47 +61,11 @@ class CanUpdate(permissions.IsAuthenticated):
         if not order_code:
             return False
 
-        order = get_object_or_404(models.Order, pk=order_code, active=True)
-
-        # Kiểm tra quyền sở hữu: phải là buyer hoặc seller của sản phẩm trong order
-        is_buyer = order.buyer == request.user
-        is_seller = (
-                (hasattr(order,
-                         'acc_detail') and order.acc_detail.product and order.acc_detail.product.store.seller == request.user) or
-                (hasattr(order,
-                         'service_detail') and order.service_detail.product and order.service_detail.product.store.seller == request.user)
-        )
-
-        if not (is_buyer or is_seller):
-            raise PermissionDenied("Bạn không có quyền huỷ đơn này.")
-
-        # lấy action từ client
-        action = request.data.get("action")
-
-        if action == "cancel":
-            if order.status != "processing":
-                raise PermissionDenied("Chỉ có thể huỷ đơn khi đang xử lý.")
-            if hasattr(order, "service_detail") and order.service_detail:
-                if order.service_detail.status != "pending":
-                    raise PermissionDenied("Chỉ có thể huỷ dịch vụ khi đang chờ chấp nhận.")
-
-        elif action == "accept":  # cập nhật sang in_progress
-            if order.status != "processing":
-                raise PermissionDenied("Đơn phải ở trạng thái processing mới có thể chấp nhận.")
-            if hasattr(order, "service_detail") and order.service_detail:
-                if order.service_detail.status != "pending":
-                    raise PermissionDenied("Dịch vụ phải pending mới được chấp nhận.")
-
-        elif action == "complete":  # cập nhật sang completed
-            if order.status != "processing":
-                raise PermissionDenied("Đơn phải ở trạng thái processing mới có thể hoàn thành.")
-            if hasattr(order, "service_detail") and order.service_detail:
-                if order.service_detail.status != "in_progress":
-                    raise PermissionDenied("Dịch vụ phải in_progress mới được hoàn thành.")
-
-        else:
-            raise PermissionDenied("Hành động không hợp lệ.")
-
+        # Lấy order kèm detail/product/store trong 1 query, kiểm tra quyền và action theo state machine.
+        # Lưu lại cho view dùng, không phải load order lần nữa
+        order = order_states.load(order_code)
+        order_states.check_user_action(order, request.user, request.data.get("action"))
+        view.transition_order = order
         return True
 
 
@@ -1,8 +1,156 @@
+import json
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+import joblib
 import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
-from .models import Product, Order, FavoriteProduct, Review
+
+from . import jobs
+from .models import Product, Order, FavoriteProduct, Review, Job
+
+# Model TF-IDF của mô tả sản phẩm được build sẵn (manage.py build_recommender) và lưu ra đĩa:
+#   RECOMMENDER_DIR/<version>/vectorizer.joblib  - TfidfVectorizer đã fit (từ điển + IDF)
+#   RECOMMENDER_DIR/<version>/{codes,data,indices,indptr}.npy - ma trận CSR (mỗi dòng 1 sản phẩm, sắp theo mã)
+#   RECOMMENDER_DIR/CURRENT - tên version đang dùng, đổi bằng os.replace nên worker không đọc phải bản ghi dở
+# Ma trận lưu thành các mảng .npy thay vì 1 file .npz để mở bằng mmap: các worker dùng chung page cache của OS.
+MODEL_DIR = Path(getattr(settings, 'RECOMMENDER_DIR', settings.BASE_DIR / 'recommender'))
+UPDATE_DELAY = getattr(settings, 'RECOMMENDER_UPDATE_DELAY', 60)  # giây gộp các lần sửa sản phẩm vào 1 lần cập nhật
+KEEP_VERSIONS = 3
+ARRAYS = ('codes', 'data', 'indices', 'indptr')
+
+
+class TfidfModel:
+    def __init__(self, version, matrix, codes, built_at):
+        self.version = version
+        self.matrix = matrix
+        self.codes = codes
+        self.built_at = built_at
+        self._vectorizer = None
+
+    @property
+    def vectorizer(self):
+        # Chỉ cần khi cập nhật model, request gợi ý không phải load từ điển
+        if self._vectorizer is None:
+            self._vectorizer = joblib.load(MODEL_DIR / self.version / 'vectorizer.joblib')
+        return self._vectorizer
+
+    def rows(self, product_codes):
+        # codes đã sắp xếp -> tìm dòng bằng binary search trên mảng mmap, không cần dict mã -> dòng
+        wanted = np.array(sorted(product_codes), dtype=str)
+        positions = np.searchsorted(self.codes, wanted)
+        found = positions < len(self.codes)
+        positions, wanted = positions[found], wanted[found]
+        return positions[self.codes[positions] == wanted]
+
+
+_current = None
+
+
+def _documents(queryset):
+    rows = sorted(queryset.values_list('product_code', 'description'))
+    codes = np.array([code for code, _ in rows], dtype=str)
+    return codes, [description or '' for _, description in rows]  # phòng null
+
+
+def _save(vectorizer, matrix, codes, built_at):
+    version = built_at.strftime('%Y%m%d%H%M%S%f')
+    tmp = MODEL_DIR / f".{version}.{os.getpid()}.tmp"
+    tmp.mkdir(parents=True)
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    joblib.dump(vectorizer, tmp / 'vectorizer.joblib')
+    for name, array in zip(ARRAYS, (codes, matrix.data, matrix.indices, matrix.indptr)):
+        np.save(tmp / f"{name}.npy", array)
+    (tmp / 'meta.json').write_text(json.dumps({'built_at': built_at.isoformat(), 'shape': matrix.shape}))
+    os.replace(tmp, MODEL_DIR / version)
+
+    pointer = MODEL_DIR / f".CURRENT.{os.getpid()}.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, MODEL_DIR / 'CURRENT')
+    _cleanup(version)
+    return load()
+
+
+def _cleanup(current):
+    # Giữ vài version gần nhất: worker đang mmap bản cũ vẫn đọc được đến khi tự chuyển sang bản mới
+    versions = sorted(path for path in MODEL_DIR.iterdir() if path.is_dir() and not path.name.startswith('.'))
+    for path in versions[:-KEEP_VERSIONS]:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _load(version):
+    path = MODEL_DIR / version
+    meta = json.loads((path / 'meta.json').read_text())
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode='r') for name in ARRAYS}
+    matrix = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                               shape=tuple(meta['shape']), copy=False)
+    return TfidfModel(version, matrix, arrays['codes'], parse_datetime(meta['built_at']))
+
+
+def load():
+    """Model đang dùng (load lần đầu cần và khi CURRENT đổi sang version mới), None nếu chưa build."""
+    global _current
+    try:
+        version = (MODEL_DIR / 'CURRENT').read_text().strip()
+    except FileNotFoundError:
+        return None
+    if _current is None or _current.version != version:
+        _current = _load(version)
+    return _current
+
+
+def build():
+    # Build lại toàn bộ: fit từ điển/IDF trên mọi sản phẩm đã duyệt
+    built_at = timezone.now()
+    codes, texts = _documents(Product.objects.filter(is_approved=True))
+    if not len(codes):
+        return None
+    vectorizer = TfidfVectorizer(stop_words='english')
+    matrix = vectorizer.fit_transform(texts)
+    return _save(vectorizer, matrix, codes, built_at)
+
+
+def update():
+    """
+    Cập nhật model theo sản phẩm được duyệt/sửa/bỏ duyệt/xoá từ lần build trước: giữ từ điển và IDF,
+    chỉ transform mô tả của sản phẩm đã đổi (không fit lại). Từ chỉ xuất hiện trong sản phẩm mới
+    được tính từ lần build đầy đủ tiếp theo.
+    """
+    model = load()
+    if model is None:
+        return build()
+    built_at = timezone.now()
+    approved = Product.objects.filter(is_approved=True)
+    changed, texts = _documents(approved.filter(updated_date__gte=model.built_at))
+    live = np.array(list(approved.values_list('product_code', flat=True)), dtype=str)
+    keep = np.isin(model.codes, live) & ~np.isin(model.codes, changed)
+    if keep.all() and not len(changed):
+        return model
+
+    matrix = model.matrix[keep]
+    if texts:  # chỉ có sản phẩm bị bỏ duyệt/xoá thì không có gì để transform
+        matrix = sparse.vstack([matrix, model.vectorizer.transform(texts)], format='csr')
+    codes = np.concatenate([model.codes[keep], changed])
+    order = np.argsort(codes, kind='stable')
+    return _save(model.vectorizer, matrix[order], codes[order], built_at)
+
+
+def schedule_update():
+    # Gộp nhiều lần sửa sản phẩm thành 1 job cập nhật (đã có job chờ chạy thì thôi)
+    def enqueue():
+        if not Job.objects.filter(name='update_recommender', status='pending').exists():
+            jobs.enqueue('update_recommender', delay=timedelta(seconds=UPDATE_DELAY))
+
+    transaction.on_commit(enqueue)
 
 
 def get_user_history(user):
@@ -23,41 +171,26 @@ def get_user_history(user):
 
 
 def recommend_products(user, top_n=5):
-    user_history = get_user_history(user)
-    all_products = Product.objects.filter(is_approved=True)
-
-    if not all_products.exists():
+    model = load()
+    if model is None:
+        # Chưa build model (lần chạy đầu): không build trong request, hẹn job update_recommender build nền
+        schedule_update()
         return []
 
-    # đổi 'id' -> 'product_code'
-    df = pd.DataFrame(list(all_products.values('product_code', 'name', 'description', 'type')))
-
-    # TF-IDF
-    tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(df['description'].fillna(''))  # phòng null
-
-    # lấy index các sản phẩm user đã dùng
-    user_indices = df[df['product_code'].isin(user_history)].index
-    if not len(user_indices):
+    # lấy dòng các sản phẩm user đã dùng
+    user_rows = model.rows(get_user_history(user))
+    if not len(user_rows):
         return []  # user mới -> chưa có dữ liệu
 
-    # lấy vector trung bình của các sản phẩm trong lịch sử
-    user_vector = tfidf_matrix[user_indices].mean(axis=0)
-
-    # ép về numpy array 2D
-    user_vector = np.asarray(user_vector).reshape(1, -1)
-
-    # tính cosine similarity
-    cosine_sim = cosine_similarity(user_vector, tfidf_matrix).flatten()
-
-    # gán similarity vào dataframe
-    df['similarity'] = cosine_sim
+    # vector trung bình của các sản phẩm trong lịch sử; các dòng đã chuẩn hoá L2 nên tích vô hướng xếp hạng như cosine
+    user_vector = np.asarray(model.matrix[user_rows].mean(axis=0)).ravel()
+    similarity = model.matrix @ user_vector
 
     # lọc bỏ các sản phẩm đã mua/đánh giá/favorite
-    recommendations = (
-        df[~df['product_code'].isin(user_history)]
-        .sort_values('similarity', ascending=False)
-        .head(top_n)
-    )
+    similarity[user_rows] = -np.inf
+    count = min(top_n, len(similarity) - len(user_rows))
+    if count <= 0:
+        return []
+    top = np.argpartition(-similarity, count - 1)[:count]
 
-    return Product.objects.filter(product_code__in=recommendations['product_code'].tolist())
+    return Product.objects.filter(product_code__in=model.codes[top].tolist(), is_approved=True)
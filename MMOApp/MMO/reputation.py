@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import catalog_cache, metrics, models
+
+UPDATE_BATCH_SIZE = 1000
+FIELDS = ['reputation', 'avg_rating', 'order_count', 'fulfill_rate', 'complaint_rate', 'refund_rate',
+          'avg_delivery_hours', 'reputation_updated_at']
+
+
+def score(avg_rating, complaint_rate, refund_rate):
+    """
+    Điểm uy tín (0-100): 70% theo điểm trung bình đánh giá, 15% theo (1 - complaint_rate), 15% theo (1 - refund_rate).
+    Nhận số hoặc pandas Series (tính cho cả bảng store một lần).
+    """
+    value = (avg_rating / 5.0) * 70.0 + (1.0 - complaint_rate) * 15.0 + (1.0 - refund_rate) * 15.0
+    return np.clip(np.round(value, 2), 0.0, 100.0)
+
+
+def _load(start_day=None):
+    # 1 query GROUP BY store trên StoreDailyMetrics + 1 query danh sách store
+    rows = models.StoreDailyMetrics.objects.all()
+    if start_day:
+        rows = rows.filter(day__gte=start_day)
+    sums = pd.DataFrame.from_records(
+        rows.values('store').annotate(
+            orders=Sum('orders'), fulfilled=Sum('fulfilled_orders'), refunded=Sum('refunded_orders'),
+            complained=Sum('complained_orders'), rating_sum=Sum('rating_sum'), rating_count=Sum('rating_count'),
+            delivery_seconds=Sum('delivery_seconds'), delivery_count=Sum('delivery_count'),
+        ),
+        columns=['store', 'orders', 'fulfilled', 'refunded', 'complained', 'rating_sum', 'rating_count',
+                 'delivery_seconds', 'delivery_count'],
+    ).set_index('store')
+    stores = pd.Index(models.Store.objects.values_list('store_code', flat=True), name='store')
+    # Store chưa có số liệu -> 0
+    return sums.reindex(stores).fillna(0).astype('int64')
+
+
+def compute(start_day=None):
+    """Tính điểm uy tín và chỉ số xử lý đơn cho mọi store (vector hoá bằng pandas). Trả về DataFrame theo store_code."""
+    df = _load(start_day)
+    orders = df['orders'].replace(0, np.nan)
+
+    result = pd.DataFrame(index=df.index)
+    result['order_count'] = df['orders']
+    result['avg_rating'] = (df['rating_sum'] / df['rating_count'].replace(0, np.nan)).fillna(0).round(2)
+    result['fulfill_rate'] = (df['fulfilled'] / orders).fillna(0).round(4)
+    result['complaint_rate'] = (df['complained'] / orders).fillna(0).round(4)
+    result['refund_rate'] = (df['refunded'] / orders).fillna(0).round(4)
+    result['avg_delivery_hours'] = (df['delivery_seconds'] / df['delivery_count'].replace(0, np.nan) / 3600.0).round(2)
+    result['reputation'] = score(result['avg_rating'], result['complaint_rate'], result['refund_rate'])
+    return result
+
+
+def update_all(start_day=None, batch_size=UPDATE_BATCH_SIZE):
+    """Tính lại và ghi điểm uy tín vào Store (bulk_update theo batch). Trả về số store đã cập nhật."""
+    metrics.rollup()  # gom các thay đổi số liệu đang chờ trước khi đọc StoreDailyMetrics
+    result = compute(start_day)
+    now = timezone.now()
+    stores = []
+    for store_code, row in zip(result.index, result.itertuples(index=False)):
+        # numpy scalar -> kiểu Python theo kiểu field (order_count: IntegerField, còn lại FloatField), NaN -> NULL
+        values = {name: None if pd.isna(value) else (int(value) if name == 'order_count' else float(value))
+                  for name, value in row._asdict().items()}
+        stores.append(models.Store(store_code=store_code, reputation_updated_at=now, **values))
+    models.Store.objects.bulk_update(stores, FIELDS, batch_size=batch_size)
+
+    # bulk_update không gửi signal: danh sách store và các trang sản phẩm có store lồng đều đổi
+    catalog_cache.bump(catalog_cache.CATALOG, *(catalog_cache.store_scope(store.store_code) for store in stores))
+    return len(stores)
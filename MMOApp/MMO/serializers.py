@@ -1,17 +1,82 @@
 from django.db import transaction
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer, ValidationError
-from . import models
+from . import checkout, models, order_states, stocks, vouchers, wallet
 from django.utils import timezone
 
 
+def _split(value):
+    # "a,b" hoặc ['a', 'b'] -> ['a', 'b']
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    return [v.strip() for v in value if v and v.strip()]
+
+
+def _related_paths(serializer, prefix=''):
+    # Đường dẫn select_related (a__b) cho mọi object lồng mà serializer sẽ trả về
+    paths = []
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ListSerializer) or not isinstance(field, serializers.BaseSerializer):
+            continue
+        path = prefix + field.source.replace('.', '__')
+        paths.append(path)
+        paths.extend(_related_paths(field, path + '__'))
+    return paths
+
+
+class ExpandableFieldsMixin:
+    """
+    Mặc định các field trong expandable_fields chỉ trả về mã (pk), object lồng chỉ dựng khi được yêu cầu.
+    GET ?expand=store,store.seller để lồng object, ?fields=product_code,name để chỉ lấy một số field (chỉ ở cấp ngoài cùng).
+    Có thể truyền expand=[...] / fields=[...] khi khởi tạo serializer lồng.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        self._fields_param = _split(kwargs.pop('fields', None))
+        self._expand_param = _split(kwargs.pop('expand', None))
+        super().__init__(*args, **kwargs)
+
+    def _is_root(self):
+        return self.parent is None or (self.parent is self.root and isinstance(self.parent, serializers.ListSerializer))
+
+    def _query_param(self, name):
+        request = self.context.get('request')
+        if request is None or request.method != 'GET' or not self._is_root():
+            return None
+        return _split(request.query_params.get(name))
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        only = self._fields_param if self._fields_param is not None else self._query_param('fields')
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+
+        expand = self._expand_param if self._expand_param is not None else (self._query_param('expand') or [])
+        for name, serializer_class in self.expandable_fields.items():
+            if name not in fields:
+                continue
+            nested = [path.split('.', 1)[1] for path in expand if path.startswith(name + '.')]
+            if name in expand or nested:
+                kwargs = {'expand': nested} if issubclass(serializer_class, ExpandableFieldsMixin) else {}
+                fields[name] = serializer_class(read_only=True, **kwargs)
+        return fields
+
+    def related_paths(self):
+        """Các đường dẫn select_related ứng với field/expand của request, dùng trước khi phân trang."""
+        return _related_paths(self)
+
+
 class UserSerializer(ModelSerializer):
     class Meta:
         model = models.User
         # fields = '__all__'
         fields = ['user_code', 'username', 'password', 'first_name', 'last_name', 'avatar', 'role', 'balance', 'phone',
                   'email', 'is_verified', 'date_joined', 'last_login']
-        read_only_fields = ['user_code', 'date_joined', 'last_login']
+        read_only_fields = ['user_code', 'balance', 'date_joined', 'last_login']  # số dư chỉ đổi qua MMO.wallet
         extra_kwargs = {
             'password': {
                 'write_only': True
@@ -31,10 +96,13 @@ class UserSerializer(ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
+        fields = list(validated_data)
         if password:
             instance.set_password(password)
+            fields.append('password')
 
-        instance.save()
+        # Chỉ ghi các cột được sửa: save() cả dòng sẽ ghi đè balance vừa được MMO.wallet cập nhật ở request khác
+        instance.save(update_fields=fields)
         return instance
 
     def to_representation(self, instance):
@@ -48,13 +116,24 @@ class UserSerializer(ModelSerializer):
         return data
 
 
-class StoreSerializer(ModelSerializer):
-    seller = UserSerializer(read_only=True)
+class PublicUserSerializer(ModelSerializer):
+    # User lồng trong dữ liệu người khác xem được (seller của store, buyer của đơn/review, tác giả blog):
+    # chỉ tên hiển thị, không có balance/email/phone
+    class Meta:
+        model = models.User
+        fields = ['user_code', 'username', 'first_name', 'last_name']
+        read_only_fields = fields
+
+
+class StoreSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'seller': PublicUserSerializer}
 
     class Meta:
         model = models.Store
-        fields = ['store_code', 'seller', 'name', 'description', 'created_date', 'updated_date']
-        read_only_fields = ['store_code', 'seller', 'created_date', 'updated_date']
+        fields = ['store_code', 'seller', 'name', 'description', 'reputation', 'avg_rating', 'order_count', 'fulfill_rate',
+                  'complaint_rate', 'refund_rate', 'avg_delivery_hours', 'created_date', 'updated_date']
+        read_only_fields = ['store_code', 'seller', 'reputation', 'avg_rating', 'order_count', 'fulfill_rate',
+                            'complaint_rate', 'refund_rate', 'avg_delivery_hours', 'created_date', 'updated_date']
 
     def create(self, validated_data):
         validated_data['seller'] = self.context['request'].user  # Gán seller là user hiện tại
@@ -87,8 +166,8 @@ class VerificationSerializer(ModelSerializer):
         return data
 
 
-class ProductSerializer(ModelSerializer):
-    store = StoreSerializer(read_only=True)
+class ProductSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'store': StoreSerializer}
 
     class Meta:
         model = models.Product
@@ -98,7 +177,7 @@ class ProductSerializer(ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if instance.image:
+        if instance.image and 'image' in data:
             data['image'] = instance.image.url
         return data
 
@@ -113,8 +192,8 @@ class ProductSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class BlogSerializer(ModelSerializer):
-    author = UserSerializer(read_only=True)
+class BlogSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'author': PublicUserSerializer}
 
     class Meta:
         model = models.Blog
@@ -126,9 +205,8 @@ class BlogSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class BlogCommentSerializer(ModelSerializer):
-    author = UserSerializer(read_only=True)
-    blog = BlogSerializer(read_only=True)
+class BlogCommentSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'author': PublicUserSerializer, 'blog': BlogSerializer}
 
     class Meta:
         model = models.BlogComment
@@ -140,9 +218,8 @@ class BlogCommentSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class BlogLikeSerializer(ModelSerializer):
-    user = UserSerializer(read_only=True)
-    blog = BlogSerializer(read_only=True)
+class BlogLikeSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'user': PublicUserSerializer, 'blog': BlogSerializer}
 
     class Meta:
         model = models.BlogLike
@@ -154,8 +231,8 @@ class BlogLikeSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class VoucherSerializer(ModelSerializer):
-    store = StoreSerializer(read_only=True)
+class VoucherSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'store': StoreSerializer}
 
     class Meta:
         model = models.Voucher
@@ -173,8 +250,8 @@ class VoucherSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class AccountStockSerializer(ModelSerializer):
-    product = ProductSerializer(read_only=True)
+class AccountStockSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'product': ProductSerializer}
 
     class Meta:
         model = models.AccountStock
@@ -182,44 +259,54 @@ class AccountStockSerializer(ModelSerializer):
         read_only_fields = ['stock_code', 'product', 'created_date', 'updated_date']
 
 
-class OrderSerializer(ModelSerializer):
-    buyer = UserSerializer(read_only=True)
-    voucher = VoucherSerializer(read_only=True)
+class OrderSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'buyer': PublicUserSerializer, 'voucher': VoucherSerializer, 'store': StoreSerializer}
 
     class Meta:
         model = models.Order
-        fields = 'order_code', 'buyer', 'voucher', 'is_paid', 'status', 'released_at', 'created_date', 'updated_date'
-        read_only_fields = ['order_code', 'buyer', 'voucher', 'created_date', 'updated_date']
+        fields = 'order_code', 'buyer', 'voucher', 'store', 'is_paid', 'status', 'delivered_at', 'released_at', 'created_date', 'updated_date'
+        read_only_fields = ['order_code', 'buyer', 'voucher', 'store', 'delivered_at', 'created_date', 'updated_date']
 
     def create(self, validated_data):
         validated_data['buyer'] = self.context['request'].user  # Gán buyer là user hiện tại
 
-        # Lấy mã voucher từ request
-        code = self.context['request'].data.get("code")
-        if code:
-            with transaction.atomic():
-                try:
-                    voucher = models.Voucher.objects.select_for_update().get(
-                        code=code,  # tìm theo code
-                        expired_at__gt=timezone.now(),
-                        quantity__gt=0  # chỉ lấy voucher còn lượt (>0)
-                    )
-                except models.Voucher.DoesNotExist:
-                    raise ValidationError("Voucher không hợp lệ hoặc đã hết hạn!")
-
-                # Gán voucher vào order
-                validated_data['voucher'] = voucher
-
-                # Trừ 1 lượt
-                voucher.quantity -= 1
-                voucher.save(update_fields=["quantity"])
-        return super().create(validated_data)
+        # Lấy mã voucher từ request, trừ 1 lượt bằng UPDATE có điều kiện (không khoá dòng voucher)
+        data = self.context['request'].data
+        code = data.get("code")
+        if not code:
+            return super().create(validated_data)
+
+        # Nhiều store có thể dùng cùng mã -> cần product (hoặc store) của đơn để tìm đúng voucher trước khi trừ lượt
+        store = self._voucher_store(data)
+        voucher = vouchers.reserve_voucher(code, store=store)
+        validated_data['voucher'] = voucher
+        validated_data['store'] = store
+        try:
+            return super().create(validated_data)
+        except Exception:
+            vouchers.release_voucher(voucher)
+            raise
+
+    def _voucher_store(self, data):
+        if data.get("product"):
+            store = models.Store.objects.filter(products__pk=data["product"]).first()
+        elif data.get("store"):
+            store = models.Store.objects.filter(pk=data["store"]).first()
+        else:
+            # Client cũ chỉ gửi code (deprecated): tìm store theo mã nếu mã chỉ thuộc 1 store
+            store_id = vouchers.legacy_store_id(data["code"])
+            if store_id is None:
+                raise serializers.ValidationError(vouchers.INVALID_VOUCHER)
+            store = models.Store.objects.filter(pk=store_id).first()
+        if store is None:
+            raise serializers.ValidationError("Sản phẩm hoặc store không tồn tại!")
+        return store
 
 
 class AccOrderDetailSerializer(ModelSerializer):
     order = serializers.PrimaryKeyRelatedField(queryset=models.Order.objects.all())
     product = serializers.PrimaryKeyRelatedField(queryset=models.Product.objects.all())
-    product_info = ProductSerializer(source="product", read_only=True)
+    product_info = ProductSerializer(source="product", read_only=True, expand=['store.seller'])
 
     class Meta:
         model = models.AccOrderDetail
@@ -242,59 +329,31 @@ class AccOrderDetailSerializer(ModelSerializer):
             voucher = order.voucher
             if voucher.store != product.store:
                 raise ValidationError("Voucher không thuộc cửa hàng này!")
-            discount = int(total * voucher.discount_percent / 100)
-            if voucher.max_discount and discount > voucher.max_discount:
-                discount = voucher.max_discount
+            discount = checkout.calc_discount(voucher, total)
             total -= discount
             validated_data["discount_amount"] = discount
         else:
             validated_data["discount_amount"] = 0
 
-        # --- Check stock ---
-        stocks = models.AccountStock.objects.filter(product=product, is_sold=False)[:qty]
-        if len(stocks) < qty:
+        # --- Check stock (kiểm tra nhanh bằng counter, claim thật trong transaction) ---
+        if product.available_quantity < qty:
             raise ValidationError("Không đủ tài khoản trong kho!")
 
         validated_data["unit_price"] = unit_price
         validated_data["total_amount"] = total
 
-        # --- Check balance & trừ tiền ---
-        if user.balance < total:
-            raise ValidationError("Số dư không đủ để thanh toán đơn hàng này!")
-
         with transaction.atomic():
-            # Trừ tiền buyer
-            user.balance -= total
-            user.save(update_fields=["balance"])
-
-            # Lưu lịch sử giao dịch
-            models.TransactionHistory.objects.create(
-                user=user,
-                type="purchase",
-                amount=total,
-                note=f"Thanh toán đơn hàng {order.order_code}"
-            )
-
-            # Cộng tiền ngay cho seller
-            seller = product.store.seller  # hoặc user của store
-            seller.balance += total
-            seller.save(update_fields=["balance"])
-
-            models.TransactionHistory.objects.create(
-                user=seller,
-                type="receive",
-                amount=total,
-                note=f"Nhận tiền từ đơn bán tài khoản {product.name} - {order.order_code}"
+            # Trừ tiền buyer, ghi tiền chờ cộng cho seller và lưu lịch sử giao dịch
+            wallet.pay_seller(
+                user, product.store.seller, total,
+                debit_note=f"Thanh toán đơn hàng {order.order_code}",
+                credit_note=f"Nhận tiền từ đơn bán tài khoản {product.name} - {order.order_code}",
+                error="Số dư không đủ để thanh toán đơn hàng này!",
+                order=order
             )
 
-            # Lấy và đánh dấu stock
-            contents = []
-            for stock in stocks:
-                contents.append(stock.content)
-                stock.is_sold = True
-                stock.sold_at = timezone.now()
-                stock.save(update_fields=["is_sold", "sold_at"])
-
+            # Lấy và đánh dấu stock (khoá dòng, 1 câu UPDATE cho cả lô)
+            contents = stocks.claim_stocks(product, qty)
             validated_data["content_delivered"] = "\n".join(contents)
 
             detail = models.AccOrderDetail.objects.create(**validated_data)
@@ -310,14 +369,15 @@ class AccOrderDetailSerializer(ModelSerializer):
 class ServiceOrderDetailSerializer(ModelSerializer):
     order = serializers.PrimaryKeyRelatedField(queryset=models.Order.objects.all())
     product = serializers.PrimaryKeyRelatedField(queryset=models.Product.objects.all())
-    product_info = ProductSerializer(source="product", read_only=True)
+    product_info = ProductSerializer(source="product", read_only=True, expand=['store.seller'])
 
     class Meta:
         model = models.ServiceOrderDetail
         fields = ('service_order_detail_code', 'order', 'product', 'target_url', 'note', 'unit_price', 'quantity', 'total_amount', 'discount_amount',
                   'status', 'delivered_at', 'product_info', 'created_date', 'updated_date')
+        # status/delivered_at chỉ đổi qua PATCH /orders/{code}/ (accept/complete/cancel) để đi cùng trạng thái đơn và hoàn tiền
         read_only_fields = ['service_order_detail_code', 'order', 'product', "unit_price", "total_amount", 'discount_amount', 'product_info',
-                            'created_date', 'updated_date']
+                            'status', 'delivered_at', 'created_date', 'updated_date']
 
     def create(self, validated_data):
         product = validated_data["product"]
@@ -334,9 +394,7 @@ class ServiceOrderDetailSerializer(ModelSerializer):
             if voucher.store != product.store:
                 raise ValidationError("Voucher không thuộc cửa hàng này!")
 
-            discount = int(total * voucher.discount_percent / 100)
-            if voucher.max_discount and discount > voucher.max_discount:
-                discount = voucher.max_discount
+            discount = checkout.calc_discount(voucher, total)
             total -= discount
             validated_data["discount_amount"] = discount
         else:
@@ -345,48 +403,53 @@ class ServiceOrderDetailSerializer(ModelSerializer):
         validated_data["unit_price"] = unit_price
         validated_data["total_amount"] = total
 
-        # 2. Kiểm tra số dư buyer
-        if buyer.balance < total:
-            raise ValidationError("Số dư không đủ để thanh toán dịch vụ này!")
+        with transaction.atomic():
+            # 2-3. Trừ số dư buyer (UPDATE có điều kiện), ghi tiền chờ cộng cho seller và lưu transaction
+            wallet.pay_seller(
+                buyer, product.store.seller, total,
+                debit_note=f"Thanh toán dịch vụ {product.name} trong đơn {order.order_code}",
+                credit_note=f"Nhận tiền từ đơn dịch vụ {product.name} - {order.order_code}",
+                error="Số dư không đủ để thanh toán dịch vụ này!",
+                order=order
+            )
 
-        # 3. Trừ số dư buyer và lưu transaction
-        buyer.balance -= total
-        buyer.save(update_fields=["balance"])
+            # 4. Tạo service order detail
+            detail = models.ServiceOrderDetail.objects.create(**validated_data)
 
-        models.TransactionHistory.objects.create(
-            user=buyer,
-            type="purchase",
-            amount=total,
-            note=f"Thanh toán dịch vụ {product.name} trong đơn {order.order_code}"
-        )
+            # 5. Cập nhật trạng thái order = processing
+            order.status = "processing"
+            order.save(update_fields=["status"])
 
-        # Cộng tiền ngay cho seller
-        seller = product.store.seller
-        seller.balance += total
-        seller.save(update_fields=["balance"])
+        return detail
 
-        models.TransactionHistory.objects.create(
-            user=seller,
-            type="receive",
-            amount=total,
-            note=f"Nhận tiền từ đơn dịch vụ {product.name} - {order.order_code}"
-        )
 
-        # 4. Tạo service order detail
-        detail = models.ServiceOrderDetail.objects.create(**validated_data)
+class CheckoutSerializer(serializers.Serializer):
+    product = serializers.PrimaryKeyRelatedField(
+        queryset=models.Product.objects.filter(active=True, is_approved=True).select_related('store__seller'))
+    quantity = serializers.IntegerField(min_value=1)
+    code = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    target_url = serializers.URLField(required=False, allow_blank=True)
+    note = serializers.CharField(required=False, allow_blank=True, allow_null=True)
 
-        # 5. Cập nhật trạng thái order = processing
-        order.status = "processing"
-        order.save(update_fields=["status"])
+    def validate(self, attrs):
+        if attrs['product'].type == 'service' and not attrs.get('target_url'):
+            raise ValidationError({"target_url": "Dịch vụ cần Target URL."})
+        return attrs
 
-        return detail
+    def create(self, validated_data):
+        return checkout.place_order(
+            self.context['request'].user,
+            validated_data['product'],
+            validated_data['quantity'],
+            code=validated_data.get('code') or None,
+            target_url=validated_data.get('target_url'),
+            note=validated_data.get('note')
+        )
 
 
-class ComplaintSerializer(ModelSerializer):
-    order = OrderSerializer(read_only=True)
+class ComplaintSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'order': OrderSerializer, 'buyer': PublicUserSerializer, 'admin': PublicUserSerializer}
     order_code = serializers.CharField(write_only=True)
-    buyer = UserSerializer(read_only=True)
-    admin = UserSerializer(read_only=True)
 
     class Meta:
         model = models.Complaint
@@ -423,11 +486,10 @@ class ComplaintSerializer(ModelSerializer):
         validated_data["buyer"] = user  # complaint luôn gắn với user
         validated_data["order"] = order
 
-        # Cập nhật trạng thái order sang complained
-        order.status = "complained"
-        order.save(update_fields=["status", "updated_date"])
-
-        return models.Complaint.objects.create(**validated_data)
+        # Chuyển order sang complained qua state machine (đơn đã hoàn thành/giải ngân thì không khiếu nại được nữa)
+        with transaction.atomic():
+            order_states.apply(order, "complain")
+            return models.Complaint.objects.create(**validated_data)
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -440,11 +502,9 @@ class ComplaintSerializer(ModelSerializer):
         return data
 
 
-class ReviewSerializer(ModelSerializer):
-    product = ProductSerializer(read_only=True)
-    buyer = UserSerializer(read_only=True)
+class ReviewSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'product': ProductSerializer, 'buyer': PublicUserSerializer, 'order': OrderSerializer}
     product_code = serializers.CharField(write_only=True)
-    order = OrderSerializer(read_only=True)
     order_code = serializers.CharField(write_only=True)
 
     class Meta:
@@ -485,9 +545,8 @@ class ReviewSerializer(ModelSerializer):
         return models.Review.objects.create(**validated_data)
 
 
-class FavoriteProductSerializer(ModelSerializer):
-    product = ProductSerializer(read_only=True)
-    user = UserSerializer(read_only=True)
+class FavoriteProductSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'product': ProductSerializer, 'user': UserSerializer}
 
     class Meta:
         model = models.FavoriteProduct
@@ -499,8 +558,8 @@ class FavoriteProductSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class TransactionHistorySerializer(ModelSerializer):
-    user = UserSerializer(read_only=True)
+class TransactionHistorySerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'user': UserSerializer}  # chỉ trả lịch sử của chính user
 
     class Meta:
         model = models.TransactionHistory
@@ -512,8 +571,8 @@ class TransactionHistorySerializer(ModelSerializer):
         return super().create(validated_data)
 
 
-class DepositRequestSerializer(ModelSerializer):
-    user = UserSerializer(read_only=True)
+class DepositRequestSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'user': UserSerializer}
 
     class Meta:
         model = models.DepositRequest
@@ -537,8 +596,8 @@ class DepositRequestSerializer(ModelSerializer):
 
         return deposit
 
-class WithdrawRequestSerializer(ModelSerializer):
-    user = UserSerializer(read_only=True)
+class WithdrawRequestSerializer(ExpandableFieldsMixin, ModelSerializer):
+    expandable_fields = {'user': UserSerializer}
 
     class Meta:
         model = models.WithdrawRequest
@@ -549,24 +608,16 @@ class WithdrawRequestSerializer(ModelSerializer):
         user = self.context['request'].user
         amount = validated_data['amount']
 
-        # Kiểm tra số dư
-        if user.balance < amount:
-            raise serializers.ValidationError("Số dư không đủ để rút tiền!")
+        # Seller: gom tiền bán hàng đang chờ vào balance trước khi kiểm tra số dư
+        wallet.settle_pending_earnings(user)
 
-        # Trừ tiền
-        user.balance -= amount
-        user.save()
-
-        # Tạo WithdrawRequest
-        validated_data['user'] = user
-        withdraw = super().create(validated_data)
+        with transaction.atomic():
+            # Tạo WithdrawRequest
+            validated_data['user'] = user
+            withdraw = super().create(validated_data)
 
-        # Tạo TransactionHistory cho rút tiền
-        models.TransactionHistory.objects.create(
-            user=user,
-            type='withdraw',
-            amount=amount,
-            note=f"Yêu cầu rút tiền - {withdraw.withdraw_code}"
-        )
+            # Trừ tiền (UPDATE có điều kiện) + TransactionHistory cho rút tiền
+            wallet.debit(user, amount, 'withdraw', f"Yêu cầu rút tiền - {withdraw.withdraw_code}",
+                         error="Số dư không đủ để rút tiền!")
 
         return withdraw
\ No newline at end of file
@@ -1,106 +1,97 @@
 # MMO/signals.py
-import logging
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.db import transaction
-from django.core.mail import send_mail
-from django.conf import settings
-
-from .models import AccOrderDetail, ServiceOrderDetail, Order
-
-logger = logging.getLogger(__name__)
-
-
-def _send_order_email_for_seller(order: Order):
-    """
-    Gửi email cho seller dựa trên order đã có detail (acc_detail hoặc service_detail).
-    Gọi từ transaction.on_commit để đảm bảo dữ liệu đã commit.
-    """
-    try:
-        seller = None
-        detail = None
-
-        if hasattr(order, "acc_detail") and order.acc_detail and order.acc_detail.product:
-            detail = order.acc_detail
-            seller = detail.product.store.seller
-            detail_kind = "acc"
-        elif hasattr(order, "service_detail") and order.service_detail and order.service_detail.product:
-            detail = order.service_detail
-            seller = detail.product.store.seller
-            detail_kind = "service"
-        else:
-            logger.warning("No order detail for order %s - skip sending email", order.order_code)
-            return
-
-        if not seller or not getattr(seller, "email", None):
-            logger.warning("No seller/email for order %s - skip sending email", order.order_code)
-            return
-
-        subject = f"[Đơn hàng mới - MMOApp] {order.order_code}"
-        body_lines = [
-            f"Xin chào {getattr(seller, 'username', seller.user_code)}",
-            "",
-            f"Bạn có 1 đơn hàng mới: {order.order_code}",
-            f"Người mua: {order.buyer.username}",
-            f"Trạng thái: {order.status}",
-            f"Thời gian: {order.created_date}",
-            "",
-        ]
-
-        if detail_kind == "acc":
-            body_lines += [
-                f"Sản phẩm: {detail.product.name if detail.product else 'N/A'}",
-                f"Số lượng: {detail.quantity}",
-                f"Tổng: {detail.total_amount} đ",
-                f"Nội dung đã giao: {detail.content_delivered or 'N/A'}",
-            ]
-        else:  # service
-            body_lines += [
-                f"Sản phẩm (dịch vụ): {detail.product.name if detail.product else 'N/A'}",
-                f"Số lượng: {detail.quantity}",
-                f"Target URL: {getattr(detail, 'target_url', '')}",
-                f"Tổng: {detail.total_amount} đ",
-                f"Trạng thái chi tiết: {detail.status}",
-            ]
-
-        body_lines += ["", "Truy cập dashboard để xem chi tiết."]
-
-        message = "\n".join(body_lines)
-
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [seller.email],
-            fail_silently=False,
-        )
-        logger.info("Order email sent: %s -> %s", order.order_code, seller.email)
-
-        # Nếu bạn có field order.seller_notified (tuỳ chọn), đặt flag để tránh gửi trùng:
-        try:
-            if hasattr(order, "seller_notified") and not order.seller_notified:
-                order.seller_notified = True
-                order.save(update_fields=["seller_notified"])
-        except Exception:
-            logger.exception("Unable to set seller_notified for order %s", order.order_code)
-
-    except Exception as exc:
-        logger.exception("Failed to send order email for %s: %s", getattr(order, "order_code", "N/A"), exc)
+
+from . import catalog_cache, exports, jobs, metrics, recommender, vouchers
+from .models import AccountStock, AccOrderDetail, Blog, ExportJob, Order, Product, Review, ServiceOrderDetail, Store, Voucher
 
 
 @receiver(post_save, sender=AccOrderDetail)
 def acc_order_detail_created(sender, instance: AccOrderDetail, created, **kwargs):
     if not created:
         return
-    order = instance.order
-    # gửi sau khi transaction commit
-    transaction.on_commit(lambda: _send_order_email_for_seller(order))
+    # chỉ thêm job vào hàng đợi (commit cùng đơn hàng), worker gửi email sau
+    jobs.enqueue('send_order_email', {'order_code': instance.order_id})
+    metrics.record_order(instance)
 
 
 @receiver(post_save, sender=ServiceOrderDetail)
 def service_order_detail_created(sender, instance: ServiceOrderDetail, created, **kwargs):
     if not created:
         return
-    order = instance.order
-    # gửi sau khi transaction commit
-    transaction.on_commit(lambda: _send_order_email_for_seller(order))
+    # chỉ thêm job vào hàng đợi (commit cùng đơn hàng), worker gửi email sau
+    jobs.enqueue('send_order_email', {'order_code': instance.order_id})
+    metrics.record_order(instance)
+
+
+@receiver(post_save, sender=Voucher)
+@receiver(post_delete, sender=Voucher)
+def voucher_changed(sender, instance: Voucher, **kwargs):
+    # Seller sửa/xoá voucher -> xoá bản cache và bộ đếm token để đồng bộ lại từ DB
+    transaction.on_commit(lambda: vouchers.forget_voucher(instance))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance: Product, **kwargs):
+    catalog_cache.bump_store(instance.store_id)
+    # Sản phẩm mới chưa duyệt không có trong model gợi ý; duyệt/sửa/bỏ duyệt/xoá thì cập nhật model
+    if instance.is_approved or not kwargs.get('created'):
+        recommender.schedule_update()
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def store_changed(sender, instance: Store, **kwargs):
+    catalog_cache.bump_store(instance.store_code)
+
+
+@receiver(post_save, sender=AccountStock)
+@receiver(post_delete, sender=AccountStock)
+def account_stock_changed(sender, instance: AccountStock, **kwargs):
+    # Kho đổi -> available_quantity của product đổi. Sửa nội dung/lưu lại không đổi số lượng thì danh sách không đổi.
+    # Xoá hàng loạt qua QuerySet không gọi AccountStock.delete() -> không có _available_delta, coi như đã đổi
+    if not getattr(instance, '_available_delta', 1):
+        return
+    if AccountStock.product.is_cached(instance):
+        store_code = instance.product.store_id  # serializer/admin đã có product -> không query thêm
+    else:
+        store_code = Product.objects.filter(pk=instance.product_id).values_list('store_id', flat=True).first()
+    if store_code:
+        catalog_cache.bump_store(store_code)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def blog_changed(sender, instance: Blog, **kwargs):
+    catalog_cache.bump_on_commit(catalog_cache.BLOGS)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance: Order, created, **kwargs):
+    # Đổi trạng thái/ẩn đơn qua Order.save() (serializer cũ, admin); state machine và escrow tự ghi số liệu
+    if created:
+        return
+    old_status = getattr(instance, '_loaded_status', instance.status)
+    if getattr(instance, '_loaded_active', instance.active) != instance.active:
+        metrics.record_active(instance, old_status)
+    else:
+        metrics.record_status(instance, old_status, instance.status)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance: Review, created, **kwargs):
+    if created:
+        metrics.record_review(instance)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance: Review, **kwargs):
+    metrics.record_review(instance, sign=-1)
+
+
+@receiver(post_delete, sender=ExportJob)
+def export_job_deleted(sender, instance: ExportJob, **kwargs):
+    # Xoá ExportJob (kể cả xoá hàng loạt trong admin) thì xoá luôn file đã xuất
+    transaction.on_commit(lambda: exports.remove_file(instance))
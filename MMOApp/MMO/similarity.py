@@ -0,0 +1,62 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import recommender
+from .models import Product, ProductSimilarity
+
+# Sản phẩm tương tự: với mỗi sản phẩm lấy TOP_K sản phẩm có cosine TF-IDF cao nhất (ma trận của MMO.recommender,
+# các dòng đã chuẩn hoá L2 nên cosine = tích vô hướng). Tính theo từng khối CHUNK_SIZE dòng: khối x toàn bộ
+# ma trận là 1 phép nhân sparse, bộ nhớ tỉ lệ với kích thước khối chứ không phải n x n.
+TOP_K = getattr(settings, 'SIMILAR_PRODUCTS_K', 10)
+CHUNK_SIZE = getattr(settings, 'SIMILAR_PRODUCTS_CHUNK_SIZE', 500)
+
+
+def _top_k(scores, offset, k):
+    # Mỗi dòng của scores (CSR): (cột, điểm) của k sản phẩm giống nhất, bỏ chính nó, giảm dần theo điểm
+    for i in range(scores.shape[0]):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        cols, values = scores.indices[start:end], scores.data[start:end]
+        others = cols != offset + i
+        cols, values = cols[others], values[others]
+        if len(values) > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            cols, values = cols[best], values[best]
+        order = np.argsort(-values, kind='stable')
+        yield cols[order], values[order]
+
+
+def build(k=TOP_K, chunk_size=CHUNK_SIZE):
+    """
+    Tính lại ProductSimilarity cho mọi sản phẩm trong model gợi ý, mỗi khối ghi trong 1 transaction ngắn
+    (xoá danh sách cũ của các sản phẩm trong khối rồi bulk_create). Trả về số dòng đã ghi.
+    """
+    model = recommender.update()  # model theo kịp sản phẩm mới duyệt/sửa trước khi tính
+    if model is None:
+        return 0
+    matrix, codes = model.matrix, model.codes
+    transposed = matrix.T.tocsr()
+    written = 0
+    for start in range(0, matrix.shape[0], chunk_size):
+        chunk_codes = codes[start:start + chunk_size].tolist()
+        neighbours = list(_top_k(matrix[start:start + chunk_size] @ transposed, start, k))
+        # Sản phẩm bị xoá sau khi build model thì bỏ qua (tránh lỗi khoá ngoại)
+        wanted = set(chunk_codes).union(*(codes[cols].tolist() for cols, _ in neighbours))
+        existing = set(Product.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+
+        rows = []
+        for product, (cols, values) in zip(chunk_codes, neighbours):
+            if product not in existing:
+                continue
+            similar = [(code, value) for code, value in zip(codes[cols].tolist(), values.tolist()) if code in existing]
+            rows += [ProductSimilarity(product_id=product, similar_id=code, rank=rank, score=value)
+                     for rank, (code, value) in enumerate(similar, 1)]
+
+        with transaction.atomic():
+            ProductSimilarity.objects.filter(product_id__in=chunk_codes).delete()
+            ProductSimilarity.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+
+    # Sản phẩm đã bị bỏ duyệt không còn trong model -> xoá danh sách cũ của chúng
+    ProductSimilarity.objects.exclude(product__is_approved=True).delete()
+    return written
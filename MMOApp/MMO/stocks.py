@@ -0,0 +1,139 @@
+import csv
+import logging
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import catalog_cache, models
+from .utils import generate_codes
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def _parse_line(line: str):
+    # Hỗ trợ cả dạng TK|MK|Email|OTP lẫn file CSV phân tách bằng dấu phẩy
+    if '|' in line:
+        fields = line.split('|')
+    else:
+        fields = next(csv.reader([line]))
+    return [f.strip() for f in fields]
+
+
+def import_stocks(product, lines):
+    """
+    Nhập kho hàng loạt cho product từ một iterable các dòng (bytes hoặc str), đọc từng dòng một.
+    Mỗi dòng phải đúng số trường của product.format; dòng lỗi/trùng (trong file hoặc đã có trong kho) được bỏ qua
+    và ghi vào báo cáo. Mỗi lô IMPORT_BATCH_SIZE dòng commit riêng: lô lỗi DB thì dừng, các lô trước vẫn giữ và
+    báo cáo có 'failed' = {'line', 'error'} (dòng đầu của lô lỗi); nhập lại cả file thì các dòng đã có được bỏ qua.
+    Trả về dict {'created', 'skipped', 'errors': [{'line', 'error'}, ...]}.
+    """
+    field_count = len(product.format.split('|'))
+    batch = {}  # content -> số dòng, chỉ giữ lô đang đọc; trùng với lô trước được phát hiện qua DB
+    created = 0
+    skipped = 0
+    errors = []
+
+    def add_error(line_no, message):
+        nonlocal skipped
+        skipped += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line_no, 'error': message})
+
+    def flush():
+        # Ghi lô hiện tại trong 1 transaction. Lỗi DB thì trả về {'line', 'error'} (dòng đầu của lô), thành công trả None
+        nonlocal created
+        first_line = next(iter(batch.values()))
+        try:
+            with transaction.atomic():
+                # Khoá dòng product: 2 lần nhập song song cho cùng product không cùng chèn 1 tài khoản
+                models.Product.objects.select_for_update().filter(pk=product.pk).values_list('pk').first()
+                existing = set(models.AccountStock.objects.filter(product=product, content__in=list(batch))
+                               .values_list('content', flat=True))
+                contents = [content for content in batch if content not in existing]
+                if contents:
+                    codes = generate_codes(models.AccountStock, 'stock_code', 'AS', len(contents))
+                    models.AccountStock.objects.bulk_create([
+                        models.AccountStock(stock_code=code, product=product, content=content)
+                        for code, content in zip(codes, contents)
+                    ])
+                    models.Product.objects.filter(pk=product.pk).update(
+                        available_quantity=F('available_quantity') + len(contents))
+                    catalog_cache.bump_store(product.store_id)  # bulk_create không gửi signal
+        except DatabaseError as e:
+            logger.exception("Nhập kho product %s lỗi ở lô bắt đầu từ dòng %s", product.pk, first_line)
+            return {'line': first_line, 'error': str(e)}
+        finally:
+            lines_by_content = dict(batch)
+            batch.clear()
+        created += len(contents)
+        for content in existing:
+            add_error(lines_by_content[content], "Đã có trong kho")
+        return None
+
+    for line_no, raw in enumerate(lines, start=1):
+        if isinstance(raw, bytes):
+            try:
+                raw = raw.decode('utf-8-sig' if line_no == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                add_error(line_no, "Dòng không phải UTF-8")
+                continue
+
+        line = raw.strip()
+        if not line:
+            continue
+
+        fields = _parse_line(line)
+        if len(fields) != field_count:
+            add_error(line_no, f"Sai định dạng, cần {field_count} trường theo {product.format}")
+            continue
+        if not all(fields):
+            add_error(line_no, "Có trường bị bỏ trống")
+            continue
+
+        content = '|'.join(fields)
+        if content in batch:
+            add_error(line_no, f"Trùng với dòng {batch[content]}")
+            continue
+        batch[content] = line_no
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            failed = flush()
+            if failed:
+                break
+    else:
+        failed = flush() if batch else None
+
+    report = {'created': created, 'skipped': skipped, 'errors': errors}
+    if failed:
+        report['failed'] = failed
+    return report
+
+
+def claim_stocks(product, qty):
+    """
+    Lấy qty tài khoản chưa bán của product theo thứ tự nhập kho (FIFO) và đánh dấu đã bán bằng 1 câu UPDATE.
+    Phải gọi bên trong transaction.atomic(). Các dòng được khoá bằng SELECT ... FOR UPDATE SKIP LOCKED
+    nên 2 đơn song song không bao giờ nhận cùng một tài khoản; DB không hỗ trợ SKIP LOCKED thì UPDATE có điều kiện
+    is_sold=False sẽ phát hiện tranh chấp. Trả về danh sách content.
+    """
+    qs = models.AccountStock.objects.filter(product=product, is_sold=False).order_by('created_date', 'stock_code')
+    if connection.features.has_select_for_update_skip_locked:
+        qs = qs.select_for_update(skip_locked=True)
+
+    rows = list(qs.values_list('stock_code', 'content')[:qty])
+    if len(rows) < qty:
+        raise ValidationError("Không đủ tài khoản trong kho!")
+
+    codes = [code for code, _ in rows]
+    updated = models.AccountStock.objects.filter(pk__in=codes, is_sold=False).update(is_sold=True, sold_at=timezone.now())
+    if updated != qty:
+        raise ValidationError("Kho vừa thay đổi, vui lòng thử lại!")
+
+    models.Product.objects.filter(pk=product.pk).update(available_quantity=F('available_quantity') - qty)
+    catalog_cache.bump_store(product.store_id)
+    return [content for _, content in rows]
@@ -0,0 +1,101 @@
+# MMO/tasks.py - handler cho các job nền (chạy bởi manage.py run_workers)
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+from . import exports, jobs, recommender
+from .models import ExportJob, Order
+
+logger = logging.getLogger(__name__)
+
+
+@jobs.task('send_order_email')
+def send_order_email(order_code):
+    """
+    Gửi email cho seller dựa trên order đã có detail (acc_detail hoặc service_detail).
+    Lỗi SMTP được raise để hàng đợi thử lại theo backoff.
+    """
+    order = (Order.objects
+             .select_related('buyer', 'acc_detail__product__store__seller', 'service_detail__product__store__seller')
+             .filter(order_code=order_code).first())
+    if order is None:
+        logger.warning("Order %s not found - skip sending email", order_code)
+        return
+
+    seller = None
+    detail = None
+
+    if hasattr(order, "acc_detail") and order.acc_detail and order.acc_detail.product:
+        detail = order.acc_detail
+        seller = detail.product.store.seller
+        detail_kind = "acc"
+    elif hasattr(order, "service_detail") and order.service_detail and order.service_detail.product:
+        detail = order.service_detail
+        seller = detail.product.store.seller
+        detail_kind = "service"
+    else:
+        logger.warning("No order detail for order %s - skip sending email", order.order_code)
+        return
+
+    if not seller or not getattr(seller, "email", None):
+        logger.warning("No seller/email for order %s - skip sending email", order.order_code)
+        return
+
+    subject = f"[Đơn hàng mới - MMOApp] {order.order_code}"
+    body_lines = [
+        f"Xin chào {getattr(seller, 'username', seller.user_code)}",
+        "",
+        f"Bạn có 1 đơn hàng mới: {order.order_code}",
+        f"Người mua: {order.buyer.username}",
+        f"Trạng thái: {order.status}",
+        f"Thời gian: {order.created_date}",
+        "",
+    ]
+
+    if detail_kind == "acc":
+        body_lines += [
+            f"Sản phẩm: {detail.product.name if detail.product else 'N/A'}",
+            f"Số lượng: {detail.quantity}",
+            f"Tổng: {detail.total_amount} đ",
+            f"Nội dung đã giao: {detail.content_delivered or 'N/A'}",
+        ]
+    else:  # service
+        body_lines += [
+            f"Sản phẩm (dịch vụ): {detail.product.name if detail.product else 'N/A'}",
+            f"Số lượng: {detail.quantity}",
+            f"Target URL: {getattr(detail, 'target_url', '')}",
+            f"Tổng: {detail.total_amount} đ",
+            f"Trạng thái chi tiết: {detail.status}",
+        ]
+
+    body_lines += ["", "Truy cập dashboard để xem chi tiết."]
+
+    message = "\n".join(body_lines)
+
+    send_mail(
+        subject,
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        [seller.email],
+        fail_silently=False,
+    )
+    logger.info("Order email sent: %s -> %s", order.order_code, seller.email)
+
+
+@jobs.task('run_export')
+def run_export(export_id):
+    # Ghi file cho ExportJob (MMO.exports); lỗi được raise để hàng đợi chạy lại từ đầu theo backoff
+    export = ExportJob.objects.filter(pk=export_id).first()
+    if export is None or export.status == 'done':
+        return
+    rows = exports.run_export(export)
+    logger.info("Export %s done: %s rows -> %s", export_id, rows, export.kind)
+
+
+@jobs.task('update_recommender')
+def update_recommender():
+    # Cập nhật model TF-IDF sau khi sản phẩm được duyệt/sửa (hẹn bởi recommender.schedule_update)
+    model = recommender.update()
+    if model is not None:
+        logger.info("Recommender model %s: %s products", model.version, model.matrix.shape[0])
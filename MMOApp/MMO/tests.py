@@ -1,3 +1,655 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, connections, transaction
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.test import APIClient
+
+from .utils import CodeAllocator
+from . import (catalog_cache, checkout, escrow, jobs, metrics, models, order_states, recommender, reputation,
+               serializers, stocks, vouchers, wallet)
+
+
+class BaseTestCase(TestCase):
+    databases = '__all__'  # generate_code giữ block mã trên connection 'sequences' (mirror của default khi test)
+
+    def setUp(self):
+        self.buyer = models.User.objects.create(username='buyer', phone='0900000001', balance=Decimal(1000))
+        self.seller = models.User.objects.create(username='seller', phone='0900000002', role='seller', is_verified=True)
+        self.store = models.Store.objects.create(seller=self.seller, name='Store', description='Store test')
+        self.product = models.Product.objects.create(store=self.store, name='Facebook', image='image',
+                                                     description='facebook account', price=Decimal(10),
+                                                     format='TK|MK', type='account', is_approved=True)
+
+    def balance(self, user):
+        user.refresh_from_db(fields=['balance'])
+        return user.balance
+
+
+# Ví: mọi thay đổi số dư đi qua MMO.wallet
+class WalletTestCase(BaseTestCase):
+    def test_debit_rejects_overdraft(self):
+        # Như các view: hàm ví dùng atomic(savepoint=False), caller tự mở transaction
+        with self.assertRaises(ValidationError), transaction.atomic():
+            wallet.debit(self.buyer, Decimal(1001), 'purchase', 'Quá số dư')
+        self.assertEqual(self.balance(self.buyer), Decimal(1000))
+        self.assertFalse(models.TransactionHistory.objects.exists())
+
+    def test_transfer_is_balanced(self):
+        wallet.transfer(self.buyer, self.seller, Decimal(300), 'Mua hàng', 'Bán hàng')
+        self.assertEqual(self.balance(self.buyer), Decimal(700))
+        self.assertEqual(self.balance(self.seller), Decimal(300))
+        history = dict(models.TransactionHistory.objects.values_list('type', 'amount'))
+        self.assertEqual(history, {'purchase': Decimal(300), 'receive': Decimal(300)})
+
+    def test_transfer_overdraft_moves_nothing(self):
+        with self.assertRaises(ValidationError), transaction.atomic():
+            wallet.transfer(self.buyer, self.seller, Decimal(2000), 'Mua hàng', 'Bán hàng')
+        self.assertEqual(self.balance(self.buyer), Decimal(1000))
+        self.assertEqual(self.balance(self.seller), Decimal(0))
+        self.assertFalse(models.TransactionHistory.objects.exists())
+
+    def test_refund_reverses_seller_earning(self):
+        order = models.Order.objects.create(buyer=self.buyer, store=self.store)
+        wallet.pay_seller(self.buyer, self.seller, Decimal(250), 'Mua hàng', 'Bán hàng', order=order)
+        self.assertEqual(self.balance(self.buyer), Decimal(750))
+        self.assertEqual(wallet.held_earnings(self.seller), Decimal(250))
+
+        with transaction.atomic():
+            refunded = wallet.refund_order(order, 'Hoàn tiền')
+        self.assertEqual(refunded, Decimal(250))
+        self.assertEqual(self.balance(self.buyer), Decimal(1000))
+        self.assertEqual(wallet.held_earnings(self.seller), 0)
+        self.assertEqual(wallet.balance_of(self.seller), Decimal(0))
+
+        # Hoàn lần 2: không còn tiền giữ, không cộng thêm cho buyer
+        with transaction.atomic():
+            self.assertEqual(wallet.refund_order(order, 'Hoàn tiền'), 0)
+        self.assertEqual(self.balance(self.buyer), Decimal(1000))
+
+
+    def test_profile_update_keeps_wallet_balance(self):
+        stale = models.User.objects.get(pk=self.buyer.pk)
+        with transaction.atomic():
+            wallet.credit(self.buyer, Decimal(500), 'deposit', 'Nạp tiền')  # request khác cộng tiền sau khi stale được đọc
+        serializer = serializers.UserSerializer(stale, data={'first_name': 'Buyer', 'balance': '0'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.balance(self.buyer), Decimal(1500))
+        self.assertEqual(models.User.objects.get(pk=self.buyer.pk).first_name, 'Buyer')
+
+    def test_upgrade_to_seller_keeps_wallet_balance(self):
+        models.User.objects.filter(pk=self.buyer.pk).update(is_verified=True)
+        stale = models.User.objects.get(pk=self.buyer.pk)
+        with transaction.atomic():
+            wallet.credit(self.buyer, Decimal(500), 'deposit', 'Nạp tiền')
+        client = APIClient()
+        client.force_authenticate(stale)
+        self.assertEqual(client.patch('/users/upgrade-to-seller/').status_code, 200)
+        self.assertEqual(self.balance(self.buyer), Decimal(1500))
+        self.assertEqual(models.User.objects.get(pk=self.buyer.pk).role, 'seller')
+
+# Kho tài khoản: available_quantity phải luôn bằng số AccountStock chưa bán
+class StockTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        stocks.import_stocks(self.product, [f"user{i}|pass{i}" for i in range(5)])
+
+    def assertCounterInSync(self):
+        self.product.refresh_from_db(fields=['available_quantity'])
+        unsold = models.AccountStock.objects.filter(product=self.product, is_sold=False).count()
+        self.assertEqual(self.product.available_quantity, unsold)
+        return unsold
+
+    def test_claim_shortfall_fails_cleanly(self):
+        with self.assertRaises(ValidationError), transaction.atomic():
+            stocks.claim_stocks(self.product, 6)
+        self.assertEqual(self.assertCounterInSync(), 5)
+
+    def test_claim_updates_counter(self):
+        with transaction.atomic():
+            contents = stocks.claim_stocks(self.product, 2)
+        self.assertEqual(contents, ['user0|pass0', 'user1|pass1'])  # FIFO theo thứ tự nhập kho
+        self.assertEqual(self.assertCounterInSync(), 3)
+
+    def test_queryset_delete_updates_counter(self):
+        with transaction.atomic():
+            stocks.claim_stocks(self.product, 1)
+        # Xoá cả dòng đã bán lẫn chưa bán: chỉ dòng chưa bán được trừ khỏi available_quantity
+        codes = list(models.AccountStock.objects.filter(product=self.product)
+                     .order_by('created_date', 'stock_code').values_list('pk', flat=True)[:3])
+        models.AccountStock.objects.filter(pk__in=codes).delete()
+        self.assertEqual(self.assertCounterInSync(), 2)
+
+    def test_stock_save_does_not_load_product(self):
+        stock = models.AccountStock.objects.filter(product=self.product).first()
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks() as bumps:
+            stock.content = 'user0|newpass'
+            stock.save()  # không đổi số lượng -> không xoá cache, không đọc product
+        self.assertFalse(bumps)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "MMO_product"' in q['sql'].replace('`', '"')])
+
+        stock = models.AccountStock(product=self.product, content='user9|pass9')
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks() as bumps:
+            stock.save()  # product đã có trên instance -> lấy store_id từ đó
+        self.assertEqual(len(bumps), 1)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "MMO_product"' in q['sql'].replace('`', '"')])
+        self.assertEqual(self.assertCounterInSync(), 6)
+
+    def test_import_skips_rows_already_in_stock(self):
+        with mock.patch.object(stocks, 'IMPORT_BATCH_SIZE', 2):
+            report = stocks.import_stocks(self.product, ["user4|pass4", "user5|pass5", "user5|pass5", "user0|pass0"])
+        self.assertEqual((report['created'], report['skipped']), (1, 3))
+        self.assertEqual(sorted(e['line'] for e in report['errors']), [1, 3, 4])
+        self.assertEqual(self.assertCounterInSync(), 6)
+
+    def test_import_reports_committed_rows_on_failure(self):
+        bulk_create = models.AccountStock.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 2:
+                raise DatabaseError("mất kết nối")
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(stocks, 'IMPORT_BATCH_SIZE', 2), \
+                mock.patch.object(models.AccountStock.objects, 'bulk_create', side_effect=fail_second_batch), \
+                self.assertLogs('MMO.stocks', 'ERROR'):
+            report = stocks.import_stocks(self.product, [f"new{i}|pass" for i in range(5)])
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['failed']['line'], 3)
+        self.assertEqual(self.assertCounterInSync(), 7)
+
+        # Nhập lại cả file: 2 dòng đã lưu được bỏ qua
+        report = stocks.import_stocks(self.product, [f"new{i}|pass" for i in range(5)])
+        self.assertEqual((report['created'], report['skipped']), (3, 2))
+
+
+# Chuyển trạng thái đơn: optimistic lock theo version, tiền chỉ được hoàn/giải ngân 1 lần
+class OrderStateTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        stocks.import_stocks(self.product, ["user0|pass0", "user1|pass1"])
+        self.product.refresh_from_db()
+        order, _ = checkout.place_order(self.buyer, self.product, 2)  # đơn tài khoản: delivered, tiền seller đang giữ
+        self.order_code = order.order_code
+
+    def test_illegal_transition_rejected(self):
+        with self.assertRaises(PermissionDenied):
+            order_states.apply(order_states.load(self.order_code), 'refund')  # chưa khiếu nại
+        order = models.Order.objects.get(pk=self.order_code)
+        self.assertEqual((order.status, order.version), ('delivered', 0))
+
+    def test_stale_version_conflict(self):
+        order = order_states.load(self.order_code)
+        models.Order.objects.filter(pk=self.order_code).update(version=F('version') + 1)  # request khác vừa sửa đơn
+        with self.assertRaises(ValidationError):
+            order_states.apply(order, 'complain')
+        self.assertEqual(models.Order.objects.get(pk=self.order_code).status, 'delivered')
+
+    def test_refund_sent_twice_moves_money_once(self):
+        order_states.apply(order_states.load(self.order_code), 'complain')
+        first, second = order_states.load(self.order_code), order_states.load(self.order_code)
+        order_states.apply(first, 'refund')
+        with self.assertRaises(ValidationError):
+            order_states.apply(second, 'refund')  # cùng version đã đọc -> xung đột
+        with self.assertRaises(PermissionDenied):
+            order_states.apply(order_states.load(self.order_code), 'refund')  # đã refunded
+
+        self.assertEqual(self.balance(self.buyer), Decimal(1000))
+        self.assertEqual(wallet.held_earnings(self.seller), 0)
+        self.assertEqual(models.TransactionHistory.objects.filter(type='refund').count(), 1)
+
+    def test_release_sent_twice_moves_money_once(self):
+        first, second = order_states.load(self.order_code), order_states.load(self.order_code)
+        order_states.apply(first, 'release')
+        with self.assertRaises(ValidationError):
+            order_states.apply(second, 'release')
+        with self.assertRaises(PermissionDenied):
+            order_states.apply(order_states.load(self.order_code), 'release')  # đã completed
+
+        self.assertEqual(self.balance(self.seller), Decimal(20))
+        self.assertEqual(wallet.held_earnings(self.seller), 0)
+        self.assertEqual(self.balance(self.buyer), Decimal(980))
+
+    def test_service_status_only_changes_through_order_actions(self):
+        service = models.Product.objects.create(store=self.store, name='Like', image='image', description='tăng like',
+                                                price=Decimal(1), type='service', is_approved=True)
+        order, detail = checkout.place_order(self.buyer, service, 10, target_url='https://x.com/a')
+        seller = APIClient()
+        seller.force_authenticate(self.seller)
+
+        # PATCH thẳng service detail không đổi được status (bỏ qua state machine, không hoàn tiền)
+        r = seller.patch(f'/service-orders-detail/{detail.pk}/', {'status': 'completed'}, format='json')
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(r.data['status'], 'pending')
+
+        r = seller.patch(f'/orders/{order.order_code}/', {'action': 'accept'}, format='json')
+        self.assertEqual(r.status_code, 200, r.data)
+        detail.refresh_from_db()
+        self.assertEqual(detail.status, 'in_progress')
+
+
+
+# Giải ngân: tính bảo hành từ delivered_at, lưu lại đơn (updated_date đổi) không ảnh hưởng hạn giải ngân
+class EscrowTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        stocks.import_stocks(self.product, ["user0|pass0", "user1|pass1"])
+        self.product.refresh_from_db()
+        self.orders = [checkout.place_order(self.buyer, self.product, 1)[0] for _ in range(2)]
+
+    def test_delivered_at_set_on_delivery(self):
+        for order in self.orders:
+            self.assertIsNotNone(order.delivered_at)
+        self.assertEqual(escrow.release_due_orders(), 0)  # chưa hết bảo hành
+
+    def test_release_counts_from_delivered_at(self):
+        delivered_at = timezone.now() - timedelta(days=self.product.warranty_days + 1)
+        models.Order.objects.filter(pk__in=[o.pk for o in self.orders]).update(delivered_at=delivered_at)
+        stale = models.Order.objects.get(pk=self.orders[1].pk)
+        stale.is_paid = True
+        stale.save()  # lưu lại đơn sau khi giao: updated_date mới nhưng hạn bảo hành không đổi
+
+        self.assertEqual(escrow.release_due_orders(chunk_size=1), 2)
+        self.assertEqual(wallet.held_earnings(self.seller), 0)
+        self.assertEqual(self.balance(self.seller), Decimal(20))
+
+
+
+# Cache danh mục: sửa sản phẩm tăng version -> response/ETag cũ không còn được dùng
+class CatalogCacheTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+
+    def test_product_change_invalidates_list_and_etag(self):
+        first = self.client.get('/products/')
+        self.assertEqual(self.client.get('/products/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        version = catalog_cache.current_version(catalog_cache.CATALOG)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Tiktok'
+            self.product.save()
+        self.assertEqual(catalog_cache.current_version(catalog_cache.CATALOG), version + 1)
+
+        second = self.client.get('/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['results'][0]['name'], 'Tiktok')
+
+
+# ?expand=: object lồng chỉ dựng khi được yêu cầu, user lồng của người khác không lộ balance/email/phone
+class ExpandTestCase(BaseTestCase):
+    PRIVATE = {'balance', 'email', 'phone', 'password'}
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def test_order_detail_seller_is_public_profile(self):
+        stocks.import_stocks(self.product, ["user0|pass0"])
+        self.product.refresh_from_db()
+        order, _ = checkout.place_order(self.buyer, self.product, 1)
+        response = self.client.get(f'/orders/{order.order_code}/details/')
+        self.assertEqual(response.status_code, 200, response.data)
+        seller = response.data['detail']['product_info']['store']['seller']
+        self.assertEqual(seller['user_code'], self.seller.pk)
+        self.assertFalse(self.PRIVATE & set(seller))
+
+    def test_related_objects_collapsed_unless_expanded(self):
+        with transaction.atomic():
+            wallet.credit(self.buyer, Decimal(10), 'deposit', 'Nạp tiền')
+        models.Blog.objects.create(author=self.seller, title='Blog', content='Nội dung', category='other')
+
+        response = self.client.get('/transaction-histories/my-transactions/')
+        self.assertEqual(response.data['results'][0]['user'], self.buyer.pk)
+        response = self.client.get('/blogs/')
+        self.assertEqual(response.data['results'][0]['author'], self.seller.pk)
+
+        author = self.client.get('/blogs/?expand=author').data['results'][0]['author']
+        self.assertEqual(author['username'], 'seller')
+        self.assertFalse(self.PRIVATE & set(author))
+
+# Số liệu store theo ngày: backfill lịch sử khi deploy
+class StoreMetricsTestCase(BaseTestCase):
+    def test_reconcile_all_backfills_history(self):
+        stocks.import_stocks(self.product, ["user0|pass0"])
+        self.product.refresh_from_db()
+        order, _ = checkout.place_order(self.buyer, self.product, 1)
+        created_date = order.created_date - timedelta(days=400)
+        models.Order.objects.filter(pk=order.pk).update(created_date=created_date)
+        models.StoreDailyMetrics.objects.all().delete()  # như lúc vừa deploy: bảng chưa có lịch sử
+
+        call_command('reconcile_store_metrics', '--all', stdout=StringIO())
+        row = models.StoreDailyMetrics.objects.get(store=self.store)
+        self.assertEqual((row.day, row.orders, row.acc_revenue), (timezone.localdate(created_date), 1, Decimal(10)))
+
+    def test_update_all_writes_field_types(self):
+        stocks.import_stocks(self.product, ["user0|pass0"])
+        self.product.refresh_from_db()
+        checkout.place_order(self.buyer, self.product, 1)
+
+        self.assertEqual(reputation.update_all(), 1)
+        store = models.Store.objects.get(pk=self.store.pk)
+        self.assertEqual(store.order_count, 1)
+        self.assertIs(type(store.order_count), int)
+        self.assertIs(type(store.fulfill_rate), float)
+        self.assertIsNone(store.avg_delivery_hours)  # chưa giao xong đơn nào tính được thời gian -> NULL
+
+    def test_checkout_appends_deltas(self):
+        stocks.import_stocks(self.product, ["user0|pass0", "user1|pass1"])
+        self.product.refresh_from_db()
+        for _ in range(2):
+            checkout.place_order(self.buyer, self.product, 1)
+        # Checkout chỉ INSERT delta, không UPDATE dòng (store, hôm nay)
+        self.assertFalse(models.StoreDailyMetrics.objects.exists())
+        self.assertEqual(models.StoreMetricsDelta.objects.count(), 2)
+
+        self.assertEqual(metrics.rollup(), 2)
+        row = models.StoreDailyMetrics.objects.get(store=self.store)
+        self.assertEqual((row.orders, row.acc_revenue), (2, Decimal(20)))
+        self.assertFalse(models.StoreMetricsDelta.objects.exists())
+
+    def test_inactive_orders_not_counted(self):
+        stocks.import_stocks(self.product, ["user0|pass0", "user1|pass1"])
+        self.product.refresh_from_db()
+        orders = [checkout.place_order(self.buyer, self.product, 1)[0] for _ in range(2)]
+        metrics.rollup()
+
+        hidden = models.Order.objects.get(pk=orders[0].pk)
+        hidden.active = False
+        hidden.save()  # admin ẩn đơn: trừ phần của đơn khỏi số liệu
+        metrics.rollup()
+        row = models.StoreDailyMetrics.objects.get(store=self.store)
+        self.assertEqual((row.orders, row.fulfilled_orders, row.acc_revenue), (1, 1, Decimal(10)))
+
+        metrics.reconcile(row.day, row.day)  # tính lại từ dữ liệu gốc cũng bỏ đơn đã ẩn
+        row = models.StoreDailyMetrics.objects.get(store=self.store)
+        self.assertEqual((row.orders, row.fulfilled_orders, row.acc_revenue), (1, 1, Decimal(10)))
+
+
+# Phân trang keyset: cursor (created_date, pk), các dòng trùng created_date không bị lặp/mất khi qua trang
+class KeysetPaginatorTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        self.created_date = timezone.now()
+        self.codes = [self.create_order().order_code for _ in range(5)]
+
+    def create_order(self):
+        order = models.Order.objects.create(buyer=self.buyer, store=self.store)
+        models.Order.objects.filter(pk=order.pk).update(created_date=self.created_date)  # cùng 1 thời điểm
+        return order
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, [row['order_code'] for row in response.data['results']]
+
+    def test_ties_span_pages_without_skip_or_repeat(self):
+        data, seen = self.page('/orders/my-orders/?page_size=2')
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        self.create_order()  # dòng mới trùng created_date, xếp trước cursor -> không được đẩy dòng cũ sang trang sau
+
+        pages = [seen]
+        while data['next']:
+            data, rows = self.page(data['next'])
+            pages.append(rows)
+            seen += rows
+        self.assertEqual(seen, sorted(self.codes, reverse=True))
+
+        # Trang trước của trang cuối là đúng trang liền trước
+        data, rows = self.page(data['previous'])
+        self.assertEqual(rows, pages[-2])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/orders/my-orders/?cursor=abc').status_code, 404)
+
+
+# Hàng đợi job: worker chết giữa chừng vẫn tính 1 lượt thử
+class JobTestCase(TestCase):
+    def crash(self, job):
+        # Mô phỏng worker claim job rồi chết, quá LOCK_TIMEOUT không heartbeat
+        self.assertEqual([j.pk for j in jobs.claim()], [job.pk])
+        models.Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(seconds=1))
+
+    def test_requeue_stale_moves_crashing_job_to_dead(self):
+        job = jobs.enqueue('crash_worker', max_attempts=2)
+        self.crash(job)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertGreater(job.run_at, timezone.now())  # chờ backoff như 1 lần lỗi
+
+        models.Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.crash(job)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 2))
+        self.assertFalse(jobs.claim())
+
+    def test_requeue_stale_skips_live_job(self):
+        job = jobs.enqueue('export')
+        jobs.claim()
+        self.assertEqual(jobs.requeue_stale(), 0)
+        self.assertEqual(models.Job.objects.get(pk=job.pk).status, 'running')
+
+
+# Voucher: tra theo (store, code), bộ đếm lượt trong cache
+class VoucherTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.voucher = models.Voucher.objects.create(store=self.store, code='SALE', discount_percent=10, quantity=2,
+                                                     expired_at=timezone.now() + timedelta(days=1))
+
+    def test_key_expired_between_add_and_decr_counts_request(self):
+        real_decr = cache.decr
+        calls = []
+
+        def expire_once(key, *args, **kwargs):
+            calls.append(key)
+            if len(calls) == 1:
+                cache.delete(key)  # key hết hạn ngay sau add
+            return real_decr(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'decr', side_effect=expire_once):
+            self.assertTrue(vouchers._take_token(self.voucher))
+        self.assertEqual(cache.get(vouchers._tokens_key(self.voucher.voucher_code)), 1)
+
+        self.assertTrue(vouchers._take_token(self.voucher))
+        self.assertFalse(vouchers._take_token(self.voucher))  # hết token, không fail open
+
+    def test_legacy_check_without_product(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        r = client.post('/vouchers/check/', {'code': 'SALE', 'total_amount': 100}, format='json')
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(r.data['discount_amount'], 10)
+
+        # Store khác dùng cùng mã: không đoán, yêu cầu gửi sản phẩm
+        other = models.Store.objects.create(seller=models.User.objects.create(username='seller2', phone='0900000003'),
+                                            name='Other', description='Store 2')
+        models.Voucher.objects.create(store=other, code='SALE', discount_percent=50, quantity=5,
+                                      expired_at=timezone.now() + timedelta(days=1))
+        r = client.post('/vouchers/check/', {'code': 'SALE', 'total_amount': 100}, format='json')
+        self.assertEqual(r.status_code, 400)
+        r = client.post('/vouchers/check/', {'code': 'SALE', 'total_amount': 100, 'product_code': self.product.pk},
+                        format='json')
+        self.assertEqual(r.data['discount_amount'], 10)
+
+
+# Gợi ý sản phẩm: request không tự build model
+class RecommenderTestCase(BaseTestCase):
+    def test_missing_model_enqueues_build(self):
+        with mock.patch.object(recommender, 'load', return_value=None), \
+                mock.patch.object(recommender, 'build') as build, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recommender.recommend_products(self.buyer), [])
+        build.assert_not_called()
+        self.assertTrue(models.Job.objects.filter(name='update_recommender', status='pending').exists())
+
+
+def run_concurrently(workers, target):
+    """
+    Chạy target(i) trên `workers` thread cùng lúc (mỗi thread 1 connection DB riêng), như các worker/request song song.
+    Trả về danh sách exception các thread gặp phải.
+    """
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def run(i):
+        try:
+            barrier.wait()
+            target(i)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+# Test song song: dữ liệu phải được commit để các thread (connection khác) thấy -> TransactionTestCase
+class ConcurrencyTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        if not connection.features.test_db_allows_multiple_connections:
+            self.skipTest("DB test không cho nhiều connection ghi song song (SQLite in-memory)")
+
+
+# Cấp mã song song: mỗi thread mô phỏng 1 worker process với allocator riêng (như manage.py bench_codes)
+class CodeAllocatorConcurrencyTestCase(ConcurrencyTestCase):
+
+    def test_parallel_allocators_never_collide(self):
+        results = [[] for _ in range(8)]
+
+        def allocate(i):
+            allocator = CodeAllocator(block_size=5)
+            for _ in range(40):
+                results[i].append(allocator.next_value(models.TransactionHistory, 'transaction_code', 'BM'))
+
+        self.assertEqual(run_concurrently(8, allocate), [])
+        values = [v for chunk in results for v in chunk]
+        self.assertEqual(len(values), 320)
+        self.assertEqual(len(set(values)), 320)
+
+
+# Nhiều buyer mua cùng lúc của 1 seller (như manage.py bench_seller_checkout): tiền seller ghi vào PendingEarning
+# nên không tranh dòng User của seller, gom lại vẫn đủ
+class SellerCheckoutConcurrencyTestCase(ConcurrencyTestCase):
+    def test_parallel_payments_to_one_seller(self):
+        seller = models.User.objects.create(username='seller', phone='0900000002', role='seller')
+        buyers = [models.User.objects.create(username=f'buyer{i}', phone=f'09100000{i:02d}', balance=Decimal(1000))
+                  for i in range(8)]
+
+        def pay(i):
+            done = 0
+            while done < 10:
+                try:
+                    with transaction.atomic():
+                        wallet.pay_seller(buyers[i], seller, Decimal(10), 'Mua hàng', 'Bán hàng')
+                    done += 1
+                except OperationalError:  # deadlock/lock timeout -> thử lại như client
+                    continue
+
+        self.assertEqual(run_concurrently(len(buyers), pay), [])
+        self.assertEqual(models.User.objects.get(pk=seller.pk).balance, 0)  # chưa gom, dòng seller không bị UPDATE
+        wallet.rollup_pending_earnings()
+        self.assertEqual(models.User.objects.get(pk=seller.pk).balance, Decimal(800))
+        for buyer in buyers:
+            self.assertEqual(models.User.objects.get(pk=buyer.pk).balance, Decimal(900))
+
+
+# Nhiều buyer cùng mua 1 product (như manage.py stress_claim_stocks): không tài khoản nào bị giao 2 lần
+class ClaimStocksConcurrencyTestCase(ConcurrencyTestCase):
+    def test_parallel_claims_never_share_an_account(self):
+        seller = models.User.objects.create(username='seller', phone='0900000002', role='seller')
+        store = models.Store.objects.create(seller=seller, name='Store', description='Store test')
+        product = models.Product.objects.create(store=store, name='Facebook', image='image', description='',
+                                                price=Decimal(10), format='TK|MK', type='account')
+        stocks.import_stocks(product, [f"user{i}|pass{i}" for i in range(100)])
+        delivered = []
+        lock = threading.Lock()
+
+        def buy(_):
+            while True:
+                try:
+                    with transaction.atomic():
+                        contents = stocks.claim_stocks(product, 3)
+                except ValidationError:
+                    if product.stocks.filter(is_sold=False).count() < 3:
+                        return  # hết hàng
+                    continue  # tranh chấp (DB không có SKIP LOCKED) -> thử lại
+                except OperationalError:
+                    continue
+                with lock:
+                    delivered.extend(contents)
+
+        self.assertEqual(run_concurrently(8, buy), [])
+        self.assertEqual(len(delivered), 99)
+        self.assertEqual(len(set(delivered)), 99)
+        self.assertEqual(product.stocks.filter(is_sold=True).count(), 99)
+        product.refresh_from_db()
+        self.assertEqual(product.available_quantity, 1)
+
+
+# Nhiều request cùng dùng 1 voucher (như manage.py stress_redeem_voucher): không dùng quá số lượt
+class RedeemVoucherConcurrencyTestCase(ConcurrencyTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        seller = models.User.objects.create(username='seller', phone='0900000002', role='seller')
+        self.store = models.Store.objects.create(seller=seller, name='Store', description='Store test')
+        self.voucher = models.Voucher.objects.create(store=self.store, code='FLASH', discount_percent=10, quantity=20,
+                                                     expired_at=timezone.now() + timedelta(hours=1))
+
+    def redeem_all(self, workers=10, attempts=6):
+        redeemed = []
+        lock = threading.Lock()
+
+        def redeem(_):
+            for _ in range(attempts):
+                while True:
+                    try:
+                        vouchers.reserve_voucher('FLASH', store=self.store)
+                    except ValidationError:
+                        break
+                    except OperationalError:
+                        continue
+                    with lock:
+                        redeemed.append(1)
+                    break
+
+        self.assertEqual(run_concurrently(workers, redeem), [])
+        self.voucher.refresh_from_db()
+        return len(redeemed)
+
+    def test_parallel_redeems_stop_at_quantity(self):
+        self.assertEqual(self.redeem_all(), 20)
+        self.assertEqual(self.voucher.quantity, 0)
+
+    def test_parallel_redeems_without_limiter(self):
+        with mock.patch.object(vouchers, 'LIMITER_ENABLED', False):
+            self.assertEqual(self.redeem_all(), 20)
+        self.assertEqual(self.voucher.quantity, 0)
@@ -1,10 +1,90 @@
-def generate_code(model, field_name: str, prefix: str, padding: int = 5):
-    last_obj = model.objects.order_by(f'-{field_name}').first()
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+CODE_BLOCK_SIZE = getattr(settings, 'CODE_BLOCK_SIZE', 100)
+
+
+def _sequence_db_alias():
+    # Dùng connection riêng ('sequences') nếu có để việc giữ block không bị rollback theo transaction ngoài
+    return 'sequences' if 'sequences' in settings.DATABASES else 'default'
+
+
+def _last_code_number(model, field_name: str, prefix: str):
+    # Lấy số lớn nhất đang có trong bảng, chỉ dùng khi khởi tạo sequence lần đầu
+    last_obj = model.objects.filter(**{f'{field_name}__startswith': prefix}).order_by(f'-{field_name}').first()
     if last_obj:
         try:
-            last_id = int(getattr(last_obj, field_name)[len(prefix):])
-        except:
-            last_id = 0
-    else:
-        last_id = 0
-    return f"{prefix}{last_id + 1:0{padding}d}"
\ No newline at end of file
+            return int(getattr(last_obj, field_name)[len(prefix):])
+        except (ValueError, TypeError):  # phần sau prefix không phải số (mã tự đặt) -> bắt đầu từ 0
+            return 0
+    return 0
+
+
+class CodeAllocator:
+    """
+    Cấp mã khoá chính theo prefix (PR00001, OD00001, ...).
+    Mỗi process giữ trước một block `block_size` mã từ bảng CodeSequence rồi cấp dần trong bộ nhớ,
+    nên đa số lần save() không tốn query nào và các worker không bao giờ nhận trùng mã.
+    """
+
+    def __init__(self, block_size: int = CODE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}  # prefix -> [next_value, last_value]
+        self._lock = threading.Lock()
+
+    def next_value(self, model, field_name: str, prefix: str):
+        return self.next_values(model, field_name, prefix, 1)[0]
+
+    def next_values(self, model, field_name: str, prefix: str, count: int):
+        values = []
+        with self._lock:
+            block = self._blocks.get(prefix)
+            while len(values) < count:
+                if block is None or block[0] > block[1]:
+                    # Cấp nhiều mã một lúc (bulk import) thì giữ luôn một block đủ lớn
+                    block = self._reserve_block(model, field_name, prefix, max(self.block_size, count - len(values)))
+                    self._blocks[prefix] = block
+                take = min(block[1] - block[0] + 1, count - len(values))
+                values.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return values
+
+    def _reserve_block(self, model, field_name: str, prefix: str, size: int):
+        from .models import CodeSequence  # tránh import vòng
+
+        alias = _sequence_db_alias()
+        sequences = CodeSequence.objects.using(alias)
+
+        with transaction.atomic(using=alias):
+            updated = sequences.filter(prefix=prefix).update(last_value=F('last_value') + size)
+            if not updated:
+                # Prefix chưa có sequence -> khởi tạo từ mã lớn nhất đang có
+                start = _last_code_number(model, field_name, prefix)
+                try:
+                    with transaction.atomic(using=alias):
+                        sequences.create(prefix=prefix, last_value=start + size)
+                except IntegrityError:
+                    # Worker khác vừa tạo xong -> giữ block như bình thường
+                    sequences.filter(prefix=prefix).update(last_value=F('last_value') + size)
+            last_value = sequences.values_list('last_value', flat=True).get(prefix=prefix)
+
+        return [last_value - size + 1, last_value]
+
+    def reset(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+code_allocator = CodeAllocator()
+
+
+def generate_code(model, field_name: str, prefix: str, padding: int = 5):
+    return f"{prefix}{code_allocator.next_value(model, field_name, prefix):0{padding}d}"
+
+
+def generate_codes(model, field_name: str, prefix: str, count: int, padding: int = 5):
+    # Dùng cho bulk_create (không đi qua save())
+    return [f"{prefix}{value:0{padding}d}" for value in code_allocator.next_values(model, field_name, prefix, count)]
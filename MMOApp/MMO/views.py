@@ -1,20 +1,18 @@
 import os
 
-from django.db.models import Q
 from openai import OpenAI
 from rest_framework import viewsets, generics, parsers, status, filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.decorators import action, api_view, parser_classes, permission_classes
 import cloudinary.uploader
-from . import perms, paginators, serializers
+from . import catalog_cache, checkout, metrics, order_states, perms, paginators, serializers, stocks, vouchers, wallet
+from .idempotency import idempotent
 from . import models
 from django.utils import timezone
-from django.db.models import Count, Sum
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.utils.dateparse import parse_datetime
-from .models import Order
+from django.utils.dateparse import parse_date, parse_datetime
 import urllib.parse
 import uuid
 from django.http import JsonResponse
@@ -37,13 +35,16 @@ class UserViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.UpdateAPIVi
 
     @action(methods=['get'], url_path='current-user', detail=False, permission_classes=[IsAuthenticated])
     def get_current_user(self, request):
-        return Response(serializers.UserSerializer(request.user).data)
+        data = serializers.UserSerializer(request.user).data
+        data['balance'] = str(wallet.balance_of(request.user))  # gồm cả tiền bán hàng đang chờ gom
+        data['held_balance'] = str(wallet.held_earnings(request.user))  # tiền đơn hàng đang giữ chờ hết bảo hành
+        return Response(data)
 
     @action(methods=['patch'], detail=False, url_path='upgrade-to-seller')
     def upgrade_to_seller(self, request):
         user = request.user
         user.role = 'seller'
-        user.save()
+        user.save(update_fields=['role'])  # không ghi đè balance
         return Response({'message': 'Đã cập nhật role thành seller'}, status=status.HTTP_200_OK)
 
 
@@ -51,6 +52,19 @@ class StoreViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIVie
     queryset = models.Store.objects.filter(active=True)
     serializer_class = serializers.StoreSerializer
 
+    # ?ordering=-reputation: xếp hạng store theo điểm uy tín (tính sẵn bằng manage.py compute_reputation)
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['reputation', 'avg_rating', 'order_count', 'created_date']
+    ordering = ['-reputation']
+
+    def get_queryset(self):
+        # Chỉ JOIN seller khi client ?expand=seller
+        return self.queryset.select_related(*self.get_serializer().related_paths())
+
+    @catalog_cache.conditional(catalog_cache.CATALOG)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_permissions(self):
         if self.action == 'my_store':
             return [IsAuthenticated()]
@@ -59,6 +73,7 @@ class StoreViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIVie
         return [AllowAny()]
 
     @action(detail=False, methods=['get'], url_path='my-store')
+    @catalog_cache.conditional(catalog_cache.own_store_scope)
     def my_store(self, request):
         try:
             store = models.Store.objects.get(seller=request.user, active=True)
@@ -106,6 +121,7 @@ class ProductViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIV
         'type': ['exact'],
         'price': ['gte', 'lte'],
         'is_approved': ['exact'],
+        'available_quantity': ['gt', 'gte'],  # ?available_quantity__gt=0 -> chỉ sản phẩm còn hàng
     }
     search_fields = ['name']
 
@@ -118,16 +134,25 @@ class ProductViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIV
 
     def get_queryset(self):
         if self.request.method == "GET":
-            return models.Product.objects.filter(active=True, is_approved=True).order_by('-created_date')
+            # Chỉ JOIN store/seller khi client ?expand=store / store.seller
+            return models.Product.objects.filter(active=True, is_approved=True).select_related(
+                *self.get_serializer().related_paths()).order_by('-created_date')
         elif self.request.method in ["PUT", "PATCH", "DELETE"]:
             return models.Product.objects.filter(active=True)
         return models.Product.objects.all()
 
+    @catalog_cache.conditional(catalog_cache.CATALOG)
+    @catalog_cache.cached(catalog_cache.CATALOG)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'], url_path='my-products')
+    @catalog_cache.conditional(catalog_cache.own_store_scope)
     def my_products(self, request):
         try:
             store = models.Store.objects.get(seller=request.user, active=True)
-            queryset = models.Product.objects.filter(store=store).order_by('-created_date')
+            queryset = models.Product.objects.filter(store=store).select_related(
+                *self.get_serializer().related_paths()).order_by('-created_date')
 
             # Áp dụng filter + search thủ công
             filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -148,12 +173,14 @@ class ProductViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIV
             return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['get'], url_path='store-products')
+    @catalog_cache.conditional(catalog_cache.store_scope('{pk}'))
+    @catalog_cache.cached(catalog_cache.store_scope('{pk}'))
     def store_products(self, request, pk=None):
         # Lấy tất cả sản phẩm của một store dựa vào store_code
         try:
             store = models.Store.objects.get(store_code=pk, active=True)
-            queryset = models.Product.objects.filter(store=store, active=True, is_approved=True).order_by(
-                '-created_date')
+            queryset = models.Product.objects.filter(store=store, active=True, is_approved=True).select_related(
+                *self.get_serializer().related_paths()).order_by('-created_date')
 
             for backend in [DjangoFilterBackend, filters.SearchFilter]:
                 queryset = backend().filter_queryset(request, queryset, self)
@@ -169,6 +196,16 @@ class ProductViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIV
         except models.Store.DoesNotExist:
             return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, pk=None):
+        # Sản phẩm tương tự đã tính sẵn (MMO.similarity), đọc theo index (product, rank) của ProductSimilarity
+        if not models.Product.objects.filter(pk=pk, active=True, is_approved=True).exists():
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = models.Product.objects.filter(similar_to__product_id=pk, active=True, is_approved=True).select_related(
+            *self.get_serializer().related_paths()).order_by('similar_to__rank')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
 
 class BlogViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.ListAPIView, generics.UpdateAPIView,
                   generics.DestroyAPIView):
@@ -192,10 +229,21 @@ class BlogViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.ListAPIView
             return [perms.BlogOwnerPerms()]
         return [AllowAny()]
 
+    def get_queryset(self):
+        # author chỉ JOIN khi ?expand=author
+        return super().get_queryset().select_related(*self.get_serializer().related_paths())
+
+    @catalog_cache.conditional(catalog_cache.BLOGS)
+    @catalog_cache.cached(catalog_cache.BLOGS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'], url_path='my-blogs')
+    @catalog_cache.conditional(catalog_cache.BLOGS)
     def my_blogs(self, request):
         # Lấy blog do chính user viết
-        queryset = models.Blog.objects.filter(author=request.user).order_by('-created_date')
+        queryset = models.Blog.objects.filter(author=request.user).select_related(
+            *self.get_serializer().related_paths()).order_by('-created_date')
 
         # Áp dụng filter + search
         for backend in self.filter_backends:
@@ -246,7 +294,8 @@ class BlogCommentViewSet(viewsets.ViewSet, generics.DestroyAPIView):
         except models.Blog.DoesNotExist:
             return Response({"detail": "Blog không tồn tại"}, status=404)
 
-        queryset = models.BlogComment.objects.filter(blog=blog).order_by('-created_date')
+        queryset = models.BlogComment.objects.filter(blog=blog).select_related(
+            *self.get_serializer().related_paths()).order_by('-created_date')
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -337,6 +386,8 @@ class AccountStockViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.Up
             return [perms.IsSeller()]
         if self.action == 'get_stocks_for_product':
             return [perms.IsSellerStock()]
+        if self.action == 'upload_stocks':
+            return [perms.IsSellerProduct()]
         return [AllowAny()]
 
     @action(detail=True, methods=['get'], url_path='product-stocks')
@@ -354,7 +405,7 @@ class AccountStockViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.Up
             )
 
         # base queryset (chỉ những stock active thuộc product)
-        qs = product.stocks.filter(active=True)
+        qs = product.stocks.filter(active=True).select_related(*self.get_serializer().related_paths())
 
         # áp dụng filter_backends (search, filters) nếu có
         qs = self.filter_queryset(qs)
@@ -388,6 +439,31 @@ class AccountStockViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.Up
         serializer.save(product=product)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['post'], url_path='upload-stocks', parser_classes=[parsers.MultiPartParser])
+    def upload_stocks(self, request, pk=None):
+        # Nhập kho hàng loạt từ file text/CSV, mỗi dòng 1 tài khoản theo product.format
+        try:
+            product = models.Product.objects.get(
+                pk=pk,
+                active=True,
+                store__seller=request.user
+            )
+        except models.Product.DoesNotExist:
+            return Response(
+                {"detail": "Sản phẩm không tồn tại hoặc bạn không sở hữu"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"detail": "Chưa chọn file"}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = stocks.import_stocks(product, upload)
+        if 'failed' in report:
+            # Các lô trước đã lưu ('created'); nhập lại cả file, dòng đã có trong kho sẽ được bỏ qua
+            return Response(report, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
 
 class VoucherViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.DestroyAPIView, generics.UpdateAPIView):
     queryset = models.Voucher.objects.filter(active=True)
@@ -410,7 +486,8 @@ class VoucherViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.DestroyA
     def my_vouchers(self, request):
         try:
             store = models.Store.objects.get(seller=request.user, active=True)
-            queryset = models.Voucher.objects.filter(store=store).order_by('created_date')
+            queryset = models.Voucher.objects.filter(store=store).select_related(
+                *self.get_serializer().related_paths()).order_by('created_date')
 
             # Chỉ áp dụng search filter thủ công
             search_backend = filters.SearchFilter()
@@ -428,42 +505,40 @@ class VoucherViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.DestroyA
         total_amount = int(request.data.get("total_amount", 0))
         product_code = request.data.get("product_code")
 
-        try:
-            voucher = models.Voucher.objects.get(code=code)
-
-            # Kiểm tra hết hạn
-            if voucher.expired_at and voucher.expired_at < timezone.now():
-                return Response({"error": "Voucher đã hết hạn"}, status=status.HTTP_400_BAD_REQUEST)
+        # Voucher theo (store, code), store lấy từ sản phẩm; đọc từ cache nên gọi liên tục khi nhập mã vẫn nhẹ
+        if not code:
+            return Response({"error": "Thiếu mã voucher"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Kiểm tra số lượng còn lại
-            if voucher.quantity <= 0:
-                return Response({"error": "Voucher đã hết lượt sử dụng"}, status=status.HTTP_400_BAD_REQUEST)
+        if product_code:
+            store_id = models.Product.objects.filter(pk=product_code).values_list('store_id', flat=True).first()
+            if store_id is None:
+                return Response({"error": "Sản phẩm không tồn tại"}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            # Client cũ không gửi product_code (deprecated): tra theo mã như trước nếu mã chỉ thuộc 1 store
+            store_id = vouchers.legacy_store_id(code)
+            if store_id is None:
+                return Response({"error": "Voucher không hợp lệ"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Check store (voucher phải cùng store với sản phẩm)
-            if product_code:
-                try:
-                    product = models.Product.objects.get(product_code=product_code)
-                    if voucher.store != product.store:
-                        return Response({"error": "Voucher không thuộc cửa hàng này"},
-                                        status=status.HTTP_400_BAD_REQUEST)
-                except models.Product.DoesNotExist:
-                    return Response({"error": "Sản phẩm không tồn tại"}, status=status.HTTP_404_NOT_FOUND)
+        voucher = vouchers.get_voucher(store_id, code)
+        if voucher is None:
+            return Response({"error": "Voucher không hợp lệ"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Tính giảm giá (theo %)
-            discount = int(total_amount * voucher.discount_percent / 100)
+        # Kiểm tra hết hạn
+        if voucher.expired_at and voucher.expired_at < timezone.now():
+            return Response({"error": "Voucher đã hết hạn"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Giới hạn max discount
-            if voucher.max_discount and discount > voucher.max_discount:
-                discount = voucher.max_discount
+        # Kiểm tra số lượng còn lại
+        if vouchers.remaining_uses(voucher) <= 0:
+            return Response({"error": "Voucher đã hết lượt sử dụng"}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({
-                "valid": True,
-                "discount_amount": discount,
-                "final_amount": int(total_amount - discount),
-            })
+        # Tính giảm giá (theo %, giới hạn max discount)
+        discount = checkout.calc_discount(voucher, total_amount)
 
-        except models.Voucher.DoesNotExist:
-            return Response({"error": "Voucher không hợp lệ"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            "valid": True,
+            "discount_amount": discount,
+            "final_amount": int(total_amount - discount),
+        })
 
 
 class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.UpdateAPIView):
@@ -491,6 +566,16 @@ class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.UpdateAPIV
             return [perms.CanUpdate()]
         return [AllowAny()]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        # Đổi trạng thái theo action (accept/complete/cancel) qua state machine, order đã được CanUpdate load sẵn
+        order = getattr(self, 'transition_order', None) or order_states.load(kwargs['pk'])
+        order = order_states.apply(order, request.data.get("action"))
+        return Response(serializers.OrderSerializer(order).data)
+
     # tất cả order của user
     @action(detail=False, methods=['get'], url_path='my-orders')
     def my_orders(self, request, *args, **kwargs):
@@ -498,10 +583,7 @@ class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.UpdateAPIV
             active=True,
             buyer=request.user
         ).select_related(
-            'buyer', 'voucher'
-        ).prefetch_related(
-            'acc_detail__product',
-            'service_detail__product'
+            *self.get_serializer().related_paths()  # buyer/voucher/store chỉ JOIN khi ?expand=
         )
 
         # Áp dụng filter_backends (ví dụ ?status=processing)
@@ -523,16 +605,13 @@ class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.UpdateAPIV
         if store is None:
             return Response({"detail": "Seller chưa có store."}, status=400)
 
+        # Lọc theo Order.store (index store, status, created_date), không cần JOIN qua detail + distinct
         qs = models.Order.objects.filter(
-            active=True
-        ).filter(
-            Q(acc_detail__product__store=store) |
-            Q(service_detail__product__store=store)
+            active=True,
+            store=store
         ).select_related(
-            'buyer', 'voucher'
-        ).prefetch_related(
-            'acc_detail__product', 'service_detail__product'
-        ).distinct()
+            *self.get_serializer().related_paths()
+        )
 
         # Áp dụng filter_backends (ví dụ ?status=delivered)
         qs = self.filter_queryset(qs).order_by('-created_date')
@@ -545,6 +624,27 @@ class OrderViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.UpdateAPIV
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='checkout')
+    @idempotent
+    def place_order(self, request):
+        # Tạo order + detail, trừ voucher, thanh toán và giao hàng trong 1 request
+        serializer = serializers.CheckoutSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        order, detail = serializer.save()
+
+        if isinstance(detail, models.AccOrderDetail):
+            return Response({
+                "type": "account",
+                "order": order.order_code,
+                "detail": serializers.AccOrderDetailSerializer(detail).data
+            }, status=status.HTTP_201_CREATED)
+
+        return Response({
+            "type": "service",
+            "order": order.order_code,
+            "detail": serializers.ServiceOrderDetailSerializer(detail).data
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['get'], url_path='details')
     def details(self, request, pk=None):
         # Lấy chi tiết đơn hàng theo order_code
@@ -582,6 +682,10 @@ class AccOrderDetailViewSet(viewsets.ViewSet, generics.CreateAPIView):
             return [perms.CanPostOrderDetail()]
         return [AllowAny()]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
 
 class ServiceOrderDetailViewSet(viewsets.ViewSet, generics.UpdateAPIView, generics.CreateAPIView):
     queryset = models.ServiceOrderDetail.objects.filter(active=True)
@@ -594,6 +698,18 @@ class ServiceOrderDetailViewSet(viewsets.ViewSet, generics.UpdateAPIView, generi
             return [perms.CanPostOrderDetail()]
         return [AllowAny()]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+
+def _parse_day(value):
+    # Nhận cả datetime ISO (app gửi toISOString()) lẫn YYYY-MM-DD, quy về ngày theo timezone hiện tại
+    dt = parse_datetime(value)
+    if dt is None:
+        return parse_date(value)
+    return timezone.localdate(dt) if timezone.is_aware(dt) else dt.date()
+
 
 class OrderStatsAPIView(APIView):
     permission_classes = [perms.IsSeller]
@@ -601,53 +717,23 @@ class OrderStatsAPIView(APIView):
     def get(self, request):
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
+        bucket = request.query_params.get("bucket")  # day | week | month -> thêm chuỗi số liệu 'series' cho biểu đồ
 
-        if start_date:
-            start_date = parse_datetime(start_date)
-        if end_date:
-            end_date = parse_datetime(end_date)
+        if bucket and bucket not in metrics.BUCKETS:
+            return Response({"error": "bucket phải là day, week hoặc month"}, status=400)
 
         # store của seller hiện tại
         store = getattr(request.user, "store", None)
         if not store:
             return Response({"error": "Bạn chưa có gian hàng"}, status=400)
 
-        # order liên quan tới store
-        orders = Order.objects.filter(
-            Q(acc_detail__product__store=store) |
-            Q(service_detail__product__store=store)
-        )
-
-        if start_date:
-            orders = orders.filter(created_date__gte=start_date)
-        if end_date:
-            orders = orders.filter(created_date__lte=end_date)
-
-        # tổng quan
-        stats = orders.filter(active=True).aggregate(
-            total_orders=Count("order_code", distinct=True),
-            acc_revenue=Sum("acc_detail__total_amount"),
-            service_revenue=Sum("service_detail__total_amount"),
+        # Đọc từ StoreDailyMetrics (số liệu theo ngày tạo đơn), có cache theo (store, khoảng ngày, bucket)
+        stats = metrics.store_stats(
+            store.pk,
+            start_day=_parse_day(start_date) if start_date else None,
+            end_day=_parse_day(end_date) if end_date else None,
+            bucket=bucket,
         )
-
-        # riêng từng loại
-        acc_stats = orders.filter(active=True, acc_detail__isnull=False).aggregate(
-            acc_orders=Count("order_code", distinct=True),
-            acc_revenue=Sum("acc_detail__total_amount"),
-        )
-        service_stats = orders.filter(active=True, service_detail__isnull=False).aggregate(
-            service_orders=Count("order_code", distinct=True),
-            service_revenue=Sum("service_detail__total_amount"),
-        )
-
-        # fix None -> 0
-        stats["total_orders"] = stats["total_orders"] or 0
-        stats["acc_orders"] = acc_stats["acc_orders"] or 0
-        stats["service_orders"] = service_stats["service_orders"] or 0
-        stats["acc_revenue"] = acc_stats["acc_revenue"] or 0
-        stats["service_revenue"] = service_stats["service_revenue"] or 0
-        stats["total_revenue"] = stats["acc_revenue"] + stats["service_revenue"]
-
         return Response(stats)
 
 
@@ -666,14 +752,16 @@ class ReviewViewSet(viewsets.ViewSet, generics.CreateAPIView):
     @action(detail=False, methods=['GET'], url_path='by-product/(?P<product_code>[^/.]+)')
     def get_reviews_by_product(self, request, product_code=None):
         # Lấy danh sách review của một product cụ thể
-        reviews = self.queryset.filter(product__product_code=product_code).order_by("-created_date")
+        context = {'request': request}
+        related = self.serializer_class(context=context).related_paths()
+        reviews = self.queryset.filter(product__product_code=product_code).select_related(*related).order_by("-created_date")
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(reviews, request)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.serializer_class(page, many=True, context=context)
             return paginator.get_paginated_response(serializer.data)
 
-        serializer = self.serializer_class(reviews, many=True)
+        serializer = self.serializer_class(reviews, many=True, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -691,10 +779,11 @@ class FavoriteProductViewSet(viewsets.ViewSet):
         user = request.user
         search = request.query_params.get("search")  # ?search=apple
 
+        related = serializers.ProductSerializer(context={"request": request}).related_paths()
         favorites = models.FavoriteProduct.objects.filter(
             user=user,
             active=True
-        ).select_related("product")
+        ).select_related("product", *["product__" + path for path in related])
 
         if search:
             favorites = favorites.filter(product__name__icontains=search)
@@ -761,7 +850,8 @@ class ComplaintViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.Update
         if not order:
             return Response({"detail": "Order không tồn tại"}, status=status.HTTP_404_NOT_FOUND)
 
-        complaints = models.Complaint.objects.filter(order=order, active=True)
+        complaints = models.Complaint.objects.filter(order=order, active=True).select_related(
+            *self.get_serializer().related_paths())  # buyer/admin/order chỉ JOIN khi ?expand=
         serializer = self.get_serializer(complaints, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -840,9 +930,14 @@ class DepositRequestViewSet(viewsets.ViewSet, generics.CreateAPIView):
             return [IsAuthenticated()]
         return [AllowAny()]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'], url_path='my-deposits')
     def list_by_user(self, request):
-        deposits = models.DepositRequest.objects.filter(user=request.user, active=True).order_by('-created_date')
+        deposits = models.DepositRequest.objects.filter(user=request.user, active=True).select_related(
+            *self.get_serializer().related_paths()).order_by('-created_date')
         serializer = self.get_serializer(deposits, many=True)
         return Response(serializer.data)
 
@@ -858,9 +953,14 @@ class WithdrawRequestViewSet(viewsets.ModelViewSet, generics.CreateAPIView):
             return [IsAuthenticated()]
         return [AllowAny()]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'], url_path='my-withdraws')
     def list_by_user(self, request):
-        withdraws = models.WithdrawRequest.objects.filter(user=request.user, active=True).order_by('-created_date')
+        withdraws = models.WithdrawRequest.objects.filter(user=request.user, active=True).select_related(
+            *self.get_serializer().related_paths()).order_by('-created_date')
         serializer = self.get_serializer(withdraws, many=True)
         return Response(serializer.data)
 
@@ -870,7 +970,7 @@ class WithdrawRequestViewSet(viewsets.ModelViewSet, generics.CreateAPIView):
 def recommend_view(request):
     user = request.user
     products = recommend_products(user)
-    serializer = ProductSerializer(products, many=True)
+    serializer = ProductSerializer(products, many=True, context={'request': request})
     return Response(serializer.data)
 
 
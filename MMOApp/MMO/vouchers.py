@@ -0,0 +1,138 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+INVALID_VOUCHER = "Voucher không hợp lệ hoặc đã hết hạn!"
+
+# Bộ đếm token theo voucher trong cache: hết token thì từ chối ngay, không chạm DB (flash sale)
+LIMITER_ENABLED = getattr(settings, 'VOUCHER_LIMITER_ENABLED', True)
+LIMITER_TTL = getattr(settings, 'VOUCHER_LIMITER_TTL', 60)  # giây, sau đó đồng bộ lại từ DB
+SNAPSHOT_TTL = getattr(settings, 'VOUCHER_CACHE_TTL', 300)  # giây giữ bản sao voucher theo (store, code)
+
+
+def _tokens_key(voucher_code):
+    return f"voucher_tokens:{voucher_code}"
+
+
+def _take_token(voucher):
+    if not LIMITER_ENABLED:
+        return True
+    key = _tokens_key(voucher.voucher_code)
+    cache.add(key, voucher.quantity, LIMITER_TTL)
+    try:
+        return cache.decr(key) >= 0
+    except ValueError:  # key hết hạn giữa add và decr
+        pass
+    # Tạo lại bộ đếm đã trừ lượt của request này. Request khác tạo trước thì trừ trên bộ đếm đó,
+    # vẫn lỗi thì từ chối (DB vẫn chặn bằng UPDATE có điều kiện, chỉ không cho request vượt bộ đếm)
+    if cache.add(key, voucher.quantity - 1, LIMITER_TTL):
+        return voucher.quantity > 0
+    try:
+        return cache.decr(key) >= 0
+    except ValueError:
+        return False
+
+
+def _give_back_token(voucher):
+    if not LIMITER_ENABLED:
+        return
+    try:
+        cache.incr(_tokens_key(voucher.voucher_code))
+    except ValueError:
+        pass
+
+
+def reset_limiter(voucher_code):
+    # Gọi khi seller sửa voucher (thêm lượt, gia hạn)
+    cache.delete(_tokens_key(voucher_code))
+
+
+def _snapshot_key(store_id, code):
+    return f"voucher:{store_id}:{code}"
+
+
+def get_voucher(store_id, code):
+    """
+    Tìm voucher đang active theo (store, code), dùng index unique (store, code).
+    Kết quả (kể cả không tìm thấy) được cache, xoá khi voucher được lưu/xoá. Trả về Voucher hoặc None.
+    Số lượt trong bản cache có thể cũ: dùng remaining_uses() để kiểm tra, UPDATE khi checkout mới là chính xác.
+    """
+    key = _snapshot_key(store_id, code)
+    voucher = cache.get(key)
+    if voucher is None:
+        voucher = models.Voucher.objects.filter(store_id=store_id, code=code, active=True).first() or False
+        cache.set(key, voucher, SNAPSHOT_TTL)
+    return voucher or None
+
+
+def forget_voucher(voucher):
+    codes = {voucher.code, getattr(voucher, '_loaded_code', None)} - {None}
+    cache.delete_many([_snapshot_key(voucher.store_id, code) for code in codes])
+    reset_limiter(voucher.voucher_code)
+
+
+def legacy_store_id(code):
+    """
+    Deprecated: cho client cũ chỉ gửi mã voucher, không gửi product/store. Tìm theo mã trên mọi store như trước,
+    chỉ nhận khi đúng 1 store có mã này (có index unique (store, code) nên tối đa 2 dòng). Nhiều store trùng mã thì
+    raise ValidationError yêu cầu gửi sản phẩm, không đoán. Trả về store_id hoặc None nếu không có voucher nào.
+    """
+    logger.warning("Voucher %s được tra không kèm product/store (client cũ), nên gửi product_code", code)
+    store_ids = list(models.Voucher.objects.filter(code=code, active=True).values_list('store_id', flat=True)[:2])
+    if len(store_ids) > 1:
+        raise ValidationError("Nhiều cửa hàng dùng mã voucher này, vui lòng gửi kèm sản phẩm!")
+    return store_ids[0] if store_ids else None
+
+
+def remaining_uses(voucher):
+    # Ưu tiên bộ đếm token (được trừ theo từng lượt dùng), chưa có thì dùng số lượt trong bản cache
+    if LIMITER_ENABLED:
+        tokens = cache.get(_tokens_key(voucher.voucher_code))
+        if tokens is not None:
+            return max(tokens, 0)
+    return voucher.quantity
+
+
+def reserve_voucher(code, store):
+    """
+    Trừ 1 lượt voucher (store, code) bằng 1 câu UPDATE có điều kiện:
+    UPDATE voucher SET quantity = quantity - 1 WHERE pk = ? AND quantity > 0 AND expired_at > now.
+    Không dùng SELECT ... FOR UPDATE nên lock chỉ giữ trong câu UPDATE (gọi ngoài transaction checkout).
+    Trả về voucher; lỗi thì raise ValidationError. Checkout thất bại sau đó phải gọi release_voucher().
+    """
+    now = timezone.now()
+    # Mã voucher chỉ unique trong 1 store: phải biết store trước khi trừ lượt, không đoán theo mã
+    voucher = get_voucher(store.pk, code)
+    if voucher is None or voucher.expired_at <= now or remaining_uses(voucher) <= 0:
+        raise ValidationError(INVALID_VOUCHER)
+
+    if not _take_token(voucher):
+        raise ValidationError(INVALID_VOUCHER)
+
+    updated = models.Voucher.objects.filter(
+        pk=voucher.pk,
+        active=True,
+        quantity__gt=0,
+        expired_at__gt=now
+    ).update(quantity=F('quantity') - 1)
+    if not updated:
+        if LIMITER_ENABLED:
+            cache.set(_tokens_key(voucher.voucher_code), 0, LIMITER_TTL)  # đã hết lượt -> chặn sớm các request sau
+        raise ValidationError(INVALID_VOUCHER)
+
+    voucher.quantity -= 1
+    return voucher
+
+
+def release_voucher(voucher):
+    # Hoàn lại lượt khi checkout sau khi giữ voucher bị lỗi
+    models.Voucher.objects.filter(pk=voucher.pk).update(quantity=F('quantity') + 1)
+    _give_back_token(voucher)
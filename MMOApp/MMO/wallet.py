@@ -0,0 +1,149 @@
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from rest_framework.exceptions import ValidationError
+
+from . import models
+
+INSUFFICIENT_BALANCE = "Số dư không đủ!"
+
+# Các hàm dưới dùng atomic(savepoint=False): lỗi thì rollback cả transaction của caller (checkout), không tốn SAVEPOINT
+
+
+def _check_amount(amount):
+    if amount is None or amount < 0:
+        raise ValidationError("Số tiền không hợp lệ!")
+
+
+def _refresh_balance(user):
+    user.refresh_from_db(fields=['balance'])
+
+
+def credit(user, amount, tx_type=None, note=None):
+    """
+    Cộng amount vào User.balance bằng UPDATE balance = balance + amount.
+    Nếu có tx_type thì ghi TransactionHistory trong cùng transaction. Trả về TransactionHistory (hoặc None).
+    """
+    _check_amount(amount)
+    with transaction.atomic(savepoint=False):
+        models.User.objects.filter(pk=user.pk).update(balance=F('balance') + amount)
+        history = None
+        if tx_type:
+            history = models.TransactionHistory.objects.create(user=user, type=tx_type, amount=amount, note=note)
+    _refresh_balance(user)
+    return history
+
+
+def debit(user, amount, tx_type=None, note=None, error=INSUFFICIENT_BALANCE):
+    """
+    Trừ amount khỏi User.balance bằng UPDATE có điều kiện balance >= amount, nên 2 request song song
+    không thể làm số dư âm. Không đủ tiền thì raise ValidationError(error).
+    """
+    _check_amount(amount)
+    with transaction.atomic(savepoint=False):
+        updated = models.User.objects.filter(pk=user.pk, balance__gte=amount).update(balance=F('balance') - amount)
+        if not updated:
+            raise ValidationError(error)
+        history = None
+        if tx_type:
+            history = models.TransactionHistory.objects.create(user=user, type=tx_type, amount=amount, note=note)
+    _refresh_balance(user)
+    return history
+
+
+def transfer(sender, receiver, amount, debit_note, credit_note, debit_type='purchase', credit_type='receive',
+             error=INSUFFICIENT_BALANCE):
+    # Chuyển tiền sender -> receiver (thanh toán đơn hàng), cả 2 bút toán cùng commit hoặc cùng rollback
+    with transaction.atomic(savepoint=False):
+        debit(sender, amount, debit_type, debit_note, error=error)
+        credit(receiver, amount, credit_type, credit_note)
+
+
+def pay_seller(buyer, seller, amount, debit_note, credit_note, error=INSUFFICIENT_BALANCE, order=None):
+    """
+    Thanh toán đơn hàng nhưng không UPDATE dòng User của seller: tiền được ghi vào PendingEarning (chỉ INSERT)
+    và gom vào balance định kỳ, nên các đơn song song của cùng một seller không phải xếp hàng chờ lock.
+    Có order thì tiền được giữ (held) đến khi đơn hết bảo hành mà không bị khiếu nại (MMO.escrow).
+    """
+    with transaction.atomic(savepoint=False):
+        debit(buyer, amount, 'purchase', debit_note, error=error)
+        models.PendingEarning.objects.create(user=seller, order=order, held=order is not None, amount=amount)
+        models.TransactionHistory.objects.create(user=seller, type='receive', amount=amount, note=credit_note)
+
+
+def pending_earnings(user):
+    return (models.PendingEarning.objects.filter(user=user, held=False)
+            .aggregate(total=Sum('amount'))['total'] or 0)
+
+
+def held_earnings(user):
+    # Tiền bán hàng đang giữ chờ hết bảo hành, chưa rút được
+    return (models.PendingEarning.objects.filter(user=user, held=True)
+            .aggregate(total=Sum('amount'))['total'] or 0)
+
+
+def balance_of(user):
+    # Số dư hiển thị = balance đã cộng + tiền bán hàng đang chờ gom
+    return user.balance + pending_earnings(user)
+
+
+def _fold(ids):
+    # Gom các dòng PendingEarning đã khoá vào balance, mỗi user một UPDATE (theo thứ tự pk để tránh deadlock)
+    if not ids:
+        return 0
+    totals = (models.PendingEarning.objects.filter(id__in=ids)
+              .values('user').annotate(total=Sum('amount')).order_by('user'))
+    for row in totals:
+        models.User.objects.filter(pk=row['user']).update(balance=F('balance') + row['total'])
+    models.PendingEarning.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def settle_pending_earnings(user):
+    # Gom ngay tiền chờ của 1 user (trước khi rút tiền)
+    with transaction.atomic():
+        ids = list(models.PendingEarning.objects.select_for_update().filter(user=user, held=False)
+                   .values_list('id', flat=True))
+        folded = _fold(ids)
+    _refresh_balance(user)
+    return folded
+
+
+def rollup_pending_earnings(batch_size=1000):
+    """
+    Gom toàn bộ PendingEarning vào User.balance theo từng batch (mỗi batch 1 transaction ngắn).
+    Dùng SKIP LOCKED nếu DB hỗ trợ để nhiều tiến trình roll-up chạy song song được. Trả về số dòng đã gom.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    folded = 0
+    while True:
+        with transaction.atomic():
+            qs = models.PendingEarning.objects.select_for_update(skip_locked=skip_locked).filter(held=False).order_by('id')
+            batch = _fold(list(qs.values_list('id', flat=True)[:batch_size]))
+        if not batch:
+            return folded
+        folded += batch
+
+
+def release_held_earnings(order_codes):
+    """
+    Giải ngân tiền đang giữ của các đơn: cộng thẳng vào balance, mỗi seller 1 UPDATE.
+    Phải gọi trong transaction, cùng với việc chuyển trạng thái đơn. Trả về số khoản đã giải ngân.
+    """
+    ids = list(models.PendingEarning.objects.select_for_update()
+               .filter(order_id__in=order_codes, held=True).values_list('id', flat=True))
+    return _fold(ids)
+
+
+def refund_order(order, note):
+    """
+    Hoàn tiền đang giữ của đơn cho buyer (huỷ đơn, khiếu nại được hoàn tiền). Phải gọi trong transaction.
+    Trả về số tiền đã hoàn.
+    """
+    earnings = models.PendingEarning.objects.select_for_update().filter(order=order, held=True)
+    rows = list(earnings.values_list('id', 'amount'))
+    if not rows:
+        return 0
+    amount = sum(a for _, a in rows)
+    models.PendingEarning.objects.filter(id__in=[i for i, _ in rows]).delete()
+    credit(order.buyer, amount, 'refund', note)
+    return amount
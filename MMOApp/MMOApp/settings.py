@@ -50,6 +50,11 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag']
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': ('oauth2_provider.contrib.rest_framework.OAuth2Authentication',)
 }
@@ -94,6 +99,47 @@ DATABASES = {
     }
 }
 
+# Connection riêng để giữ block mã (MMO.utils.CodeAllocator), commit độc lập với transaction của request
+DATABASES['sequences'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# Số mã mỗi process giữ trước cho một prefix
+CODE_BLOCK_SIZE = 100
+
+# Header Idempotency-Key cho các API thanh toán/nạp/rút (MMO.idempotency)
+from datetime import timedelta
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_WAIT_SECONDS = 10
+
+# Bộ đếm token trong cache cho voucher flash sale (MMO.vouchers), hết lượt thì từ chối không cần chạm DB
+VOUCHER_LIMITER_ENABLED = True
+VOUCHER_LIMITER_TTL = 60
+VOUCHER_CACHE_TTL = 300  # bản cache voucher theo (store, code) cho API check voucher
+
+# Hàng đợi job nền (MMO.jobs, manage.py run_workers): số lần thử và backoff (giây)
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 30
+JOB_BACKOFF_MAX = 3600
+
+# Cache response /products/, store-products, /blogs/ (MMO.catalog_cache), dùng backend CACHES['default'] (xem bên dưới)
+CATALOG_CACHE_ENABLED = True
+CATALOG_CACHE_TTL = 300
+
+# Cache kết quả /order-stats/ theo (store, khoảng ngày, bucket), bỏ khi số liệu store đổi (MMO.metrics)
+ORDER_STATS_CACHE_TTL = 300
+
+# File xuất dữ liệu lớn (ExportJob, MMO.exports) do worker ghi, tải về qua admin
+EXPORT_ROOT = BASE_DIR / 'exports'
+EXPORT_CHUNK_SIZE = 10000
+
+# Model TF-IDF gợi ý sản phẩm (MMO.recommender): build bằng manage.py build_recommender, tự cập nhật khi sản phẩm đổi
+RECOMMENDER_DIR = BASE_DIR / 'recommender'
+RECOMMENDER_UPDATE_DELAY = 60
+
+# Sản phẩm tương tự (MMO.similarity, manage.py build_similar_products): số sản phẩm giữ lại và số dòng mỗi khối tính
+SIMILAR_PRODUCTS_K = 10
+SIMILAR_PRODUCTS_CHUNK_SIZE = 500
+
 import pymysql
 
 pymysql.install_as_MySQLdb()
@@ -175,6 +221,12 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+# Cache (version + response catalog, bộ đếm voucher, thống kê store). Không có REDIS_URL thì dùng mặc định LocMem:
+# mỗi process 1 bản riêng, chỉ đúng khi chạy 1 process. Chạy nhiều worker/máy chủ phải đặt REDIS_URL (xem README).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
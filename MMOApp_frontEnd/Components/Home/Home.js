@@ -59,6 +59,7 @@ const Home = () => {
                         search: searchText || undefined,
                         type: category || undefined,
                         page: pageNumber,
+                        expand: "store",
                     },
                 });
 
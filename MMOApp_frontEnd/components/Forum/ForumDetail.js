@@ -38,7 +38,7 @@ const BlogDetail = ({ route }) => {
     const loadComments = async (p = 1) => {
         try {
             if (p === 1) setLoading(true);
-            const res = await Apis.get(`${endpoints["get-blog-comments"](blog.blog_code)}?page=${p}`);
+            const res = await Apis.get(`${endpoints["get-blog-comments"](blog.blog_code)}?page=${p}&expand=author`);
             if (p === 1) {
                 setComments(res.data.results);
             } else {
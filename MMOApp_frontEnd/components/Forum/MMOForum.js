@@ -61,6 +61,7 @@ const MMOForum = () => {
             search: searchText || undefined,
             category: category || undefined,
             page: pageNumber,
+            expand: "author",
           },
         });
 
@@ -64,6 +64,7 @@ const MyForums = () => {
           search: searchText || undefined,
           category: category || undefined,
           page: pageNumber,
+          expand: "author",
         },
       });
 
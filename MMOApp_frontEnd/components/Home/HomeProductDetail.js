@@ -93,7 +93,7 @@ const HomeProductDetail = ({ route, navigation }) => {
         try {
             if (p === 1) setLoading(true);
 
-            const res = await Apis.get(`${endpoints["get-reviews"](product.product_code)}?page=${p}`);
+            const res = await Apis.get(`${endpoints["get-reviews"](product.product_code)}?page=${p}&expand=buyer`);
 
             if (p === 1) {
                 setReviews(res.data.results);
@@ -175,31 +175,20 @@ const HomeProductDetail = ({ route, navigation }) => {
             setLoading(true);
             const token = await AsyncStorage.getItem("token");
 
-            // Tạo order
-            let orderRes = await authApis(token).post(endpoints["add-order"], {
-                code: voucher || null,
-            });
-            let order = orderRes.data;
-
-            // Payload cho order detail
-            let detailPayload = {
-                order: order.order_code,
+            // Tạo order + detail trong 1 request
+            let payload = {
                 product: product.product_code,
                 quantity: qty,
+                code: voucher || null,
             };
 
             if (product.type === "service") {
-                detailPayload.note = note;
-                detailPayload.target_url = targetUrl;
-                await authApis(token).post(endpoints["add-service-order-detail"],
-                    detailPayload
-                );
-            } else {
-                await authApis(token).post(endpoints["add-acc-order-detail"],
-                    detailPayload
-                );
+                payload.note = note;
+                payload.target_url = targetUrl;
             }
 
+            await authApis(token).post(endpoints["checkout"], payload);
+
             alert("Đặt hàng thành công!");
             nav.navigate("order", { reload: true });
         } catch (err) {
@@ -227,7 +216,9 @@ const HomeProductDetail = ({ route, navigation }) => {
     const loadSuggestions = async () => {
         try {
             const token = await AsyncStorage.getItem("token");
-            const res = await authApis(token).get(endpoints["recommended-products"]);
+            const res = await authApis(token).get(endpoints["recommended-products"], {
+                params: { expand: "store" },
+            });
             setSuggestedProducts(res.data);
         } catch (err) {
             console.error("Lỗi load gợi ý:", err.response?.data || err);
@@ -261,7 +252,10 @@ const HomeProductDetail = ({ route, navigation }) => {
                         style={styles.chatBtn}
                         onPress={() =>
                             nav.navigate("chatBox", {
-                                seller: product.store.seller,
+                                // seller có thể chỉ là user_code khi chỉ expand store
+                                seller: product.store.seller?.user_code
+                                    ? product.store.seller
+                                    : { user_code: product.store.seller },
                                 user: user,
                             })
                         }
@@ -58,6 +58,7 @@ const HomeStoreProduct = () => {
                         search: searchText || undefined,
                         type: category || undefined,
                         page: pageNumber,
+                        expand: "store",
                     },
                 });
 
@@ -37,7 +37,9 @@ const OrderDetail = ({ route }) => {
         const loadComplaints = async () => {
             try {
                 const token = await AsyncStorage.getItem("token");
-                const res = await authApis(token).get(endpoints["get-complaints"](order.order_code));
+                const res = await authApis(token).get(endpoints["get-complaints"](order.order_code), {
+                    params: { expand: "buyer,admin" },
+                });
                 if (res.data) {
                     setComplaints(res.data);  // lưu toàn bộ mảng
                 }
@@ -52,14 +54,9 @@ const OrderDetail = ({ route }) => {
         try {
             const token = await AsyncStorage.getItem("token");
 
-            // 1. PATCH order -> CANCEL
+            // PATCH order -> CANCEL, backend đổi luôn service detail -> FAILED và hoàn tiền
             await authApis(token).patch(endpoints["update-order"](orderId), {
-                status: "cancel",
-            });
-
-            // 2. PATCH service order detail -> FAILED
-            await authApis(token).patch(endpoints["update-service-order-detail"](serviceDetailId), {
-                status: "failed",
+                action: "cancel",
             });
 
             alert("Đã huỷ dịch vụ thành công!");
@@ -45,7 +45,7 @@ const ProductDetail = () => {
     try {
       if (p === 1) setLoading(true);
 
-      const res = await Apis.get(`${endpoints["get-reviews"](product.product_code)}?page=${p}`);
+      const res = await Apis.get(`${endpoints["get-reviews"](product.product_code)}?page=${p}&expand=buyer`);
 
       if (p === 1) {
         setReviews(res.data.results);
@@ -34,7 +34,9 @@ const StoreOrderDetail = ({ route }) => {
         const loadComplaints = async () => {
             try {
                 const token = await AsyncStorage.getItem("token");
-                const res = await authApis(token).get(endpoints["get-complaints"](order.order_code));
+                const res = await authApis(token).get(endpoints["get-complaints"](order.order_code), {
+                    params: { expand: "buyer,admin" },
+                });
                 if (res.data) {
                     setComplaints(res.data);  // lưu toàn bộ mảng
                 }
@@ -49,15 +51,9 @@ const StoreOrderDetail = ({ route }) => {
         try {
             const token = await AsyncStorage.getItem("token");
 
-            // 1. PATCH order -> CANCEL
+            // PATCH order theo action, backend đổi luôn trạng thái service detail -> FAILED
             await authApis(token).patch(endpoints["update-order"](orderId), {
                 action: "cancel",
-                status: "cancel",
-            });
-
-            // 2. PATCH service order detail -> FAILED
-            await authApis(token).patch(endpoints["update-service-order-detail"](serviceDetailId), {
-                status: "failed",
             });
 
             alert("Đã huỷ dịch vụ thành công!");
@@ -72,15 +68,9 @@ const StoreOrderDetail = ({ route }) => {
         try {
             const token = await AsyncStorage.getItem("token");
 
-            // 1. PATCH order -> CANCEL
+            // PATCH order theo action, backend đổi luôn trạng thái service detail -> IN_PROGRESS
             await authApis(token).patch(endpoints["update-order"](orderId), {
                 action: "accept",
-                status: "processing",
-            });
-
-            // 2. PATCH service order detail -> FAILED
-            await authApis(token).patch(endpoints["update-service-order-detail"](serviceDetailId), {
-                status: "in_progress",
             });
 
             alert("Đã cập nhật dịch vụ thành Processing thành công!");
@@ -95,15 +85,9 @@ const StoreOrderDetail = ({ route }) => {
         try {
             const token = await AsyncStorage.getItem("token");
 
-            // 1. PATCH order -> CANCEL
+            // PATCH order theo action, backend đổi luôn trạng thái service detail -> COMPLETED
             await authApis(token).patch(endpoints["update-order"](orderId), {
                 action: "complete",
-                status: "delivered",
-            });
-
-            // 2. PATCH service order detail -> FAILED
-            await authApis(token).patch(endpoints["update-service-order-detail"](serviceDetailId), {
-                status: "completed",
             });
 
             alert("Đã cập nhật dịch vụ thành Completed thành công!");
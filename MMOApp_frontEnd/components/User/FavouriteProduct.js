@@ -44,6 +44,7 @@ const FavouriteProducts = () => {
             const res = await authApis(token).get(endpoints["my-favorite"], {
                 params: {
                     search: searchText || undefined,
+                    expand: "store",
                 },
             });
 
@@ -18,6 +18,7 @@ export const endpoints = {
     'get-products': "/products/",
     "my-products": "/products/my-products/",
     "get-product-store": (storeId) => `/products/${storeId}/store-products/`,
+    "get-similar-products": (productId) => `/products/${productId}/similar/`,
     "create-product": "/products/",
     "update-product": (productId) => `/products/${productId}/`,
     "delete-product": (productId) => `/products/${productId}/`,
@@ -42,6 +43,7 @@ export const endpoints = {
     "delete-stocks": (stockId) => `/account-stocks/${stockId}/`,
     "update-stocks": (stockId) => `/account-stocks/${stockId}/`,
     "add-order": '/orders/',
+    "checkout": '/orders/checkout/',
     "my-order": '/orders/my-orders/',
     "store-order": '/orders/store-orders/',
     "add-acc-order-detail": '/acc-orders-detail/',
@@ -68,15 +70,47 @@ export const endpoints = {
     "chatbot": '/chatbot/',
 };
 
+// Lưu ETag + dữ liệu của các GET đã tải; server trả 304 thì dùng lại dữ liệu cũ, không tải lại body
+const etagCache = new Map();
+
+const withEtagCache = (instance) => {
+    const cacheKey = (config) => `${config.headers?.Authorization || ""} ${instance.getUri(config)}`;
+
+    instance.interceptors.request.use((config) => {
+        if ((config.method || "get") === "get") {
+            const cached = etagCache.get(cacheKey(config));
+            if (cached) config.headers["If-None-Match"] = cached.etag;
+        }
+        return config;
+    });
+
+    instance.interceptors.response.use(
+        (res) => {
+            const etag = res.headers?.etag;
+            if (etag && (res.config.method || "get") === "get")
+                etagCache.set(cacheKey(res.config), { etag, data: res.data });
+            return res;
+        },
+        (err) => {
+            const res = err.response;
+            const cached = res?.status === 304 && etagCache.get(cacheKey(res.config));
+            if (cached) return { ...res, status: 200, data: cached.data };
+            return Promise.reject(err);
+        }
+    );
+
+    return instance;
+};
+
 export const authApis = (token) => {
-    return axios.create({
+    return withEtagCache(axios.create({
         baseURL: BASE_URL,
         headers: {
             'Authorization': `Bearer ${token}`
         }
-    })
+    }))
 }
 
-export default axios.create({
+export default withEtagCache(axios.create({
     baseURL: BASE_URL
-});
\ No newline at end of file
+}));
\ No newline at end of file